@@ -1,12 +1,18 @@
 import json
+import os
 import time
 import websocket
 import random
 import threading
+from checkpoint import Checkpoint
+from journal import Journal
 
 # Replace with your actual demo account API token
-API_TOKEN = ''
-API_URL = "wss://ws.binaryws.com/websockets/v3?app_id=1089"
+API_TOKEN = os.getenv('DERIV_TOKEN', '')
+API_ENDPOINT = os.getenv('DERIV_ENDPOINT', 'wss://ws.binaryws.com')  # ws://127.0.0.1:8765 for fake_deriv_server.py
+API_URL = f"{API_ENDPOINT}/websockets/v3?app_id={os.getenv('DERIV_APP_ID', '1089')}"
+CHECKPOINT_PATH = os.getenv('DERIV_CHECKPOINT', 'martingale.checkpoint')  # Empty disables checkpoints
+JOURNAL_DIR = os.getenv('DERIV_JOURNAL', 'journal')  # Directory for the JSONL trade journal; empty disables
 
 # Initialize variables
 initial_balance = 0  # This will be set to the current balance of the demo account
@@ -27,6 +33,37 @@ wins = 0
 losses = 0
 total_bets = 0
 stop_requested = False
+finished = False
+balance_known = False  # Set once the first session (or a checkpoint) provides the balance
+reconnect_delay = 1  # Seconds before reconnecting after the connection drops
+
+checkpoint = Checkpoint(CHECKPOINT_PATH, interval=1.0) if CHECKPOINT_PATH else None
+
+def summary_line():
+    return f"Total Bets: {total_bets}, Wins: {wins}, Losses: {losses}, Balance: {balance}, Bet: {bet_amount}"
+
+# Every round goes to the journal; the console gets a summary line every 5 seconds
+journal = Journal(JOURNAL_DIR, 'martingale', summary_line)
+
+def checkpoint_state():
+    return {'initial_balance': initial_balance, 'balance': balance, 'bet_amount': bet_amount,
+            'wins': wins, 'losses': losses, 'total_bets': total_bets}
+
+def restore_checkpoint():
+    # Continues a previous run that stopped early, including a martingale
+    # bet that is partway through its chain
+    global initial_balance, balance, bet_amount, wins, losses, total_bets, balance_known
+    saved = checkpoint.load() if checkpoint else None
+    if saved is None:
+        return
+    initial_balance = saved['initial_balance']
+    balance = saved['balance']
+    bet_amount = saved['bet_amount']
+    wins = saved['wins']
+    losses = saved['losses']
+    total_bets = saved['total_bets']
+    balance_known = True
+    print(f"Resumed from checkpoint: Balance: {balance}, Bet: {bet_amount}, Total Bets: {total_bets}")
 
 def on_open(ws):
     print("Connection opened. Authorizing...")
@@ -47,10 +84,12 @@ def on_message(ws, message):
         ws.send(json.dumps({"balance": 1}))
 
     elif 'balance' in response:
-        # Set the initial balance
-        global initial_balance
-        initial_balance = float(response['balance']['balance'])
-        balance = initial_balance
+        # Set the initial balance, unless resuming after a reconnect or restart
+        global initial_balance, balance_known
+        if not balance_known:
+            initial_balance = float(response['balance']['balance'])
+            balance = initial_balance
+            balance_known = True
         print(f"Initial Balance: {balance}")
 
         # Start trading loop
@@ -59,10 +98,14 @@ def on_message(ws, message):
 
         # Wait for the trading to stop
         trading_thread.join()
-        summarize_results()
+        if finished:
+            summarize_results()
+            if checkpoint is not None and os.path.exists(checkpoint.path):
+                os.remove(checkpoint.path)  # The run is over, the next one starts fresh
+            ws.close()
 
 def trade(ws):
-    global balance, bet_amount, wins, losses, total_bets, stop_requested
+    global balance, bet_amount, wins, losses, total_bets, stop_requested, finished
 
     while not stop_requested and balance - initial_balance < take_profit and initial_balance - balance < stop_loss:
         # Generate the next number
@@ -78,7 +121,12 @@ def trade(ws):
         last_digit = next_number % 10
 
         # Place the trade
-        place_trade(ws, prediction, last_digit)
+        try:
+            place_trade(ws, prediction, last_digit)
+        except (websocket.WebSocketConnectionClosedException, OSError):
+            # run_forever reconnects and trading resumes from the same state
+            print("Connection lost while trading.")
+            return
 
         # Simulate the result (this should be replaced with actual API result checking)
         payout = calculate_payout(prediction, next_number)
@@ -96,11 +144,16 @@ def trade(ws):
 
         total_bets += 1
 
-        print(f"Round {total_bets}: Prediction: {prediction}, Number: {next_number}, Balance: {balance}, Bet: {bet_amount}")
+        journal.record('round', round=total_bets, prediction=prediction, number=next_number,
+                       payout=payout, balance=balance, next_bet=bet_amount)
+        if checkpoint is not None:
+            checkpoint.maybe_save(checkpoint_state)
 
         # Short delay before next trade
         time.sleep(2)
 
+    finished = True
+
     # Stop trading if requested
     if stop_requested:
         print("Stop operation requested.")
@@ -161,9 +214,12 @@ def on_close(ws, *args):
     print("Connection closed.")
 
 if __name__ == "__main__":
+    restore_checkpoint()
+    journal.start()
     ws = websocket.WebSocketApp(API_URL,
                                 on_open=on_open,
                                 on_message=on_message,
                                 on_error=on_error,
                                 on_close=on_close)
-    ws.run_forever()
+    ws.run_forever(reconnect=reconnect_delay)
+    journal.close()
@@ -0,0 +1,181 @@
+import numpy as np
+
+DIGITS = 10
+WIDE_FORECAST_PIPS = 25.0  # Past this std (in pips) every last digit is taken as equally likely
+TAIL = 6.0  # Standard deviations covered when spreading a forecast over quotes
+
+
+def normal_cdf(z):
+    # Abramowitz and Stegun 7.1.26 erf approximation (error < 1.5e-7),
+    # vectorized so the digit distribution needs no SciPy
+    x = np.abs(z) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-x * x)
+    return 0.5 * (1.0 + np.sign(z) * erf)
+
+
+# Online AR(p) model of differenced tick quotes, fitted by recursive least
+# squares. Each quote is differenced `differences` times, and the result is
+# regressed on its previous `order` values plus an intercept. Every tick
+# updates the coefficients and their inverse covariance in O(p^2) instead of
+# refitting, and `forgetting` < 1 discounts old ticks so the fit follows
+# the market. Like MarkovModel, several independent streams (one per
+# symbol) share the model's arrays, so forecast() answers for all of them
+# in one NumPy call. `orders` gives streams fewer lags than `order`: their
+# extra regressors stay 0 and their part of the covariance is never
+# touched, so each stream is fitted exactly as a model of its own order.
+#
+# The forecast is the next quote with the standard deviation of its error,
+# which digit_probabilities() turns into the distribution of the next
+# quote's last digit for the even/odd and over/under decisions.
+class ARModel:
+
+    def __init__(self, order=2, differences=1, forgetting=0.999, streams=1, delta=100.0, orders=None):
+        orders = np.full(streams, order, dtype=np.int64) if orders is None else np.asarray(orders, dtype=np.int64)
+        if len(orders) != streams or orders.min() < 1 or orders.max() > order:
+            raise ValueError("every stream's order must be from 1 to order")
+        if differences < 0:
+            raise ValueError("differences must not be negative")
+        if not 0 < forgetting <= 1:
+            raise ValueError("forgetting must be in (0, 1]")
+        self.order = order
+        self.differences = differences
+        self.forgetting = forgetting
+        self.streams = streams
+        self.orders = orders
+        self.sizes = (orders + 1).tolist()  # Regressors used by each stream
+        active = np.arange(order + 1) <= orders[:, None]
+        # Per-stream forgetting, applied to the stream's own block of the covariance only
+        self.discount = np.where(active[:, :, None] & active[:, None, :], 1.0 / forgetting, 1.0)
+        size = order + 1  # Intercept and the lags
+        self.weights = np.zeros((streams, size))
+        self.covariance = np.tile(np.eye(size) * delta, (streams, 1, 1))  # Inverse of the weighted X'X
+        self.regressors = np.zeros((streams, size))  # [1, y(t), y(t-1), ...] for the next step
+        self.regressors[:, 0] = 1.0
+        self.previous = np.zeros((streams, differences))  # Last value at each differencing level
+        self.noise = np.zeros(streams)  # Exponentially weighted variance of the one-step errors
+        self.seen = np.zeros(streams, dtype=np.int64)  # Quotes observed per stream
+
+    def __len__(self):
+        return self.streams
+
+    def ready(self, stream=0):
+        # True once the lags are filled with differenced values and the
+        # model has made at least one prediction it could check
+        return self.seen[stream] > self.differences + self.orders[stream]
+
+    def update(self, quote, stream=0):
+        # Records the next quote of a stream in O(order^2)
+        value = float(quote)
+        previous = self.previous[stream]
+        seen = self.seen[stream]
+        for level in range(self.differences):
+            if seen > level:
+                value, previous[level] = value - previous[level], value
+            else:
+                previous[level] = value  # Not enough quotes for this level yet
+                value = None
+                break
+        self.seen[stream] = seen + 1
+        if value is None:
+            return
+
+        size = self.sizes[stream]
+        x = self.regressors[stream, :size]
+        if seen >= self.differences + size - 1:
+            # The lags are all real values: one RLS step on the new target
+            weights = self.weights[stream, :size]
+            covariance = self.covariance[stream, :size, :size]
+            error = value - weights @ x
+            px = covariance @ x
+            gain = px / (self.forgetting + x @ px)
+            weights += gain * error
+            covariance -= np.outer(gain, px)
+            covariance /= self.forgetting
+            # Plain mean of the squared errors until the forgetting window is full
+            weight = max(1 - self.forgetting, 1.0 / (seen - self.differences - size + 2))
+            self.noise[stream] += weight * (error * error - self.noise[stream])
+        x[2:] = x[1:-1]
+        x[1] = value
+
+    def update_many(self, quotes, stream=0):
+        for quote in quotes:
+            self.update(quote, stream)
+
+    def update_streams(self, quotes):
+        # Records the next quote of every stream in one vectorized step,
+        # same result as update() on each of them
+        values = np.broadcast_to(np.asarray(quotes, dtype=np.float64), (self.streams,)).copy()
+        seen = self.seen.copy()
+        self.seen += 1
+        for level in range(self.differences):
+            # Streams without enough quotes for a level just store the value
+            values, self.previous[:, level] = values - self.previous[:, level], values
+        moved = np.flatnonzero(seen >= self.differences)
+        if not len(moved):
+            return
+        fitted = np.flatnonzero(seen >= self.differences + self.orders)
+        if len(fitted):
+            if len(fitted) == self.streams:
+                fitted = slice(None)  # Every stream, as views instead of copies
+            x = self.regressors[fitted]
+            covariance = self.covariance[fitted]
+            error = values[fitted] - np.einsum('sn,sn->s', self.weights[fitted], x)
+            px = np.einsum('snm,sm->sn', covariance, x)
+            gain = px / (self.forgetting + np.einsum('sn,sn->s', x, px))[:, None]
+            self.weights[fitted] += gain * error[:, None]
+            covariance -= gain[:, :, None] * px[:, None, :]
+            covariance *= self.discount[fitted]
+            self.covariance[fitted] = covariance
+            fits = seen[fitted] - self.differences - self.orders[fitted] + 1
+            weight = np.maximum(1 - self.forgetting, 1.0 / fits)
+            self.noise[fitted] += weight * (error * error - self.noise[fitted])
+        if len(moved) == self.streams:
+            moved = slice(None)
+        x = self.regressors[moved]
+        x[:, 2:] = x[:, 1:-1]
+        x[:, 1] = values[moved]
+        x[np.arange(self.order + 1) > self.orders[moved, None]] = 0.0
+        self.regressors[moved] = x
+
+    def forecast(self, streams=None):
+        # Returns (mean, std) arrays of the next quote of each stream; the
+        # std is infinite for streams that are not ready
+        if streams is None:
+            streams = np.arange(self.streams)
+        streams = np.asarray(streams)
+        x = self.regressors[streams]
+        step = np.einsum('sn,sn->s', self.weights[streams], x)
+        spread = np.einsum('sn,snm,sm->s', x, self.covariance[streams], x)
+        # Undo the differencing: x(t+1) = d^D x(t+1) + sum of d^k x(t)
+        mean = step + self.previous[streams].sum(axis=1)
+        std = np.sqrt(self.noise[streams] * (1.0 + np.maximum(spread, 0.0)))
+        std[self.seen[streams] <= self.differences + self.orders[streams]] = np.inf
+        return mean, std
+
+    def digit_probabilities(self, pip_sizes, streams=None):
+        # Probability of each last digit of the next quote, one row per
+        # stream, assuming a normal forecast error
+        mean, std = self.forecast(streams)
+        return digit_probabilities(mean, std, pip_sizes)
+
+
+def digit_probabilities(mean, std, pip_sizes):
+    # The quote is rounded to its pip, so last digit k collects the normal
+    # mass of every pip count n = k (mod 10) over [n - 0.5, n + 0.5)
+    scale = 10.0 ** np.asarray(pip_sizes, dtype=np.float64)
+    centre = np.asarray(mean) * scale
+    spread = np.maximum(np.asarray(std) * scale, 1e-9)
+    probabilities = np.full((len(centre), DIGITS), 1.0 / DIGITS)
+    narrow = spread < WIDE_FORECAST_PIPS
+    if narrow.any():
+        centre, spread = centre[narrow], spread[narrow]
+        reach = int(np.ceil(TAIL * spread.max())) + 1
+        counts = np.rint(centre)[:, None] + np.arange(-reach, reach + 1)
+        mass = (normal_cdf((counts + 0.5 - centre[:, None]) / spread[:, None])
+                - normal_cdf((counts - 0.5 - centre[:, None]) / spread[:, None]))
+        rows = np.zeros((len(centre), DIGITS))
+        np.add.at(rows, (np.arange(len(centre))[:, None], counts.astype(np.int64) % DIGITS), mass)
+        probabilities[narrow] = rows / rows.sum(axis=1, keepdims=True)
+    return probabilities
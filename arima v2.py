@@ -1,15 +1,32 @@
-import websocket
-import json
-import threading
 import asyncio
+import functools
 import os
-import numpy as np
-from deriv_api import DerivAPI, APIError
+import sys
+import time
+from deriv_connection import DerivConnection, APIError
+from tick_store import TickStore
+from ar_model import ARModel
+from tick_queue import TickQueue
+from settlement import SettlementTracker
+from proposal_cache import ProposalCache
+from bankroll import Bankroll, MartingaleChains
+from tick_archive import TickRecorder
+from tick_history import stream_ticks
+from checkpoint import Checkpoint
+from metrics import Metrics, start_exporters, stop_exporters
+from journal import Journal
+from performance import Performance, CircuitBreaker
 
 # Constants
-APP_ID = '1089'  # Replace with your actual app_id
-URL = f"wss://ws.derivws.com/websockets/v3?app_id={APP_ID}"
+APP_ID = os.getenv('DERIV_APP_ID', '1089')  # Replace with your actual app_id
+ENDPOINT = os.getenv('DERIV_ENDPOINT', 'wss://ws.derivws.com')  # ws://127.0.0.1:8765 for fake_deriv_server.py
+URL = f"{ENDPOINT}/websockets/v3?app_id={APP_ID}"
 api_token = os.getenv('DERIV_TOKEN', '')
+TICK_ARCHIVE = os.getenv('DERIV_TICK_ARCHIVE', 'tick_archive')  # Directory every tick is recorded to; empty disables
+CHECKPOINT_PATH = os.getenv('DERIV_CHECKPOINT', 'arima_v2.checkpoint')  # Empty disables checkpoints
+METRICS_PORT = os.getenv('DERIV_METRICS_PORT', '')  # Serve Prometheus metrics on this local port
+METRICS_FILE = os.getenv('DERIV_METRICS_FILE', '')  # Write a JSON metrics snapshot here every 10s
+JOURNAL_DIR = os.getenv('DERIV_JOURNAL', 'journal')  # Directory for the JSONL trade journal; empty disables
 
 if not api_token:
     sys.exit("DERIV_TOKEN environment variable is not set")
@@ -30,44 +47,180 @@ MAX_ADJUSTMENT_FACTOR = 0.10
 MIN_THRESHOLD = 0.05
 MAX_THRESHOLD = 0.30
 PERFORMANCE_WINDOW = 10  # Number of rounds to track recent performance
+PERFORMANCE_WINDOWS = (PERFORMANCE_WINDOW, 50, 200)  # Rolling windows of trade statistics kept per symbol
+PAUSE_AFTER_LOSSES = 0  # Pause a symbol after this many losses in a row; 0 disables
+PAUSE_DRAWDOWN = 0  # Pause a symbol when its drawdown over the last DRAWDOWN_WINDOW trades reaches this; 0 disables
+DRAWDOWN_WINDOW = 50  # One of PERFORMANCE_WINDOWS
+PAUSE_SECONDS = 300.0  # Length of a circuit breaker pause
+LOW_VOLATILITY = 0.1  # Grow the history window below this volatility
+HIGH_VOLATILITY = 0.3  # Shrink the history window above this volatility
+AR_FORECAST = False  # Predict even/odd from the AR forecast of the next quote instead of window parity counts
+# Forecasts wider than ar_model.WIDE_FORECAST_PIPS are uniform over the digits, so on symbols moving tens of pips a tick this rarely trades
+AR_LOG_FORECAST = False  # Fit the forecaster and log its forecast with each trade even when AR_FORECAST is off
+AR_ORDER = 2  # Lags of differenced quotes in the forecaster
+AR_DIFFERENCES = 1  # Times quotes are differenced before the AR fit
+AR_FORGETTING = 0.999  # Weight kept by older ticks per new tick in the RLS fit
+PIP_SIZE = 2  # Used when the server doesn't report a symbol's pip size
+TICK_DRIVEN = True  # Decide on incoming ticks; False polls once a second instead
+DECISION_EVERY_N_TICKS = 1  # Run one decision per this many ticks
+DECISION_QUEUE_SIZE = 1  # Pending decisions beyond this are coalesced into the newest
+MAX_OPEN_CONTRACTS = 1  # Contracts allowed in flight at once; 1 trades serially
+CHECKPOINT_INTERVAL = 1.0  # Seconds between state checkpoints
+MAX_BACKFILL_TICKS = 20000  # Most ticks fetched to fill the gap after a reconnect or restart
+SUMMARY_INTERVAL = 5.0  # Seconds between console summary lines
+RECONNECT_DELAY = 1.0  # First wait before reconnecting, doubled up to MAX_RECONNECT_DELAY
+MAX_RECONNECT_DELAY = 30.0
 
-# Initialize the historical data array and performance metrics
-tick_data = []
-performance_history = []
+SYMBOLS = ["R_100"]  # Every symbol runs the same strategy on one connection
+
+# Strategy state for one symbol
+class SymbolState:
+    __slots__ = ('symbol', 'stream', 'pip_size', 'tick_store', 'current_history_size', 'even_threshold', 'odd_threshold',
+                 'performance', 'breaker', 'decision_queue', 'martingale', 'wins', 'losses', 'pnl',
+                 'round_num', 'last_epoch')
+
+    def __init__(self, symbol, stream):
+        self.symbol = symbol
+        self.stream = stream  # Row of this symbol in the shared forecaster
+        self.pip_size = PIP_SIZE
+        self.tick_store = TickStore(MAX_HISTORY_SIZE, INITIAL_HISTORY_SIZE)
+        self.current_history_size = INITIAL_HISTORY_SIZE
+        self.even_threshold = INITIAL_EVEN_THRESHOLD
+        self.odd_threshold = INITIAL_ODD_THRESHOLD
+        self.performance = Performance(PERFORMANCE_WINDOWS)  # Rolling win rate, PnL, drawdown and loss streaks
+        self.breaker = CircuitBreaker(PAUSE_AFTER_LOSSES, PAUSE_DRAWDOWN, PAUSE_SECONDS, DRAWDOWN_WINDOW)
+        self.decision_queue = TickQueue(DECISION_QUEUE_SIZE, DECISION_EVERY_N_TICKS)
+        # One doubling chain per contract slot, each starting at the base bet amount
+        self.martingale = MartingaleChains(BET_AMOUNT, 2, MAX_BET_AMOUNT, MAX_OPEN_CONTRACTS)
+        self.wins = 0
+        self.losses = 0
+        self.pnl = 0
+        self.round_num = 1
+        self.last_epoch = 0  # Epoch of the newest tick seen
+
+# Initialize the per-symbol state and account-wide performance metrics
+states = {symbol: SymbolState(symbol, stream) for stream, symbol in enumerate(SYMBOLS)}
+forecaster = ARModel(AR_ORDER, AR_DIFFERENCES, AR_FORGETTING, streams=len(SYMBOLS))
 total_wins = 0
 total_losses = 0
 total_pnl = 0
-current_history_size = INITIAL_HISTORY_SIZE
-current_bet_amount = BET_AMOUNT  # Start with the base bet amount
-
-def update_data(tick):
-    global tick_data
-    if len(tick_data) >= current_history_size:
-        tick_data.pop(0)  # Maintain history size
-    tick_data.append(int(tick))
-
-def calculate_volatility():
-    if len(tick_data) < 2:
-        return 0
-    return np.std(np.diff(tick_data))  # Standard deviation of tick differences
-
-def normalize_counts():
-    global tick_data
-    if len(tick_data) < current_history_size:
+initial_balance = None
+bankroll = Bankroll(TAKE_PROFIT, STOP_LOSS)  # Realized PnL and stake reserved by open contracts
+recorder = TickRecorder(TICK_ARCHIVE) if TICK_ARCHIVE else None
+unsettled = {}  # contract_id -> (symbol, round_num, chain, ticket, stake) until the contract settles
+open_trades = set()
+checkpoint = Checkpoint(CHECKPOINT_PATH, CHECKPOINT_INTERVAL) if CHECKPOINT_PATH else None
+metrics = Metrics('arima')  # Stage latencies and counters, always collected
+
+def summary_line():
+    balance = (initial_balance or 0) + total_pnl
+    return (f"PnL: {total_pnl}, Wins: {total_wins}, Losses: {total_losses}, "
+            f"Open: {len(unsettled)}, Balance: {balance}")
+
+# Round events go to the journal; the console only gets a summary line
+journal = Journal(JOURNAL_DIR, 'arima', summary_line, summary_interval=SUMMARY_INTERVAL)
+
+def checkpoint_state():
+    return {
+        'symbols': {symbol: {
+            'tick_store': state.tick_store,
+            'current_history_size': state.current_history_size,
+            'even_threshold': state.even_threshold,
+            'odd_threshold': state.odd_threshold,
+            'pip_size': state.pip_size,
+            'performance': state.performance,
+            'paused_until': state.breaker.paused_until,
+            'stakes': state.martingale.stakes,
+            'wins': state.wins,
+            'losses': state.losses,
+            'pnl': state.pnl,
+            'round_num': state.round_num,
+            'last_epoch': state.last_epoch,
+        } for symbol, state in states.items()},
+        'forecaster': forecaster,
+        'totals': (total_wins, total_losses, total_pnl, initial_balance),
+        'realized': bankroll.realized,
+        'unsettled': {contract_id: (symbol, round_num, chain, stake)
+                      for contract_id, (symbol, round_num, chain, ticket, stake) in unsettled.items()},
+    }
+
+def restore_checkpoint():
+    # Picks up where a previous run that stopped early left off: tick
+    # windows, forecaster, thresholds, martingale stakes, PnL and open contracts
+    global total_wins, total_losses, total_pnl, initial_balance, forecaster
+    saved = checkpoint.load() if checkpoint else None
+    if saved is None:
+        return
+    if sorted(saved['symbols']) != sorted(SYMBOLS):
+        print("Ignoring checkpoint saved for other symbols")
+        return
+    for symbol, saved_state in saved['symbols'].items():
+        state = states[symbol]
+        if saved_state['tick_store'].capacity == MAX_HISTORY_SIZE:
+            state.tick_store = saved_state['tick_store']
+            state.last_epoch = saved_state['last_epoch']
+        state.current_history_size = saved_state['current_history_size']
+        state.tick_store.resize(state.current_history_size)
+        state.even_threshold = saved_state['even_threshold']
+        state.odd_threshold = saved_state['odd_threshold']
+        state.pip_size = saved_state['pip_size']
+        if saved_state['performance'].sizes == state.performance.sizes:
+            state.performance = saved_state['performance']
+        state.breaker.paused_until = saved_state['paused_until']
+        if len(saved_state['stakes']) == len(state.martingale):
+            state.martingale.stakes = saved_state['stakes']
+        state.wins = saved_state['wins']
+        state.losses = saved_state['losses']
+        state.pnl = saved_state['pnl']
+        state.round_num = saved_state['round_num']
+    # The forecaster keeps one row per symbol in SYMBOLS order, so it only
+    # fits if the symbols are listed in the same order as when it was saved
+    saved_forecaster = saved['forecaster']
+    if list(saved['symbols']) == SYMBOLS and \
+            (saved_forecaster.order, saved_forecaster.differences, saved_forecaster.forgetting) == \
+            (forecaster.order, forecaster.differences, forecaster.forgetting):
+        forecaster = saved_forecaster
+    total_wins, total_losses, total_pnl, initial_balance = saved['totals']
+    bankroll.realized = saved['realized']
+    for contract_id, (symbol, round_num, chain, stake) in saved['unsettled'].items():
+        states[symbol].martingale.claim(chain)
+        unsettled[contract_id] = (symbol, round_num, chain, bankroll.reserve(stake, force=True), stake)
+    print(f"Resumed from checkpoint: PnL: {total_pnl}, Wins: {total_wins}, Losses: {total_losses}, "
+          f"{len(unsettled)} open contracts")
+
+def save_checkpoint(force=False):
+    if checkpoint is not None:
+        if force:
+            checkpoint.save(checkpoint_state())
+        else:
+            checkpoint.maybe_save(checkpoint_state)
+
+def update_data(state, tick):
+    state.tick_store.append(int(tick))  # Window size is kept by the store
+    if AR_FORECAST or AR_LOG_FORECAST:
+        forecaster.update(tick, state.stream)  # One RLS step, O(AR_ORDER**2), several times the append
+
+def calculate_volatility(state):
+    return state.tick_store.volatility()  # Standard deviation of tick differences
+
+def normalize_counts(state):
+    if len(state.tick_store) < state.current_history_size:
         return 0, 0  # Not enough data to predict
 
-    # Count even and odd occurrences
-    even_count = np.sum(np.array(tick_data) % 2 == 0)
-    odd_count = np.sum(np.array(tick_data) % 2 != 0)
-    
-    total_count = even_count + odd_count
-    even_prob = even_count / total_count if total_count > 0 else 0
-    odd_prob = odd_count / total_count if total_count > 0 else 0
-    
-    return even_prob, odd_prob
+    # Even and odd counts are maintained incrementally by the store
+    return state.tick_store.parity_probabilities()
+
+def forecast_parity(state):
+    if not forecaster.ready(state.stream):
+        return 0, 0  # Not enough data to predict
 
-def predict_even_odd():
-    even_prob, odd_prob = normalize_counts()
+    # Digit distribution of the next quote under the AR forecast
+    digits = forecaster.digit_probabilities([state.pip_size], [state.stream])[0]
+    even_prob = float(digits[0::2].sum())
+    return even_prob, 1 - even_prob
+
+def predict_even_odd(state):
+    even_prob, odd_prob = forecast_parity(state) if AR_FORECAST else normalize_counts(state)
     
     if even_prob > odd_prob:
         return 'even', even_prob
@@ -76,29 +229,25 @@ def predict_even_odd():
     else:
         return None, 0  # No clear prediction
 
-def adjust_history_size():
-    global current_history_size
-    volatility = calculate_volatility()
+def adjust_history_size(state):
+    volatility = calculate_volatility(state)
     
     # Increase history size if volatility is low, decrease if high
-    if volatility < 0.1:
-        current_history_size = min(current_history_size + 1, MAX_HISTORY_SIZE)
-    elif volatility > 0.3:
-        current_history_size = max(current_history_size - 1, MIN_HISTORY_SIZE)
-
-def update_probability_thresholds():
-    global INITIAL_EVEN_THRESHOLD
-    global INITIAL_ODD_THRESHOLD
-    global performance_history
-    
-    if len(performance_history) < PERFORMANCE_WINDOW:
+    if volatility < LOW_VOLATILITY:
+        state.current_history_size = min(state.current_history_size + 1, MAX_HISTORY_SIZE)
+    elif volatility > HIGH_VOLATILITY:
+        state.current_history_size = max(state.current_history_size - 1, MIN_HISTORY_SIZE)
+    state.tick_store.resize(state.current_history_size)
+
+def update_probability_thresholds(state):
+    recent_performance = state.performance.window(PERFORMANCE_WINDOW)
+
+    if not recent_performance.full():
         return
     
-    recent_performance = performance_history[-PERFORMANCE_WINDOW:]
-    
-    # Calculate recent win/loss ratio
-    recent_wins = sum(1 for result in recent_performance if result == "Win")
-    recent_losses = sum(1 for result in recent_performance if result == "Loss")
+    # Calculate recent win/loss ratio from the window's running counts
+    recent_wins = recent_performance.wins
+    recent_losses = recent_performance.losses
     
     if recent_losses > 0:
         win_loss_ratio = recent_wins / recent_losses
@@ -110,173 +259,335 @@ def update_probability_thresholds():
     
     if win_loss_ratio > 1:
         # Increase thresholds if the win/loss ratio is favorable
-        INITIAL_EVEN_THRESHOLD = min(INITIAL_EVEN_THRESHOLD + adjustment_factor, MAX_THRESHOLD)
-        INITIAL_ODD_THRESHOLD = min(INITIAL_ODD_THRESHOLD + adjustment_factor, MAX_THRESHOLD)
+        state.even_threshold = min(state.even_threshold + adjustment_factor, MAX_THRESHOLD)
+        state.odd_threshold = min(state.odd_threshold + adjustment_factor, MAX_THRESHOLD)
     else:
         # Decrease thresholds if the win/loss ratio is unfavorable
-        INITIAL_EVEN_THRESHOLD = max(INITIAL_EVEN_THRESHOLD - adjustment_factor, MIN_THRESHOLD)
-        INITIAL_ODD_THRESHOLD = max(INITIAL_ODD_THRESHOLD - adjustment_factor, MIN_THRESHOLD)
-
-def on_message(ws, message):
-    data = json.loads(message)
-    if 'error' in data:
-        print('Error:', data['error']['message'])
-        ws.close()
-    elif data['msg_type'] == 'history':
-        ticks = data['history']['prices']
-        for tick in ticks:
-            update_data(tick)
-    elif data['msg_type'] == 'tick':
-        tick = data['tick']['quote']
-        update_data(tick)
-
-def on_error(ws, error):
-    print("WebSocket error:", error)
-
-def on_close(ws):
-    print("WebSocket connection closed")
-
-def on_open(ws):
-    def run(*args):
-        TICKS_REQUEST = {
-            "ticks_history": "R_100",
-            "adjust_start_time": 1,
-            "count": INITIAL_HISTORY_SIZE,
-            "end": "latest",
-            "start": 1,
-            "style": "ticks",
-            "subscribe": 1
-        }
-        ws.send(json.dumps(TICKS_REQUEST))
-        
-    threading.Thread(target=run).start()
+        state.even_threshold = max(state.even_threshold - adjustment_factor, MIN_THRESHOLD)
+        state.odd_threshold = max(state.odd_threshold - adjustment_factor, MIN_THRESHOLD)
 
-def subscribe_ticks():
-    websocket.enableTrace(False)
-    ws = websocket.WebSocketApp(URL,
-                                on_message=on_message,
-                                on_error=on_error,
-                                on_close=on_close)
-    ws.on_open = on_open
-    ws.run_forever()
+def on_history(state, prices, times, pip_size):
+    # History in front of the tick stream: the initial window, or the ticks
+    # missed since last_epoch after a reconnect or restart
+    if pip_size is not None:
+        state.pip_size = pip_size
+    for tick in prices:
+        update_data(state, tick)
+    if len(times):
+        state.last_epoch = int(times[-1])
+    if recorder is not None:
+        recorder.record_many(state.symbol, times, prices)
 
-async def sample_calls():
-    global total_wins, total_losses, total_pnl, performance_history, current_bet_amount
+def on_message(data):
+    # Runs on the event loop for every tick of every subscription
+    started = time.perf_counter()
+    state = states[data['tick']['symbol']]
+    epoch = int(data['tick']['epoch'])
+    if epoch <= state.last_epoch:
+        return  # Already seen in the history
+    state.last_epoch = epoch
+    tick = data['tick']['quote']
+    update_data(state, tick)
+    if recorder is not None:
+        recorder.record(state.symbol, epoch, tick)
+    state.decision_queue.put(epoch)
+    metrics.inc('ticks_total', symbol=state.symbol)
+    metrics.since('tick', started)
 
-    api = DerivAPI(app_id=APP_ID)
-    
-    await api.authorize(api_token)
-    balance = await api.balance()
-    initial_balance = balance['balance']['balance']
-    current_balance = initial_balance
-    
-    round_num = 1
+async def subscribe_ticks(connection, state):
+    count = MAX_BACKFILL_TICKS if state.last_epoch else INITIAL_HISTORY_SIZE
+    await stream_ticks(connection, state.symbol, functools.partial(on_history, state), on_message,
+                       count, start=state.last_epoch + 1)
+
+def record_result(state, contract_id, round_num, stake, sell_price, pnl, won):
+    global total_wins, total_losses, total_pnl
+
+    metrics.inc('contracts_total', result='win' if won else 'loss')
+    if won:
+        total_wins += 1
+        state.wins += 1
+    else:
+        total_losses += 1
+        state.losses += 1
+    total_pnl += pnl
+    state.pnl += pnl
+    state.performance.record(pnl, won)
+    tripped = state.breaker.check(state.performance)
+
+    journal.record('settlement', symbol=state.symbol, round=round_num, contract_id=contract_id,
+                   result='win' if won else 'loss', stake=stake, sell_price=sell_price,
+                   pnl=pnl, total_pnl=total_pnl, balance=initial_balance + total_pnl)
+    if tripped:
+        metrics.inc('circuit_breaker_trips_total', reason=tripped)
+        print(f"{state.symbol}: circuit breaker ({tripped}), pausing for {PAUSE_SECONDS:.0f}s")
+        journal.record('circuit_breaker', symbol=state.symbol, round=round_num, reason=tripped,
+                       pause=PAUSE_SECONDS, **state.performance.window(DRAWDOWN_WINDOW).stats())
+
+def proposal_request(symbol, contract_type, bet_amount):
+    return {
+        "proposal": 1,
+        "amount": bet_amount,
+        "barrier": "0",  # Barrier not needed for even/odd
+        "basis": "stake",  # bet_amount is what is paid, as the bankroll and backtest.py count it
+        "contract_type": contract_type,
+        "currency": "USD",
+        "duration": 1,
+        "duration_unit": "t",
+        "symbol": symbol
+    }
+
+async def settle_trade(settlement, state, contract_id, round_num, chain, ticket, stake):
+    # The ticket and chain are given back however this ends, even on an
+    # unexpected error, unless the contract stays unsettled to be tracked
+    # again; a leaked chain would block martingale.acquire() for good
+    started = time.perf_counter()
+    pnl, won = 0.0, None
+    tracked_again = False
+    try:
+        # Resolved from this contract's own updates as soon as it is sold
+        contract = await settlement.wait(contract_id)
+        metrics.since('settlement', started)
+        # The stake is bought on basis 'stake', so profit is the sale minus it
+        pnl = float(contract['profit'])
+        won = pnl > 0
+        record_result(state, contract_id, round_num, stake, contract.get('sell_price'), pnl, won)
+    except APIError as e:
+        metrics.inc('errors_total', stage='settlement')
+        print(f"Failed to track contract {contract_id}: {e}")
+        journal.record('error', stage='settlement', symbol=state.symbol, round=round_num,
+                       contract_id=contract_id, error=str(e))
+    except (ConnectionError, asyncio.CancelledError):
+        tracked_again = True  # Still unsettled, tracked again after reconnecting
+    finally:
+        if not tracked_again:
+            del unsettled[contract_id]
+            bankroll.release(ticket, pnl)
+            if won is None:
+                state.martingale.release(chain)
+            else:
+                state.martingale.settle(chain, won)  # Doubles or resets this chain only
+            save_checkpoint()
+
+def track_contract(settlement, state, contract_id, round_num, chain, ticket, stake):
+    # Settles in the background; the next round can start right away
+    # if another contract slot is free
+    unsettled[contract_id] = (state.symbol, round_num, chain, ticket, stake)
+    trade = asyncio.ensure_future(
+        settle_trade(settlement, state, contract_id, round_num, chain, ticket, stake))
+    open_trades.add(trade)
+    trade.add_done_callback(open_trades.discard)
+
+async def trade_symbol(connection, state, settlement, proposals):
+    symbol = state.symbol
+    martingale = state.martingale
     
-    while round_num <= TOTAL_ROUNDS:
-        await asyncio.sleep(1)  # Adjust this as needed
+    while state.round_num <= TOTAL_ROUNDS:
+        if TICK_DRIVEN:
+            _, tick_time = await state.decision_queue.get()  # Wakes as soon as a tick arrives
+        else:
+            await asyncio.sleep(1)  # Adjust this as needed
+            tick_time = time.perf_counter()
+        save_checkpoint()
+        round_num = state.round_num
 
-        update_probability_thresholds()
-        adjust_history_size()
+        # Waits here while MAX_OPEN_CONTRACTS contracts are in flight
+        chain = await martingale.acquire()
 
-        predicted, probability = predict_even_odd()
+        # Check for stop loss or take profit conditions
+        if bankroll.take_profit_reached():
+            print("Take profit reached. Stopping bot.")
+            martingale.release(chain)
+            break
+        elif bankroll.stop_loss_reached():
+            print("Stop loss reached. Stopping bot.")
+            martingale.release(chain)
+            break
+
+        # A tripped circuit breaker holds this symbol without using up rounds
+        pause = state.breaker.remaining()
+        if pause > 0:
+            martingale.release(chain)
+            await asyncio.sleep(pause)
+            continue
+
+        started = time.perf_counter()
+        update_probability_thresholds(state)
+        adjust_history_size(state)
+
+        predicted, probability = predict_even_odd(state)
+        metrics.since('decision', started)
         
         if predicted is None:
-            print(f"Round {round_num}: Skipping trade due to insufficient data")
-            round_num += 1
+            metrics.inc('skips_total', reason='insufficient_data')
+            journal.record('decision', symbol=symbol, round=round_num, skip='insufficient_data')
+            martingale.release(chain)
+            state.round_num += 1
             continue
         
         # Set the appropriate threshold based on the prediction
         if predicted == 'even':
-            threshold = INITIAL_EVEN_THRESHOLD
+            threshold = state.even_threshold
             contract_type = "DIGITEVEN"
         else:
-            threshold = INITIAL_ODD_THRESHOLD
+            threshold = state.odd_threshold
             contract_type = "DIGITODD"
         
         if probability < threshold:
-            print(f"Round {round_num}: Skipping trade due to low confidence")
-            round_num += 1
+            metrics.inc('skips_total', reason='low_confidence')
+            journal.record('decision', symbol=symbol, round=round_num, prediction=predicted,
+                           probability=probability, threshold=threshold, skip='low_confidence')
+            martingale.release(chain)
+            state.round_num += 1
             continue
-        
-        print(f"Round {round_num}: Placing {contract_type} trade with bet amount: {current_bet_amount}")
 
-        trade_placed = False
-        
-        try:
-            proposal = await api.proposal({
-                "proposal": 1,
-                "amount": current_bet_amount,
-                "barrier": "0",  # Barrier not needed for even/odd
-                "basis": "payout",
-                "contract_type": contract_type,
-                "currency": "USD",
-                "duration": 1,
-                "duration_unit": "t",
-                "symbol": "R_100"
-            })
-            proposal_id = proposal.get('proposal', {}).get('id')
-            if not proposal_id:
-                print("Failed to get proposal")
-                round_num += 1
-                continue
-        except APIError as e:
-            print(f"Failed to get proposal: {e}")
-            round_num += 1
+        bet_amount = martingale.stake(chain)
+        # Realized PnL minus every open stake must stay above the stop loss
+        ticket = bankroll.reserve(bet_amount)
+        if ticket is None:
+            metrics.inc('skips_total', reason='exposure')
+            journal.record('decision', symbol=symbol, round=round_num, prediction=predicted,
+                           probability=probability, threshold=threshold, stake=bet_amount, skip='exposure')
+            martingale.release(chain)
+            state.round_num += 1
             continue
         
-        try:
-            buy_response = await api.buy({"buy": proposal_id, "price": current_bet_amount})
-            contract_id = buy_response.get('buy', {}).get('contract_id')
-            if not contract_id:
-                print("Failed to get contract ID")
-                round_num += 1
-                continue
-            trade_placed = True
-        except APIError as e:
-            print(f"Failed to buy: {e}")
-            round_num += 1
-            continue
+        forecast = {}
+        if AR_FORECAST or AR_LOG_FORECAST:
+            mean, std = forecaster.forecast([state.stream])  # Logged for offline comparison
+            forecast = {'forecast': float(mean[0]), 'forecast_std': float(std[0])}
+        journal.record('decision', symbol=symbol, round=round_num, prediction=predicted,
+                       probability=probability, threshold=threshold, contract_type=contract_type,
+                       stake=bet_amount, **forecast)
 
-        if trade_placed:
+        request = proposal_request(symbol, contract_type, bet_amount)
+        contract_id = None
+        try:
             try:
-                profit_table = await api.profit_table({"profit_table": 1, "limit": 1})
-                if profit_table and 'profit_table' in profit_table:
-                    last_trade = profit_table['profit_table']['transactions'][0]
-                    sell_price = last_trade['sell_price']
-                    
-                    if sell_price == 0:
-                        total_losses += 1
-                        total_pnl -= current_bet_amount
-                        performance_history.append("Loss")
-                        print(f"Round {round_num}: Loss. Sell price: {sell_price}. Current balance: {current_balance}.")
-                        current_bet_amount = min(current_bet_amount * 2, MAX_BET_AMOUNT)
-                    else:
-                        total_wins += 1
-                        total_pnl += (sell_price - current_bet_amount)
-                        performance_history.append("Win")
-                        print(f"Round {round_num}: Win! Sell price: {sell_price}. Current balance: {current_balance}.")
-                        current_bet_amount = BET_AMOUNT  # Reset to base bet amount
+                started = time.perf_counter()
+                proposal = await proposals.get(request)
+                metrics.since('proposal', started)
+                proposal_id = proposal.get('id')
+                if not proposal_id:
+                    print("Failed to get proposal")
+                else:
+                    try:
+                        started = time.perf_counter()
+                        buy_response = await connection.send({"buy": proposal_id, "price": bet_amount})
+                        metrics.since('buy', started)
+                        contract_id = buy_response.get('buy', {}).get('contract_id')
+                        if not contract_id:
+                            print("Failed to get contract ID")
+                        else:
+                            journal.record('buy', symbol=symbol, round=round_num, proposal_id=proposal_id,
+                                           contract_id=contract_id, stake=bet_amount,
+                                           buy_price=buy_response['buy'].get('buy_price'),
+                                           payout=buy_response['buy'].get('payout'))
+                    except APIError as e:
+                        metrics.inc('errors_total', stage='buy')
+                        journal.record('error', stage='buy', symbol=symbol, round=round_num,
+                                       proposal_id=proposal_id, error=str(e))
+                        print(f"Failed to buy: {e}")
+                        proposals.invalidate(request)
             except APIError as e:
-                print(f"Failed to fetch profit table: {e}")
-        
-        # Update balance and round counter
-        current_balance = initial_balance + total_pnl
-        print(f"PnL: {total_pnl}, Wins: {total_wins}, Losses: {total_losses}")
+                metrics.inc('errors_total', stage='proposal')
+                journal.record('error', stage='proposal', symbol=symbol, round=round_num, error=str(e))
+                print(f"Failed to get proposal: {e}")
+        except (ConnectionError, asyncio.CancelledError):
+            # Connection lost mid-round. A buy that reached the server before
+            # the drop can't be confirmed and is not tracked.
+            bankroll.release(ticket)
+            martingale.release(chain)
+            raise
 
-        # Check for stop loss or take profit conditions
-        if total_pnl >= TAKE_PROFIT:
-            print("Take profit reached. Stopping bot.")
-            break
-        elif total_pnl <= -STOP_LOSS:
-            print("Stop loss reached. Stopping bot.")
-            break
-        
-        round_num += 1
-    
-    await api.logout()
+        if not contract_id:
+            bankroll.release(ticket)
+            martingale.release(chain)
+            state.round_num += 1
+            continue
+
+        metrics.since('tick_to_buy', tick_time)
+        metrics.inc('trades_total', symbol=symbol)
+        track_contract(settlement, state, contract_id, round_num, chain, ticket, bet_amount)
+        state.round_num += 1
+
+    if state.decision_queue.coalesced:
+        print(f"{symbol}: Coalesced {state.decision_queue.coalesced} of {state.decision_queue.queued} "
+              f"tick decisions while busy")
+
+async def sample_calls(connection):
+    global initial_balance
+
+    settlement = SettlementTracker(connection)
+    proposals = ProposalCache(connection, max_entries=4 * len(states))  # Streaming proposals, ready to buy
+
+    await connection.send({"authorize": api_token})
+    balance = await connection.send({"balance": 1})
+    if initial_balance is None:
+        initial_balance = balance['balance']['balance']  # Kept from the first session across reconnects
+
+    # Contracts bought before a reconnect or restart settle on this connection
+    for contract_id, (symbol, round_num, chain, ticket, stake) in list(unsettled.items()):
+        track_contract(settlement, states[symbol], contract_id, round_num, chain, ticket, stake)
+
+    # Every symbol trades concurrently on this event loop and connection
+    await asyncio.gather(*(trade_symbol(connection, state, settlement, proposals)
+                           for state in states.values()))
+
+    if open_trades:
+        await asyncio.gather(*open_trades)
+    if len(states) > 1:
+        for state in states.values():
+            print(f"{state.symbol}: PnL: {state.pnl}, Wins: {state.wins}, Losses: {state.losses}")
+    await proposals.close()
+    await connection.send({"logout": 1})
+
+async def session(connection):
+    # Ticks and trading share one connection and the event loop thread
+    await connection.configure_limits()  # Paces every call under the server's rate limits
+    await asyncio.gather(*(subscribe_ticks(connection, state) for state in states.values()))
+    await sample_calls(connection)
+
+async def main():
+    restore_checkpoint()
+    exporters = await start_exporters(metrics, METRICS_PORT, METRICS_FILE)
+    journal.start()
+    delay = RECONNECT_DELAY
+    finished = False
+    try:
+        while True:
+            try:
+                connection = await DerivConnection(URL).connect()
+            except OSError as e:
+                print(f"Failed to connect: {e}")
+            else:
+                try:
+                    await connection.run(session(connection))
+                    finished = True
+                    break
+                except APIError as e:
+                    print(f"Error: {e}")
+                    break
+                except ConnectionError:
+                    metrics.inc('reconnects_total')
+                    print("Connection lost")
+                    delay = RECONNECT_DELAY
+                finally:
+                    # Contracts still open are tracked again on the next connection
+                    for trade in open_trades:
+                        trade.cancel()
+                    await asyncio.gather(*open_trades, return_exceptions=True)
+                    await connection.close()
+                    save_checkpoint(force=True)
+            print(f"Reconnecting in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+    finally:
+        await stop_exporters(metrics, exporters, METRICS_FILE)
+        journal.close()
+        if recorder is not None:
+            recorder.close()
+    if finished and checkpoint is not None and os.path.exists(checkpoint.path):
+        os.remove(checkpoint.path)  # The run is over, the next one starts fresh
 
 if __name__ == "__main__":
-    tick_thread = threading.Thread(target=subscribe_ticks)
-    tick_thread.start()
-    
-    asyncio.run(sample_calls())
+    asyncio.run(main())
@@ -0,0 +1,352 @@
+import argparse
+import math
+import os
+import time
+from collections import deque
+import numpy as np
+from tick_archive import TickArchive
+from tick_history import last_digits
+from ar_model import ARModel, digit_probabilities
+
+# Offline replay of the even/odd strategy from arima v2.py and the
+# over/under martingale from "100% win rate but no trades were taken on live.py".
+# Window statistics come from cumulative sums computed once over the whole
+# tick array, so each round is a handful of O(1) lookups instead of
+# rebuilding the window.
+
+DEFAULT_PARAMS = {
+    'BET_AMOUNT': 100,
+    'MAX_BET_AMOUNT': 10000,
+    'TOTAL_ROUNDS': None,  # None replays every available tick
+    'TAKE_PROFIT': 5000,
+    'STOP_LOSS': 50000,
+    'INITIAL_HISTORY_SIZE': 10,
+    'MAX_HISTORY_SIZE': 20,
+    'MIN_HISTORY_SIZE': 5,
+    'INITIAL_EVEN_THRESHOLD': 0.10,
+    'INITIAL_ODD_THRESHOLD': 0.10,
+    'ADAPTIVE_THRESHOLD_BASE': 0.05,
+    'MAX_ADJUSTMENT_FACTOR': 0.10,
+    'MIN_THRESHOLD': 0.05,
+    'MAX_THRESHOLD': 0.30,
+    'PERFORMANCE_WINDOW': 10,
+    'LOW_VOLATILITY': 0.1,
+    'HIGH_VOLATILITY': 0.3,
+    'AR_FORECAST': False,
+    'AR_ORDER': 2,
+    'AR_DIFFERENCES': 1,
+    'AR_FORGETTING': 0.999,
+    'PAYOUT': 1.95,  # sell_price / stake on a winning DIGITEVEN/DIGITODD, bought on basis 'stake' like live
+    'PIP_SIZE': 2,  # R_100 quotes have two decimals
+    'TICKS_PER_ROUND': 1,
+}
+
+FORECAST_BLOCK = 1000  # Ticks forecast at a time with AR_FORECAST
+
+# Same names as the globals in "100% win rate but no trades were taken on live.py"
+MARTINGALE_PARAMS = {
+    'bet_amount': 100,
+    'max_bet': 10000,
+    'martingale_multiplier': 1.5,
+    'take_profit': 5000,
+    'stop_loss': 5000,
+    'payout_under_5': 1.43,
+    'payout_over_4': 1.43,
+    'pip_size': 2,
+}
+
+
+def load_quotes(path):
+    if os.path.exists(path + '.quote'):
+        # A symbol in a tick archive, e.g. tick_archive/R_100
+        return TickArchive(os.path.dirname(path) or '.').ticks(os.path.basename(path))[1]
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    return np.loadtxt(path, delimiter=',', ndmin=1)
+
+
+def window_sums(quotes):
+    # The live bot works on int(quote), so the statistics do too
+    ticks = np.asarray(quotes, dtype=np.float64).astype(np.int64)
+    even_cum = np.concatenate(([0], np.cumsum(ticks % 2 == 0)))
+    diffs = np.diff(ticks)
+    diff_cum = np.concatenate(([0], np.cumsum(diffs)))
+    diff_sq_cum = np.concatenate(([0], np.cumsum(diffs * diffs)))
+    return even_cum, diff_cum, diff_sq_cum
+
+
+def forecast_even(quotes, p, block=FORECAST_BLOCK):
+    # Yields the even probability of tick t + 1 from the AR forecast after
+    # tick t, NaN while the forecaster is not ready. The model is stepped
+    # through every tick exactly as update_data does live, `block` ticks at
+    # a time, so a run that stops early doesn't pay for the rest
+    model = ARModel(p['AR_ORDER'], p['AR_DIFFERENCES'], p['AR_FORGETTING'])
+    quotes = np.asarray(quotes, dtype=np.float64)
+    for start in range(0, len(quotes), block):
+        chunk = quotes[start:start + block].tolist()
+        means = np.zeros(len(chunk))
+        stds = np.full(len(chunk), np.inf)
+        for t, quote in enumerate(chunk):
+            model.update(quote)
+            if model.ready():
+                mean, std = model.forecast([0])
+                means[t], stds[t] = mean[0], std[0]
+        even = digit_probabilities(means, stds, np.full(len(chunk), p['PIP_SIZE']))[:, 0::2].sum(axis=1)
+        even[np.isinf(stds)] = np.nan
+        yield from even.tolist()
+
+
+def run_backtest(quotes, params=None):
+    p = dict(DEFAULT_PARAMS)
+    if params:
+        p.update(params)
+
+    quotes = np.asarray(quotes)
+    n_ticks = len(quotes)
+    even_cum, diff_cum, diff_sq_cum = (a.tolist() for a in window_sums(quotes))
+    # The 1-tick contract bought on tick t settles on the digit of tick t + 1
+    next_even = (last_digits(quotes[1:], p['PIP_SIZE']) % 2 == 0).tolist()
+
+    bet_amount = p['BET_AMOUNT']
+    max_bet = p['MAX_BET_AMOUNT']
+    payout = p['PAYOUT']
+    even_threshold = p['INITIAL_EVEN_THRESHOLD']
+    odd_threshold = p['INITIAL_ODD_THRESHOLD']
+    history_size = p['INITIAL_HISTORY_SIZE']
+    min_size, max_size = p['MIN_HISTORY_SIZE'], p['MAX_HISTORY_SIZE']
+    low_vol, high_vol = p['LOW_VOLATILITY'], p['HIGH_VOLATILITY']
+    window = p['PERFORMANCE_WINDOW']
+    take_profit, stop_loss = p['TAKE_PROFIT'], p['STOP_LOSS']
+
+    recent = deque(maxlen=window)
+    recent_wins = 0
+    current_bet = bet_amount
+    total_pnl = 0.0
+    peak_pnl = 0.0
+    max_drawdown = 0.0
+    wins = losses = skipped_data = skipped_confidence = 0
+    stopped = None
+
+    # The live bot seeds its window with INITIAL_HISTORY_SIZE ticks before round 1
+    first = min(p['INITIAL_HISTORY_SIZE'], n_ticks) - 1
+    last = n_ticks - 2  # Need one more tick to settle
+    round_ticks = range(max(first, 0), last + 1, p['TICKS_PER_ROUND'])
+    if p['TOTAL_ROUNDS'] is not None:
+        round_ticks = round_ticks[:p['TOTAL_ROUNDS']]
+    even_forecast = None
+    if p['AR_FORECAST'] and len(round_ticks):
+        # Only up to the last tick a round can be decided on
+        even_forecast = forecast_even(quotes[:round_ticks[-1] + 1], p)
+        forecast_tick = -1
+
+    rounds = 0
+    for t in round_ticks:
+        rounds += 1
+
+        # update_probability_thresholds
+        if len(recent) >= window:
+            recent_losses = window - recent_wins
+            ratio = recent_wins / recent_losses if recent_losses > 0 else math.inf
+            adjustment = min(p['MAX_ADJUSTMENT_FACTOR'], p['ADAPTIVE_THRESHOLD_BASE'] * ratio)
+            if ratio > 1:
+                even_threshold = min(even_threshold + adjustment, p['MAX_THRESHOLD'])
+                odd_threshold = min(odd_threshold + adjustment, p['MAX_THRESHOLD'])
+            else:
+                even_threshold = max(even_threshold - adjustment, p['MIN_THRESHOLD'])
+                odd_threshold = max(odd_threshold - adjustment, p['MIN_THRESHOLD'])
+
+        # adjust_history_size, volatility over the current window
+        n = min(history_size, t + 1)
+        if n >= 2:
+            m = n - 1
+            s = diff_cum[t] - diff_cum[t - m]
+            sq = diff_sq_cum[t] - diff_sq_cum[t - m]
+            volatility = math.sqrt(max((sq * m - s * s) / (m * m), 0))
+        else:
+            volatility = 0
+        if volatility < low_vol:
+            history_size = min(history_size + 1, max_size)
+        elif volatility > high_vol:
+            history_size = max(history_size - 1, min_size)
+
+        # predict_even_odd
+        if even_forecast is not None:
+            while forecast_tick < t:
+                even_prob = next(even_forecast)
+                forecast_tick += 1
+            if even_prob != even_prob:  # NaN, forecaster not ready
+                skipped_data += 1
+                continue
+            odd_prob = 1 - even_prob
+        else:
+            if t + 1 < history_size:
+                skipped_data += 1
+                continue
+            even_count = even_cum[t + 1] - even_cum[t + 1 - history_size]
+            even_prob = even_count / history_size
+            odd_prob = (history_size - even_count) / history_size
+        if even_prob == odd_prob:
+            skipped_data += 1
+            continue
+        if even_prob > odd_prob:
+            predicted_even = True
+            probability = even_prob
+            threshold = even_threshold
+        else:
+            predicted_even = False
+            probability = odd_prob
+            threshold = odd_threshold
+        if probability < threshold:
+            skipped_confidence += 1
+            continue
+
+        if predicted_even == next_even[t]:
+            wins += 1
+            total_pnl += current_bet * payout - current_bet
+            if len(recent) == window and recent[0]:
+                recent_wins -= 1
+            recent.append(True)
+            recent_wins += 1
+            current_bet = bet_amount
+        else:
+            losses += 1
+            total_pnl -= current_bet
+            if len(recent) == window and recent[0]:
+                recent_wins -= 1
+            recent.append(False)
+            current_bet = min(current_bet * 2, max_bet)
+
+        if total_pnl > peak_pnl:
+            peak_pnl = total_pnl
+        elif peak_pnl - total_pnl > max_drawdown:
+            max_drawdown = peak_pnl - total_pnl
+
+        if total_pnl >= take_profit:
+            stopped = 'take_profit'
+            break
+        elif total_pnl <= -stop_loss:
+            stopped = 'stop_loss'
+            break
+
+    return {
+        'rounds': rounds,
+        'pnl': total_pnl,
+        'wins': wins,
+        'losses': losses,
+        'skipped_insufficient_data': skipped_data,
+        'skipped_low_confidence': skipped_confidence,
+        'max_drawdown': max_drawdown,
+        'stopped': stopped,
+        'final_bet_amount': current_bet,
+    }
+
+
+def run_martingale_backtest(quotes, params=None):
+    p = dict(MARTINGALE_PARAMS)
+    if params:
+        p.update(params)
+
+    digits = last_digits(quotes, p['pip_size'])
+    # predict_trade_type on the digit of tick t, calculate_payout on tick t + 1
+    over = digits[:-1] > 4
+    won = np.where(over, digits[1:] > 4, digits[1:] < 5).tolist()
+    payouts = np.where(over, p['payout_over_4'], p['payout_under_5']).tolist()
+
+    initial_bet = p['bet_amount']
+    max_bet = p['max_bet']
+    multiplier = p['martingale_multiplier']
+    take_profit, stop_loss = p['take_profit'], p['stop_loss']
+
+    bet_amount = initial_bet
+    total_pnl = 0.0
+    peak_pnl = 0.0
+    max_drawdown = 0.0
+    wins = losses = 0
+    stopped = None
+
+    for win, payout in zip(won, payouts):
+        if win:
+            total_pnl += bet_amount * payout  # Same accounting as trade()
+            wins += 1
+            bet_amount = initial_bet
+        else:
+            total_pnl -= bet_amount
+            losses += 1
+            bet_amount = min(bet_amount * multiplier, max_bet)
+
+        if total_pnl > peak_pnl:
+            peak_pnl = total_pnl
+        elif peak_pnl - total_pnl > max_drawdown:
+            max_drawdown = peak_pnl - total_pnl
+
+        if total_pnl >= take_profit:
+            stopped = 'take_profit'
+            break
+        elif -total_pnl >= stop_loss:
+            stopped = 'stop_loss'
+            break
+
+    return {
+        'rounds': wins + losses,
+        'pnl': total_pnl,
+        'wins': wins,
+        'losses': losses,
+        'skipped_insufficient_data': 0,
+        'skipped_low_confidence': 0,
+        'max_drawdown': max_drawdown,
+        'stopped': stopped,
+        'final_bet_amount': bet_amount,
+    }
+
+
+STRATEGIES = {
+    'arima': (run_backtest, DEFAULT_PARAMS),
+    'martingale': (run_martingale_backtest, MARTINGALE_PARAMS),
+}
+
+
+def print_result(result):
+    print(f"Rounds: {result['rounds']}")
+    print(f"Skipped (insufficient data): {result['skipped_insufficient_data']}")
+    print(f"Skipped (low confidence): {result['skipped_low_confidence']}")
+    print(f"PnL: {result['pnl']}, Wins: {result['wins']}, Losses: {result['losses']}")
+    print(f"Max drawdown: {result['max_drawdown']}")
+    if result['stopped'] == 'take_profit':
+        print("Take profit reached. Stopping bot.")
+    elif result['stopped'] == 'stop_loss':
+        print("Stop loss reached. Stopping bot.")
+
+
+def parse_value(defaults, key, value):
+    if key not in defaults:
+        raise SystemExit(f"Unknown parameter: {key}")
+    if value == 'None':
+        return None
+    if isinstance(defaults[key], bool):
+        return value.lower() in ('1', 'true', 'yes')
+    return type(defaults[key] or 0)(value)
+
+
+def parse_overrides(pairs, defaults=DEFAULT_PARAMS):
+    params = {}
+    for pair in pairs:
+        key, _, value = pair.partition('=')
+        params[key] = parse_value(defaults, key, value)
+    return params
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded ticks through a bot strategy")
+    parser.add_argument('ticks', help=".npy array, CSV/text file of tick quotes or ARCHIVE_DIR/SYMBOL")
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='arima')
+    parser.add_argument('--set', nargs='*', default=[], metavar='KEY=VALUE',
+                        help="Override a strategy constant, e.g. MAX_HISTORY_SIZE=200")
+    args = parser.parse_args()
+
+    run, defaults = STRATEGIES[args.strategy]
+    quotes = load_quotes(args.ticks)
+    start = time.perf_counter()
+    result = run(quotes, parse_overrides(args.set, defaults))
+    elapsed = time.perf_counter() - start
+    print_result(result)
+    print(f"Replayed {len(quotes)} ticks in {elapsed:.2f}s")
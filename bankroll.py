@@ -0,0 +1,101 @@
+import asyncio
+import itertools
+
+
+# Ledger for contracts in flight. Stake is reserved when a buy is placed
+# and released with the realized PnL when the contract settles. Stop loss
+# is enforced against realized PnL minus everything still reserved, so
+# open contracts can never push the worst case past it.
+class Bankroll:
+
+    def __init__(self, take_profit, stop_loss):
+        self.take_profit = take_profit
+        self.stop_loss = stop_loss
+        self.realized = 0.0
+        self.reserved = 0.0
+        self.open = {}  # ticket -> reserved stake
+        self.tickets = itertools.count(1)
+
+    def __len__(self):
+        return len(self.open)
+
+    def worst_case(self):
+        return self.realized - self.reserved
+
+    def can_reserve(self, stake):
+        return self.worst_case() - stake > -self.stop_loss
+
+    def reserve(self, stake, force=False):
+        # Returns a ticket, or None if the stake would breach the stop loss.
+        # force=True is for contracts that are already open, e.g. restored
+        # from a checkpoint
+        if not force and not self.can_reserve(stake):
+            return None
+        ticket = next(self.tickets)
+        self.open[ticket] = stake
+        self.reserved += stake
+        return ticket
+
+    def release(self, ticket, pnl=0.0):
+        # pnl=0 for a reservation whose buy never went through
+        self.reserved -= self.open.pop(ticket)
+        self.realized += pnl
+
+    def take_profit_reached(self):
+        return self.realized >= self.take_profit
+
+    def stop_loss_reached(self):
+        return self.realized <= -self.stop_loss
+
+
+# Independent martingale chains, one per contract slot. A losing contract
+# only escalates the stake of its own chain, so concurrent contracts don't
+# inherit each other's doubling. With one chain this is the plain serial
+# martingale the bots used before.
+class MartingaleChains:
+
+    def __init__(self, base_stake, multiplier, max_stake, count=1):
+        self.base_stake = base_stake
+        self.multiplier = multiplier
+        self.max_stake = max_stake
+        self.stakes = [base_stake] * count
+        self.busy = [False] * count
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    def __len__(self):
+        return len(self.stakes)
+
+    def in_flight(self):
+        return sum(self.busy)
+
+    async def acquire(self):
+        # Waits for an idle chain and returns its index
+        while True:
+            for chain, busy in enumerate(self.busy):
+                if not busy:
+                    self.busy[chain] = True
+                    if all(self.busy):
+                        self.idle.clear()
+                    return chain
+            await self.idle.wait()
+
+    def claim(self, chain):
+        # Marks a chain busy with a contract that is already open
+        self.busy[chain] = True
+        if all(self.busy):
+            self.idle.clear()
+
+    def release(self, chain):
+        self.busy[chain] = False
+        self.idle.set()
+
+    def stake(self, chain):
+        return self.stakes[chain]
+
+    def settle(self, chain, won):
+        if won:
+            self.stakes[chain] = self.base_stake
+        else:
+            self.stakes[chain] = min(self.stakes[chain] * self.multiplier, self.max_stake)
+        self.release(chain)
@@ -0,0 +1,435 @@
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+# Benchmarks of the per-tick decision code of the three bots, run offline
+# on synthetic or recorded ticks. The bot scripts are imported with
+# recording, checkpoints and the journal turned off, and their functions
+# are called directly, or through DerivConnection.dispatch for the
+# on_message path. Results are compared with a stored baseline and any
+# regression past the tolerance makes the run exit with status 1. Every
+# timed run is preceded by a fixed calibration loop, and what is compared
+# is the run's time in iterations of that loop, so a box that is slower or
+# faster than when the baseline was saved, or that changes speed part way
+# through, doesn't show up as a change.
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+TICKS = 10000  # Ticks per benchmark run
+REPEATS = 5  # Timed runs per benchmark, the median counts
+MIN_RUN_TIME = 0.1  # Seconds each repeat of a rerunnable benchmark keeps running
+CALIBRATION_LOOPS = 10000  # Iterations of the calibration loop timed before each run
+HISTORY_SIZES = (20, 1000, 10000)  # arima v2 tick window sizes
+SYMBOL_COUNTS = (1, 10)
+TOLERANCE = 0.5  # Allowed slowdown against the baseline, as a fraction; calibrated timings still vary by up to a third between runs
+BLOCK_TOLERANCE = 0.05  # Allowed extra memory blocks retained per tick
+PEAK_SLACK_KIB = 64.0  # Allowed peak memory growth on top of the tolerance
+BOT_ENV = {'DERIV_TOKEN': 'bench', 'DERIV_TICK_ARCHIVE': '', 'DERIV_CHECKPOINT': '', 'DERIV_JOURNAL': '',
+           'DERIV_TRANSACTIONS': '', 'DERIV_METRICS_PORT': '', 'DERIV_METRICS_FILE': ''}
+
+bots = {}
+
+
+def load_bot(name, filename):
+    # Imports a bot script as a module; their main() only runs as __main__
+    if name not in bots:
+        os.environ.update(BOT_ENV)
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        bots[name] = module
+    return bots[name]
+
+
+def synthetic_quotes(count, seed=0):
+    # Random walk around 1000 with two decimals, like R_100
+    rng = np.random.default_rng(seed)
+    return np.round(1000 + np.cumsum(rng.normal(0, 0.3, count)), 2)
+
+
+def symbol_names(count):
+    return [f"R_{index}" for index in range(count)]
+
+
+def tick_messages(quotes, symbols, pip_size):
+    # Raw tick stream messages as the API sends them, dealt to the symbols
+    # in turn, with epochs rising per symbol
+    messages = []
+    for index, quote in enumerate(quotes.tolist()):
+        symbol = symbols[index % len(symbols)]
+        sub_id = f"sub-{symbol}"
+        messages.append(json.dumps({
+            'echo_req': {'ticks': symbol, 'subscribe': 1}, 'msg_type': 'tick', 'req_id': 1,
+            'subscription': {'id': sub_id},
+            'tick': {'epoch': 1700000000 + index // len(symbols) + 1, 'id': sub_id, 'pip_size': pip_size,
+                     'quote': quote, 'symbol': symbol}}))
+    return messages
+
+
+def subscribed_connection(callback, symbols):
+    from deriv_connection import DerivConnection
+    connection = DerivConnection('ws://bench')
+    for symbol in symbols:
+        connection.subscriptions[f"sub-{symbol}"] = callback
+    return connection
+
+
+def arima_states(history, symbols, pip_size, count):
+    # Fresh per-symbol state in arima v2 with a `history` tick window, and
+    # the state each of `count` ticks goes to
+    bot = load_bot('arima_v2', 'arima v2.py')
+    bot.INITIAL_HISTORY_SIZE = bot.MAX_HISTORY_SIZE = history
+    bot.MIN_HISTORY_SIZE = max(1, history // 2)
+    bot.SYMBOLS = symbols
+    bot.states = {symbol: bot.SymbolState(symbol, stream) for stream, symbol in enumerate(symbols)}
+    for state in bot.states.values():
+        state.pip_size = pip_size
+    bot.forecaster = bot.ARModel(bot.AR_ORDER, bot.AR_DIFFERENCES, bot.AR_FORGETTING, streams=len(symbols))
+    bot.metrics = bot.Metrics('arima')
+    return bot, [bot.states[symbols[index % len(symbols)]] for index in range(count)]
+
+
+def simplebot_model(symbols):
+    bot = load_bot('simplebot', 'simplederivbot2.py')
+    bot.SYMBOLS = symbols
+    bot.states = {symbol: bot.SymbolState(symbol, stream) for stream, symbol in enumerate(symbols)}
+    bot.model = bot.MarkovModel(bot.MARKOV_ORDER, bot.MARKOV_DECAY, streams=len(symbols))
+    bot.metrics = bot.Metrics('simplebot')
+    return bot
+
+
+# Each benchmark takes (quotes, history, symbols, pip_size) and returns a
+# function that runs it once over the ticks; all state is built fresh
+# before the run so repeats are independent and setup is not timed.
+
+def bench_update_data(quotes, history, symbols, pip_size):
+    bot, states = arima_states(history, symbols, pip_size, len(quotes))
+    ticks = quotes.tolist()
+
+    def run():
+        for state, tick in zip(states, ticks):
+            bot.update_data(state, tick)
+    return run
+
+
+def bench_ar_update(quotes, history, symbols, pip_size):
+    # The forecaster step update_data adds when AR_FORECAST or AR_LOG_FORECAST is on
+    bot, states = arima_states(history, symbols, pip_size, len(quotes))
+    ticks = quotes.tolist()
+
+    def run():
+        for state, tick in zip(states, ticks):
+            bot.forecaster.update(tick, state.stream)
+    return run
+
+
+def arima_filled(quotes, history, symbols, pip_size):
+    # States whose windows are already full, and the symbol order of the ticks
+    bot, states = arima_states(history, symbols, pip_size, len(quotes))
+    for state, tick in zip(states, quotes[:history * len(symbols)].tolist()):
+        bot.update_data(state, tick)
+    return bot, states
+
+
+def bench_normalize_counts(quotes, history, symbols, pip_size):
+    bot, states = arima_filled(quotes, history, symbols, pip_size)
+
+    def run():
+        for state in states:
+            bot.normalize_counts(state)
+    return run
+
+
+def bench_calculate_volatility(quotes, history, symbols, pip_size):
+    bot, states = arima_filled(quotes, history, symbols, pip_size)
+
+    def run():
+        for state in states:
+            bot.calculate_volatility(state)
+    return run
+
+
+def bench_adjust_history_size(quotes, history, symbols, pip_size):
+    # Interleaved with update_data so the window keeps moving
+    bot, states = arima_filled(quotes, history, symbols, pip_size)
+    ticks = quotes.tolist()
+
+    def run():
+        for state, tick in zip(states, ticks):
+            bot.update_data(state, tick)
+            bot.adjust_history_size(state)
+    return run
+
+
+def bench_update_probability_thresholds(quotes, history, symbols, pip_size):
+    # One settled trade per round, as in live trading
+    bot, states = arima_states(history, symbols, pip_size, len(quotes))
+    outcomes = (np.asarray(quotes) * 10 ** pip_size % 2 < 1).tolist()
+
+    def run():
+        for state, won in zip(states, outcomes):
+            state.performance.record(1.0 if won else -1.0, won)
+            bot.update_probability_thresholds(state)
+    return run
+
+
+def bench_arima_on_message(quotes, history, symbols, pip_size):
+    bot, _ = arima_states(history, symbols, pip_size, len(quotes))
+    connection = subscribed_connection(bot.on_message, symbols)
+    messages = tick_messages(quotes, symbols, pip_size)
+
+    def run():
+        for raw in messages:
+            connection.dispatch(json.loads(raw))
+    return run
+
+
+def bench_markov_update(quotes, history, symbols, pip_size):
+    from tick_history import last_digits
+    bot = simplebot_model(symbols)
+    model = bot.model
+    streams = [index % len(symbols) for index in range(len(quotes))]
+    digits = last_digits(quotes, pip_size).tolist()
+
+    def run():
+        for stream, digit in zip(streams, digits):
+            model.update(digit, stream)
+    return run
+
+
+def bench_markov_predict(quotes, history, symbols, pip_size):
+    # The argmax of trade_symbol, after every tick
+    from tick_history import last_digits
+    bot = simplebot_model(symbols)
+    model = bot.model
+    streams = [index % len(symbols) for index in range(len(quotes))]
+    digits = last_digits(quotes, pip_size).tolist()
+
+    def run():
+        for stream, digit in zip(streams, digits):
+            model.update(digit, stream)
+            if model.ready(stream):
+                int(model.predict([stream])[0])
+    return run
+
+
+def bench_simplebot_on_message(quotes, history, symbols, pip_size):
+    bot = simplebot_model(symbols)
+    connection = subscribed_connection(bot.on_tick, symbols)
+    messages = tick_messages(quotes, symbols, pip_size)
+
+    def run():
+        for raw in messages:
+            connection.dispatch(json.loads(raw))
+    return run
+
+
+def bench_martingale_decision(quotes, history, symbols, pip_size):
+    # predict_trade_type on a tick's last digit, calculate_payout on the next
+    from tick_history import last_digits
+    bot = load_bot('martingale', '100% win rate but no trades were taken on live.py')
+    digits = last_digits(quotes, pip_size).tolist()
+    pairs = list(zip(digits[:-1], digits[1:]))
+
+    def run():
+        for digit, next_digit in pairs:
+            bot.calculate_payout(bot.predict_trade_type(digit), next_digit)
+    return run
+
+
+# name -> (benchmark, varies with history size, varies with symbol count,
+# can run again on the same state). Runs of the cheap read-only ones take
+# a few milliseconds, so they are repeated on one setup for MIN_RUN_TIME
+# to get past scheduler noise.
+BENCHMARKS = {
+    'arima.update_data': (bench_update_data, True, False, False),
+    'arima.ar_update': (bench_ar_update, False, True, False),
+    'arima.normalize_counts': (bench_normalize_counts, True, False, True),
+    'arima.calculate_volatility': (bench_calculate_volatility, True, False, True),
+    'arima.adjust_history_size': (bench_adjust_history_size, True, False, False),
+    'arima.update_probability_thresholds': (bench_update_probability_thresholds, False, False, False),
+    'arima.on_message': (bench_arima_on_message, False, True, False),
+    'simplebot.markov_update': (bench_markov_update, False, True, True),
+    'simplebot.markov_predict': (bench_markov_predict, False, True, False),
+    'simplebot.on_message': (bench_simplebot_on_message, False, True, False),
+    'martingale.decision': (bench_martingale_decision, False, False, True),
+}
+
+
+def cases(streams, names, history_sizes, symbol_counts):
+    # (case name, benchmark, rerun, quotes, history, symbols) for every combination
+    # a benchmark depends on
+    for stream, quotes in streams.items():
+        for name in names:
+            benchmark, by_history, by_symbols, rerun = BENCHMARKS[name]
+            for history in history_sizes if by_history else history_sizes[:1]:
+                for count in symbol_counts if by_symbols else symbol_counts[:1]:
+                    labels = [f"ticks={stream}"]
+                    if by_history:
+                        labels.append(f"history={history}")
+                    if by_symbols:
+                        labels.append(f"symbols={count}")
+                    yield f"{name}[{','.join(labels)}]", benchmark, rerun, quotes, history, symbol_names(count)
+
+
+def traced(benchmark, quotes, history, symbols, pip_size):
+    # Memory blocks still allocated after one run, and the peak traced
+    # memory in bytes during it
+    run = benchmark(quotes, history, symbols, pip_size)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        base, _ = tracemalloc.get_traced_memory()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    return sum(stat.count_diff for stat in after.compare_to(before, 'filename')), peak - base
+
+
+def calibration_loop():
+    # Fixed interpreter work of the kind the per-tick code does: integer
+    # arithmetic, list and dict access and method calls
+    counts = [0] * 10
+    seen = {}
+    for index in range(CALIBRATION_LOOPS):
+        digit = index * 7919 % 10
+        counts[digit] += 1
+        seen[digit] = seen.get(digit, 0) + 1
+    return counts, seen
+
+
+def measure(benchmark, rerun, quotes, history, symbols, pip_size, repeats):
+    # Median of `repeats` runs in ns per tick and in calibration loop
+    # iterations per tick, each run against the loop timed just before it,
+    # then traced runs over half
+    # and all of the ticks. The blocks the second half of the ticks leaves
+    # allocated on top of the first is the growth per tick (an unbounded
+    # history list); state that stays the same size however many ticks
+    # come, such as a filled window, cancels out. Peak is the traced memory
+    # of the full run
+    times = []
+    loops = []
+    for _ in range(repeats):
+        run = benchmark(quotes, history, symbols, pip_size)
+        gc.collect()
+        ends = time.perf_counter() + (MIN_RUN_TIME if rerun else 0)
+        while True:
+            started = time.perf_counter_ns()
+            calibration_loop()
+            calibration = time.perf_counter_ns() - started
+            started = time.perf_counter_ns()
+            run()
+            elapsed = time.perf_counter_ns() - started
+            times.append(elapsed)
+            loops.append(elapsed / calibration * CALIBRATION_LOOPS)
+            if time.perf_counter() >= ends:
+                break
+
+    half = len(quotes) // 2
+    half_blocks, _ = traced(benchmark, quotes[:half], history, symbols, pip_size)
+    blocks, peak = traced(benchmark, quotes, history, symbols, pip_size)
+    return {
+        'ns_per_tick': float(np.median(times)) / len(quotes),
+        'loops_per_tick': float(np.median(loops)) / len(quotes),
+        'blocks_per_tick': max(blocks - half_blocks, 0) / (len(quotes) - half),
+        'peak_kib': peak / 1024,
+    }
+
+
+def regressions(name, result, baseline, tolerance):
+    # Reasons this result is worse than its baseline entry
+    found = []
+    if result['loops_per_tick'] > baseline['loops_per_tick'] * (1 + tolerance):
+        found.append(f"{result['loops_per_tick']:.2f} calibration loops/tick, "
+                     f"baseline {baseline['loops_per_tick']:.2f}")
+    if result['blocks_per_tick'] > baseline['blocks_per_tick'] + BLOCK_TOLERANCE:
+        found.append(f"{result['blocks_per_tick']:.3f} blocks/tick retained, "
+                     f"baseline {baseline['blocks_per_tick']:.3f}")
+    if result['peak_kib'] > baseline['peak_kib'] * (1 + tolerance) + PEAK_SLACK_KIB:
+        found.append(f"{result['peak_kib']:.0f} KiB peak, baseline {baseline['peak_kib']:.0f}")
+    return found
+
+
+def environment():
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'processor': platform.processor() or platform.machine(), 'numpy': np.__version__}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bots' per-tick decision code offline")
+    parser.add_argument('--ticks', nargs='*', default=[], metavar='PATH',
+                        help="Recorded tick files (.npy, CSV or ARCHIVE_DIR/SYMBOL) to run besides synthetic ticks")
+    parser.add_argument('--count', type=int, default=TICKS, help="Ticks per run")
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--history', type=int, nargs='+', default=list(HISTORY_SIZES))
+    parser.add_argument('--symbols', type=int, nargs='+', default=list(SYMBOL_COUNTS))
+    parser.add_argument('--pip-size', type=int, default=2)
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--save-baseline', action='store_true', help="Write these results as the new baseline")
+    args = parser.parse_args()
+
+    streams = {'synthetic': synthetic_quotes(args.count)}
+    for path in args.ticks:
+        from backtest import load_quotes
+        quotes = np.asarray(load_quotes(path), dtype=np.float64)[:args.count]
+        if len(quotes) < args.count:
+            sys.exit(f"{path} has {len(quotes)} ticks, fewer than --count {args.count}")
+        streams[os.path.basename(path)] = quotes
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            saved = json.load(f)
+        baseline = saved['results']
+        if saved.get('ticks') != args.count:
+            # Time and peak memory per tick depend on the run length
+            sys.exit(f"Baseline {args.baseline} was recorded with --count {saved.get('ticks')}, "
+                     f"not {args.count}; rerun with that count or save a new baseline")
+        if saved.get('environment') != environment():
+            print(f"Baseline was recorded on {saved.get('environment')}, this is {environment()}; "
+                  f"timings may not be comparable")
+
+    results = {}
+    failed = []
+    print(f"{'benchmark':<72}{'ns/tick':>10}{'loops/tick':>12}{'blocks/tick':>13}{'peak KiB':>10}"
+          f"{'baseline':>10}{'change':>9}")
+    for name, benchmark, rerun, quotes, history, symbols in cases(streams, args.only, args.history, args.symbols):
+        result = results[name] = measure(benchmark, rerun, quotes, history, symbols, args.pip_size, args.repeats)
+        reference = baseline.get(name)
+        if reference:
+            change = f"{result['loops_per_tick'] / reference['loops_per_tick'] - 1:+.0%}"
+            found = regressions(name, result, reference, args.tolerance)
+            failed.extend((name, reason) for reason in found)
+        else:
+            change, found = 'new', []
+        print(f"{name:<72}{result['ns_per_tick']:>10.0f}{result['loops_per_tick']:>12.2f}"
+              f"{result['blocks_per_tick']:>13.3f}{result['peak_kib']:>10.1f}"
+              f"{reference['loops_per_tick'] if reference else 0:>10.2f}"
+              f"{change:>9}{'  REGRESSION' if found else ''}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'environment': environment(), 'ticks': args.count, 'results': results}, f, indent=1)
+        print(f"Saved {len(results)} results to {args.baseline}")
+    if failed:
+        print(f"\n{len(failed)} REGRESSIONS against {args.baseline}:")
+        for name, reason in failed:
+            print(f"  {name}: {reason}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
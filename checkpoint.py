@@ -0,0 +1,51 @@
+import os
+import pickle
+import time
+
+CHECKPOINT_VERSION = 1
+
+
+# Periodic snapshot of a bot's strategy state. The bot hands over a plain
+# dict (numbers, lists, NumPy arrays, TickStores) which is pickled to a
+# temporary file and renamed over the previous checkpoint, so a crash
+# mid-write never leaves a truncated file behind.
+class Checkpoint:
+
+    def __init__(self, path, interval=5.0):
+        self.path = path
+        self.interval = interval  # Minimum seconds between periodic saves
+        self.last_save = time.monotonic()
+        self.saves = 0
+
+    def load(self):
+        # Returns the saved dict, or None if there is no usable checkpoint
+        try:
+            with open(self.path, 'rb') as f:
+                saved = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            print(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+        if not isinstance(saved, dict) or saved.get('version') != CHECKPOINT_VERSION:
+            print(f"Ignoring checkpoint {self.path} from another version")
+            return None
+        return saved['state']
+
+    def save(self, state):
+        data = pickle.dumps({'version': CHECKPOINT_VERSION, 'saved_at': time.time(), 'state': state},
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, self.path)
+        self.last_save = time.monotonic()
+        self.saves += 1
+
+    def due(self):
+        return time.monotonic() - self.last_save >= self.interval
+
+    def maybe_save(self, make_state):
+        # make_state is only called when a save is due
+        if self.due():
+            self.save(make_state())
@@ -0,0 +1,154 @@
+import asyncio
+import itertools
+import json
+import websockets
+from scheduler import RequestScheduler, backoff_delay, limits_from_website_status, RETRY_LIMIT
+
+# One asyncio WebSocket to the Deriv API shared by requests and
+# subscriptions. Responses are matched to their request by req_id, and
+# stream messages are routed to a callback by subscription id, all on the
+# event loop thread. Every request passes the RequestScheduler first, so
+# the connection stays under the API's rate limits.
+
+
+class APIError(Exception):
+
+    def __init__(self, error, request=None):
+        self.code = error.get('code')
+        self.message = error.get('message', '')
+        self.request = request
+        super().__init__(f"{self.code}: {self.message}")
+
+
+class DerivConnection:
+
+    def __init__(self, url, scheduler=None):
+        self.url = url
+        self.scheduler = scheduler or RequestScheduler()
+        self.websocket = None
+        self.reader = None
+        self.req_ids = itertools.count(1)
+        self.pending = {}  # req_id -> (future, request)
+        self.stream_callbacks = {}  # req_id -> callback, until the subscription id is known
+        self.subscriptions = {}  # subscription id -> callback
+
+    async def connect(self):
+        self.websocket = await websockets.connect(self.url, max_size=None)
+        self.reader = asyncio.ensure_future(self.read_loop())
+        return self
+
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
+        if self.reader is not None:
+            await asyncio.gather(self.reader, return_exceptions=True)
+
+    async def run(self, coroutine):
+        # Runs the coroutine until it finishes or the connection drops; in
+        # the second case it is cancelled and ConnectionError is raised
+        task = asyncio.ensure_future(coroutine)
+        try:
+            await asyncio.wait({task, self.reader}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise ConnectionError("Connection to the Deriv API closed")
+        return task.result()
+
+    async def read_loop(self):
+        try:
+            async for raw in self.websocket:
+                self.dispatch(json.loads(raw))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for future, _ in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection to the Deriv API closed"))
+            self.pending.clear()
+            self.stream_callbacks.clear()
+
+    def dispatch(self, message):
+        req_id = message.get('req_id')
+        subscription = message.get('subscription')
+        entry = self.pending.pop(req_id, None)
+        if entry is not None:
+            future, request = entry
+            callback = self.stream_callbacks.pop(req_id, None)
+            if 'error' in message:
+                if not future.done():
+                    future.set_exception(APIError(message['error'], request))
+                return
+            if callback is not None:
+                # Deliver the first response here so it reaches the callback
+                # before any stream message that follows it
+                if subscription:
+                    self.subscriptions[subscription['id']] = callback
+                callback(message)
+            if not future.done():
+                future.set_result(message)
+            return
+        if subscription:
+            callback = self.subscriptions.get(subscription['id'])
+            if callback is not None:
+                callback(message)
+
+    async def configure_limits(self):
+        # Adopts the limits the server reports for this connection, keeping
+        # the defaults if it doesn't
+        try:
+            limits = limits_from_website_status(await self.send({'website_status': 1}))
+        except APIError:
+            return
+        if limits:
+            self.scheduler.configure(limits)
+
+    async def send(self, request, callback=None):
+        # Retries calls rejected with RateLimit after a jittered backoff
+        attempt = 0
+        while True:
+            await self.scheduler.acquire(request)
+            try:
+                return await self.send_now(request, callback)
+            except APIError as e:
+                if e.code != 'RateLimit' or attempt >= RETRY_LIMIT:
+                    raise
+            self.scheduler.retries += 1
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    async def send_now(self, request, callback=None):
+        request = dict(request)
+        req_id = next(self.req_ids)
+        request['req_id'] = req_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[req_id] = (future, request)
+        if callback is not None:
+            self.stream_callbacks[req_id] = callback
+        try:
+            await self.websocket.send(json.dumps(request))
+        except websockets.ConnectionClosed:
+            self.pending.pop(req_id, None)
+            self.stream_callbacks.pop(req_id, None)
+            raise ConnectionError("Connection to the Deriv API closed")
+        return await future
+
+    async def subscribe(self, request, callback):
+        # The first response is returned and also passed to the callback,
+        # later stream messages only go to the callback
+        return await self.send(dict(request, subscribe=1), callback)
+
+    def forget(self, subscription_id):
+        # Routing stops right away, the returned coroutine tells the server
+        self.subscriptions.pop(subscription_id, None)
+        return self.send({'forget': subscription_id})
+
+    def forget_later(self, subscription_id):
+        # For callbacks that can't await; a failed forget is not worth raising
+        task = asyncio.ensure_future(self.forget(subscription_id))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
@@ -0,0 +1,636 @@
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+import numpy as np
+import websockets
+
+# Local stand-in for the Deriv WebSocket API. It speaks the subset of the
+# protocol the bots use (authorize, balance, ticks/ticks_history, proposal,
+# buy, proposal_open_contract, profit_table, statement, forget,
+# website_status) and
+# replays recorded or synthetic ticks at a configurable rate. Digit contracts are settled from
+# the replayed quotes, so the bots can be load tested without an account.
+
+COMMISSION = 0.05  # Payout is stake * (1 - COMMISSION) / win probability
+HISTORY_SIZE = 20000  # Past ticks kept per symbol for ticks_history
+MAX_HISTORY_COUNT = 5000  # Per-request cap on ticks_history, like the real API
+MAX_REPORT_ROWS = 500  # Per-request cap on profit_table and statement rows
+UNLIMITED = 1000000  # Requests per minute reported when no limits are enforced
+
+# Calls counted by each rate limit besides 'general', which counts them all
+LIMITED_CALLS = {
+    'pricing': ('proposal', 'proposal_open_contract'),
+    'outcome': ('profit_table', 'statement', 'portfolio'),
+}
+LIMIT_KEYS = {'general': 'max_requestes_general', 'pricing': 'max_requests_pricing',
+              'outcome': 'max_requests_outcome'}
+
+
+def win_probability(contract_type, barrier):
+    if contract_type in ('DIGITEVEN', 'DIGITODD'):
+        return 0.5
+    if contract_type == 'DIGITOVER':
+        return (9 - barrier) / 10
+    if contract_type == 'DIGITUNDER':
+        return barrier / 10
+    if contract_type == 'DIGITMATCH':
+        return 0.1
+    if contract_type == 'DIGITDIFF':
+        return 0.9
+    return None
+
+
+def digit_wins(contract_type, barrier, digit):
+    if contract_type == 'DIGITEVEN':
+        return digit % 2 == 0
+    if contract_type == 'DIGITODD':
+        return digit % 2 == 1
+    if contract_type == 'DIGITOVER':
+        return digit > barrier
+    if contract_type == 'DIGITUNDER':
+        return digit < barrier
+    if contract_type == 'DIGITMATCH':
+        return digit == barrier
+    return digit != barrier
+
+
+def shortcode(contract):
+    # Same layout as the real API's digit contract shortcodes
+    return (f"{contract['contract_type']}_{contract['symbol']}_{contract['payout']}_"
+            f"{contract['purchase_time']}_{contract['duration']}T_{contract['barrier']}_0")
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    return float(np.percentile(values, q))
+
+
+class Market:
+    # One replayed symbol: a tick clock shared by every connection
+
+    def __init__(self, symbol, quotes, pip_size, rate, start_epoch):
+        self.symbol = symbol
+        self.quotes = quotes
+        self.pip_size = pip_size
+        self.rate = rate
+        self.position = 0
+        self.epoch = start_epoch
+        self.history_prices = []
+        self.history_times = []
+        self.last_tick_time = None  # perf_counter() of the last broadcast
+
+    def next_quote(self):
+        quote = round(float(self.quotes[self.position % len(self.quotes)]), self.pip_size)
+        self.position += 1
+        self.epoch += 1
+        self.history_prices.append(quote)
+        self.history_times.append(self.epoch)
+        if len(self.history_prices) > 2 * HISTORY_SIZE:
+            del self.history_prices[:-HISTORY_SIZE]
+            del self.history_times[:-HISTORY_SIZE]
+        return quote
+
+    def last_digit(self, quote):
+        return int(round(quote * 10 ** self.pip_size)) % 10
+
+
+class Stats:
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.ticks_sent = 0
+        self.buys = 0
+        self.first_buy = None
+        self.last_buy = None
+        self.tick_to_buy = []  # Seconds from the latest tick of the symbol to the buy
+        self.rate_limited = 0  # Requests rejected with RateLimit
+
+    def record_buy(self, market):
+        now = time.perf_counter()
+        self.buys += 1
+        if self.first_buy is None:
+            self.first_buy = now
+        self.last_buy = now
+        if market is not None and market.last_tick_time is not None:
+            self.tick_to_buy.append(now - market.last_tick_time)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        if self.buys > 1 and self.last_buy > self.first_buy:
+            trades_per_second = (self.buys - 1) / (self.last_buy - self.first_buy)
+        else:
+            trades_per_second = 0.0
+        latencies_ms = [x * 1000 for x in self.tick_to_buy]
+        return {
+            'elapsed': elapsed,
+            'ticks_sent': self.ticks_sent,
+            'buys': self.buys,
+            'trades_per_second': trades_per_second,
+            'tick_to_buy_p50_ms': percentile(latencies_ms, 50),
+            'tick_to_buy_p90_ms': percentile(latencies_ms, 90),
+            'tick_to_buy_p99_ms': percentile(latencies_ms, 99),
+            'tick_to_buy_max_ms': max(latencies_ms) if latencies_ms else None,
+            'rate_limited': self.rate_limited,
+        }
+
+
+class Account:
+    # Balance and contracts of one API token, kept across connections so a
+    # bot that reconnects finds its open contracts again
+
+    def __init__(self, balance):
+        self.balance = balance
+        self.contracts = {}  # contract id -> contract
+        self.open_contracts = {}  # contract id -> contract, until settled
+        self.settled = []  # Sold contracts, oldest first
+        self.statement = []  # Buy and sell transactions, oldest first
+
+
+class Client:
+
+    def __init__(self, websocket, account):
+        self.websocket = websocket
+        self.account = account  # Replaced by the token's account on authorize
+        self.subscriptions = {}  # subscription id -> (kind, detail)
+        self.proposals = {}  # proposal id -> contract parameters
+        self.calls = {name: deque() for name in LIMIT_KEYS}  # Request times within the last minute
+
+    async def send(self, message):
+        try:
+            await self.websocket.send(json.dumps(message))
+        except websockets.ConnectionClosed:
+            pass
+
+
+class FakeDerivServer:
+
+    def __init__(self, quotes_by_symbol=None, rate=1.0, pip_size=2, balance=10000.0, seed=0, limits=None):
+        self.quotes_by_symbol = dict(quotes_by_symbol or {})
+        self.limits = dict(limits or {})  # Enforced requests per minute per connection, by limit name
+        self.rate = rate
+        self.pip_size = pip_size
+        self.initial_balance = balance
+        self.rng = np.random.default_rng(seed)
+        self.markets = {}
+        self.market_tasks = []
+        self.clients = set()
+        self.accounts = {}  # API token -> Account
+        self.stats = Stats()
+        self.ids = itertools.count(1)
+        self.server = None
+
+    # Market replay
+
+    def market(self, symbol):
+        if symbol not in self.markets:
+            quotes = self.quotes_by_symbol.get(symbol)
+            if quotes is None:
+                # Synthetic random walk for symbols without recorded ticks
+                quotes = 1000 + np.cumsum(self.rng.normal(0, 0.3, 100000))
+            market = Market(symbol, np.asarray(quotes, dtype=np.float64), self.pip_size, self.rate,
+                            int(time.time()) - HISTORY_SIZE)
+            for _ in range(HISTORY_SIZE):
+                market.next_quote()
+            self.markets[symbol] = market
+            self.market_tasks.append(asyncio.ensure_future(self.replay(market)))
+        return self.markets[symbol]
+
+    async def replay(self, market):
+        loop = asyncio.get_running_loop()
+        interval = 1 / market.rate
+        next_time = loop.time()
+        while True:
+            next_time += interval
+            delay = next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -1:
+                next_time = loop.time()  # Fell behind, don't try to catch up in a burst
+            quote = market.next_quote()
+            await self.on_tick(market, quote)
+
+    async def on_tick(self, market, quote):
+        digit = market.last_digit(quote)
+        market.last_tick_time = time.perf_counter()
+        sends = []
+        for client in list(self.clients):
+            for sub_id, (kind, detail) in list(client.subscriptions.items()):
+                if kind == 'ticks' and detail['symbol'] == market.symbol:
+                    self.stats.ticks_sent += 1
+                    sends.append(client.send({
+                        'msg_type': 'tick',
+                        'echo_req': detail['echo_req'],
+                        'req_id': detail.get('req_id'),
+                        'tick': {'epoch': market.epoch, 'quote': quote, 'symbol': market.symbol,
+                                 'pip_size': market.pip_size, 'id': sub_id},
+                        'subscription': {'id': sub_id},
+                    }))
+                elif kind == 'proposal' and detail['symbol'] == market.symbol:
+                    sends.append(client.send(self.proposal_message(client, detail, quote, sub_id)))
+        # Contracts keep running while their owner is disconnected
+        for account in set(self.accounts.values()) | {client.account for client in self.clients}:
+            for contract in list(account.open_contracts.values()):
+                if contract['symbol'] != market.symbol:
+                    continue
+                contract['ticks_left'] -= 1
+                contract['current_spot'] = quote
+                if contract['ticks_left'] <= 0:
+                    self.settle(account, contract, digit, quote, market.epoch)
+                for client in self.clients:
+                    if client.account is account:
+                        sends.extend(self.contract_updates(client, contract))
+        if sends:
+            await asyncio.gather(*sends)
+
+    def settle(self, account, contract, digit, quote, epoch):
+        won = digit_wins(contract['contract_type'], contract['barrier'], digit)
+        contract['is_sold'] = 1
+        contract['status'] = 'won' if won else 'lost'
+        contract['sell_price'] = contract['payout'] if won else 0
+        contract['profit'] = round(contract['sell_price'] - contract['buy_price'], 2)
+        contract['exit_tick'] = quote
+        contract['sell_time'] = epoch
+        contract['transaction_ids']['sell'] = next(self.ids)
+        account.balance = round(account.balance + contract['sell_price'], 2)
+        account.settled.append(contract)
+        account.statement.append({
+            'transaction_id': contract['transaction_ids']['sell'], 'contract_id': contract['contract_id'],
+            'action_type': 'sell', 'amount': contract['sell_price'], 'balance_after': account.balance,
+            'transaction_time': epoch, 'shortcode': shortcode(contract)})
+        del account.open_contracts[contract['contract_id']]
+
+    def contract_updates(self, client, contract):
+        sends = []
+        for sub_id, (kind, detail) in list(client.subscriptions.items()):
+            if kind == 'contract' and detail['contract_id'] == contract['contract_id']:
+                sends.append(client.send(self.contract_message(contract, detail, sub_id)))
+                if contract['is_sold']:
+                    del client.subscriptions[sub_id]
+        return sends
+
+    # Message builders
+
+    def reply(self, request, msg_type, body, sub_id=None):
+        message = {'msg_type': msg_type, 'echo_req': request, msg_type: body}
+        if 'req_id' in request:
+            message['req_id'] = request['req_id']
+        if sub_id is not None:
+            message['subscription'] = {'id': sub_id}
+        return message
+
+    def error(self, request, code, text):
+        message = {'msg_type': next(iter(request), 'error'), 'echo_req': request,
+                   'error': {'code': code, 'message': text}}
+        if 'req_id' in request:
+            message['req_id'] = request['req_id']
+        return message
+
+    def proposal_message(self, client, params, spot, sub_id=None):
+        proposal_id = f"p{next(self.ids)}"
+        client.proposals[proposal_id] = dict(params, streaming=sub_id is not None)
+        if sub_id is not None:
+            # Only the latest two ids of a stream stay buyable
+            previous = params.get('current_id')
+            if previous and params.get('older_id'):
+                client.proposals.pop(params['older_id'], None)
+            params['older_id'] = previous
+            params['current_id'] = proposal_id
+        body = {
+            'id': proposal_id,
+            'ask_price': params['ask_price'],
+            'payout': params['payout'],
+            'spot': spot,
+            'spot_time': self.markets[params['symbol']].epoch,
+            'date_start': self.markets[params['symbol']].epoch,
+            'longcode': f"Win payout if the last digit of {params['symbol']} is {params['contract_type']} "
+                        f"{params['barrier']} after {params['duration']} ticks.",
+        }
+        return self.reply(params['echo_req'], 'proposal', body, sub_id)
+
+    def contract_message(self, contract, request, sub_id=None):
+        body = {key: contract[key] for key in (
+            'contract_id', 'contract_type', 'underlying', 'buy_price', 'payout', 'is_sold', 'status',
+            'current_spot', 'date_start', 'transaction_ids')}
+        body['is_expired'] = contract['is_sold']
+        body['is_settleable'] = contract['is_sold']
+        if contract['is_sold']:
+            body['sell_price'] = contract['sell_price']
+            body['profit'] = contract['profit']
+            body['exit_tick'] = contract['exit_tick']
+            body['sell_time'] = contract['sell_time']
+        else:
+            body['profit'] = round(-contract['buy_price'], 2)
+        return self.reply(request, 'proposal_open_contract', body, sub_id)
+
+    def contract_parameters(self, request, source):
+        contract_type = source.get('contract_type')
+        barrier = int(source.get('barrier', source.get('last_digit', 0)) or 0)
+        probability = win_probability(contract_type, barrier)
+        if probability is None or probability <= 0:
+            return None
+        amount = float(source.get('amount', 0))
+        ratio = (1 - COMMISSION) / probability
+        if source.get('basis', 'stake') == 'payout':
+            payout, ask_price = amount, round(amount / ratio, 2)
+        else:
+            payout, ask_price = round(amount * ratio, 2), amount
+        duration = int(source.get('duration', 1))
+        if source.get('duration_unit', 't') == 'm':
+            duration *= 60  # One replayed tick per second
+        return {
+            'echo_req': request,
+            'req_id': request.get('req_id'),
+            'symbol': source.get('symbol', 'R_100'),
+            'contract_type': contract_type,
+            'barrier': barrier,
+            'duration': duration,
+            'ask_price': ask_price,
+            'payout': payout,
+        }
+
+    # Request handlers
+
+    def rate_limited(self, client, request):
+        # Sliding one-minute window per connection, like the real API
+        now = time.monotonic()
+        names = ['general'] + [name for name, calls in LIMITED_CALLS.items() if any(c in request for c in calls)]
+        for name in names:
+            times = client.calls[name]
+            while times and now - times[0] >= 60:
+                times.popleft()
+            if name in self.limits and len(times) >= self.limits[name]:
+                return name
+        for name in names:
+            client.calls[name].append(now)
+        return None
+
+    def website_status(self, request):
+        limits = {key: {'applies_to': name, 'minutely': self.limits.get(name, UNLIMITED),
+                        'hourly': self.limits.get(name, UNLIMITED) * 60}
+                  for name, key in LIMIT_KEYS.items()}
+        return self.reply(request, 'website_status', {'api_call_limits': limits, 'site_status': 'up'})
+
+    async def handle_request(self, client, request):
+        limit = self.rate_limited(client, request)
+        if limit is not None:
+            self.stats.rate_limited += 1
+            return self.error(request, 'RateLimit', f"You have reached the rate limit for {limit}.")
+        if 'website_status' in request:
+            return self.website_status(request)
+        if 'authorize' in request:
+            account = self.accounts.get(request['authorize'])
+            if account is None:
+                account = self.accounts[request['authorize']] = Account(self.initial_balance)
+            client.account = account
+            return self.reply(request, 'authorize', {
+                'loginid': 'VRTC0000001', 'currency': 'USD', 'balance': client.account.balance, 'is_virtual': 1})
+        if 'logout' in request:
+            return self.reply(request, 'logout', 1)
+        if 'balance' in request:
+            return self.reply(request, 'balance', {'balance': client.account.balance, 'currency': 'USD'})
+        if 'ping' in request:
+            return self.reply(request, 'ping', 'pong')
+        if 'time' in request:
+            return self.reply(request, 'time', int(time.time()))
+        if 'ticks_history' in request or 'ticks' in request:
+            return self.ticks(client, request)
+        if 'proposal_open_contract' in request:
+            return self.open_contract(client, request)
+        if 'proposal' in request:
+            return self.proposal(client, request)
+        if 'buy' in request:
+            return self.buy(client, request)
+        if 'profit_table' in request:
+            return self.profit_table(client, request)
+        if 'statement' in request:
+            return self.statement(client, request)
+        if 'forget' in request:
+            return self.reply(request, 'forget', 1 if client.subscriptions.pop(request['forget'], None) else 0)
+        if 'forget_all' in request:
+            kinds = request['forget_all']
+            kinds = [kinds] if isinstance(kinds, str) else kinds
+            kind_names = {'ticks': 'ticks', 'proposal': 'proposal', 'proposal_open_contract': 'contract'}
+            wanted = {kind_names.get(k, k) for k in kinds}
+            forgotten = [s for s, (kind, _) in client.subscriptions.items() if kind in wanted]
+            for sub_id in forgotten:
+                del client.subscriptions[sub_id]
+            return self.reply(request, 'forget_all', forgotten)
+        return self.error(request, 'UnrecognisedRequest', 'Unrecognised request.')
+
+    def ticks(self, client, request):
+        symbol = request.get('ticks_history') or request.get('ticks')
+        market = self.market(symbol)
+        sub_id = None
+        if request.get('subscribe'):
+            sub_id = f"s{next(self.ids)}"
+            client.subscriptions[sub_id] = ('ticks', {'symbol': symbol, 'echo_req': request,
+                                                      'req_id': request.get('req_id')})
+        if 'ticks' in request:
+            message = self.reply(request, 'tick', {
+                'epoch': market.epoch, 'quote': market.history_prices[-1], 'symbol': symbol,
+                'pip_size': market.pip_size, 'id': sub_id}, sub_id)
+            return message
+
+        prices, times = market.history_prices, market.history_times
+        start = request.get('start')
+        if isinstance(start, int) and start > 1:
+            first = int(np.searchsorted(times, start))
+            prices, times = prices[first:], times[first:]
+        end = request.get('end', 'latest')
+        if end != 'latest':
+            last = int(np.searchsorted(times, int(end), side='right'))
+            prices, times = prices[:last], times[:last]
+        count = min(int(request.get('count', MAX_HISTORY_COUNT)), MAX_HISTORY_COUNT)
+        message = self.reply(request, 'history', {'prices': prices[-count:], 'times': times[-count:]}, sub_id)
+        message['pip_size'] = market.pip_size
+        return message
+
+    def proposal(self, client, request):
+        params = self.contract_parameters(request, request)
+        if params is None:
+            return self.error(request, 'ContractCreationFailure', 'Unsupported contract type.')
+        market = self.market(params['symbol'])
+        sub_id = None
+        if request.get('subscribe'):
+            sub_id = f"s{next(self.ids)}"
+            client.subscriptions[sub_id] = ('proposal', params)
+        return self.proposal_message(client, params, market.history_prices[-1], sub_id)
+
+    def buy(self, client, request):
+        if request['buy'] == 1 and 'parameters' in request:
+            params = self.contract_parameters(request, request['parameters'])
+            if params is None:
+                return self.error(request, 'ContractCreationFailure', 'Unsupported contract type.')
+        else:
+            params = client.proposals.get(request['buy'])
+            if params is None:
+                return self.error(request, 'InvalidContractProposal', 'Unknown contract proposal.')
+            if not params['streaming']:
+                del client.proposals[request['buy']]
+        if 'price' in request and params['ask_price'] > float(request['price']):
+            return self.error(request, 'PriceMoved', 'The contract price has moved.')
+        if params['ask_price'] > client.account.balance:
+            return self.error(request, 'InsufficientBalance', 'Your account balance is insufficient.')
+
+        market = self.market(params['symbol'])
+        self.stats.record_buy(market)
+        account = client.account
+        account.balance = round(account.balance - params['ask_price'], 2)
+        contract_id = next(self.ids)
+        transaction_id = next(self.ids)
+        account.contracts[contract_id] = account.open_contracts[contract_id] = {
+            'contract_id': contract_id,
+            'contract_type': params['contract_type'],
+            'barrier': params['barrier'],
+            'symbol': params['symbol'],
+            'underlying': params['symbol'],
+            'buy_price': params['ask_price'],
+            'payout': params['payout'],
+            'duration': params['duration'],
+            'ticks_left': params['duration'],
+            'date_start': market.epoch,
+            'purchase_time': market.epoch,
+            'current_spot': market.history_prices[-1],
+            'transaction_ids': {'buy': transaction_id},
+            'transaction_id': transaction_id,
+            'is_sold': 0,
+            'status': 'open',
+        }
+        contract = account.contracts[contract_id]
+        account.statement.append({
+            'transaction_id': transaction_id, 'contract_id': contract_id, 'action_type': 'buy',
+            'amount': -params['ask_price'], 'balance_after': account.balance,
+            'transaction_time': market.epoch, 'shortcode': shortcode(contract)})
+        return self.reply(request, 'buy', {
+            'contract_id': contract_id,
+            'transaction_id': transaction_id,
+            'buy_price': params['ask_price'],
+            'payout': params['payout'],
+            'balance_after': account.balance,
+            'start_time': market.epoch,
+            'purchase_time': market.epoch,
+            'longcode': f"{params['contract_type']} {params['barrier']} on {params['symbol']}",
+            'shortcode': shortcode(contract),
+        })
+
+    def open_contract(self, client, request):
+        contract = client.account.contracts.get(request.get('contract_id'))
+        if contract is None:
+            return self.error(request, 'InvalidContractId', 'Contract not found.')
+        sub_id = None
+        if request.get('subscribe') and not contract['is_sold']:
+            sub_id = f"s{next(self.ids)}"
+            client.subscriptions[sub_id] = ('contract', {'contract_id': contract['contract_id'],
+                                                         'req_id': request.get('req_id'), **request})
+        return self.contract_message(contract, request, sub_id)
+
+    def report_page(self, request, rows, time_key):
+        date_from = request.get('date_from')
+        if date_from:
+            rows = [row for row in rows if row[time_key] >= int(date_from)]
+        rows = rows[::-1] if request.get('sort', 'DESC') == 'DESC' else rows
+        offset = int(request.get('offset', 0))
+        limit = min(int(request.get('limit', 50)), MAX_REPORT_ROWS)
+        return rows[offset:offset + limit]
+
+    def statement(self, client, request):
+        transactions = [dict(row) for row in self.report_page(request, client.account.statement, 'transaction_time')]
+        if not request.get('description'):
+            for row in transactions:
+                del row['shortcode']
+        return self.reply(request, 'statement', {'count': len(transactions), 'transactions': transactions})
+
+    def profit_table(self, client, request):
+        transactions = []
+        for c in self.report_page(request, client.account.settled, 'purchase_time'):
+            row = {key: c[key] for key in ('contract_id', 'buy_price', 'sell_price',
+                                           'payout', 'purchase_time', 'sell_time')}
+            row['transaction_id'] = c['transaction_ids']['buy']
+            row['shortcode'] = shortcode(c)
+            if request.get('description'):
+                row['longcode'] = f"{c['contract_type']} {c['barrier']} on {c['symbol']}"
+            transactions.append(row)
+        return self.reply(request, 'profit_table', {'count': len(transactions), 'transactions': transactions})
+
+    # Connection handling
+
+    async def handle(self, websocket, path=None):
+        client = Client(websocket, Account(self.initial_balance))
+        self.clients.add(client)
+        try:
+            async for raw in websocket:
+                try:
+                    request = json.loads(raw)
+                except ValueError:
+                    await client.send({'msg_type': 'error',
+                                       'error': {'code': 'InputValidationFailed', 'message': 'Bad JSON.'}})
+                    continue
+                await client.send(await self.handle_request(client, request))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.clients.discard(client)
+
+    async def start(self, host='127.0.0.1', port=8765):
+        self.server = await websockets.serve(self.handle, host, port, max_size=None)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def drop_clients(self):
+        # Closes every client connection, to exercise the bots' reconnects
+        await asyncio.gather(*(client.websocket.close() for client in list(self.clients)),
+                             return_exceptions=True)
+
+    async def stop(self):
+        for task in self.market_tasks:
+            task.cancel()
+        self.market_tasks = []
+        self.markets = {}
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    @property
+    def endpoint(self):
+        return f"ws://127.0.0.1:{self.port}"
+
+
+def load_symbol_ticks(pairs):
+    from backtest import load_quotes
+    quotes = {}
+    for pair in pairs:
+        symbol, _, path = pair.partition('=')
+        quotes[symbol] = load_quotes(path)
+    return quotes
+
+
+async def serve_forever(args):
+    limits = {name: int(value) for name, _, value in (pair.partition('=') for pair in args.limits)}
+    server = FakeDerivServer(load_symbol_ticks(args.ticks), rate=args.rate, pip_size=args.pip_size, limits=limits)
+    await server.start(args.host, args.port)
+    print(f"Fake Deriv API listening on {server.endpoint} at {args.rate} ticks/s")
+    await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Deriv WebSocket API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate', type=float, default=1.0, help="Replayed ticks per second per symbol")
+    parser.add_argument('--pip-size', type=int, default=2)
+    parser.add_argument('--ticks', nargs='*', default=[], metavar='SYMBOL=PATH',
+                        help="Recorded quotes to replay, e.g. R_100=ticks.npy (others get a random walk)")
+    parser.add_argument('--limits', nargs='*', default=[], metavar='NAME=PER_MINUTE',
+                        help="Enforce Deriv's rate limits, e.g. general=180 pricing=80 outcome=25")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve_forever(args))
+    except KeyboardInterrupt:
+        pass
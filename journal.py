@@ -0,0 +1,111 @@
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+
+MAX_SEGMENT_BYTES = 64 * 1024 * 1024  # A segment is closed and a new one started past this size
+
+
+# Structured record of every round, kept off the trading loop. record()
+# only appends a tuple to a deque; a background thread drains it every
+# flush_interval seconds and appends the batch as JSON lines to the current
+# segment file, <directory>/<prefix>-<start time>-<n>.jsonl, rotating to a
+# new segment past max_bytes. The same thread prints the bot's summary line
+# every summary_interval seconds, so the console is throttled too.
+#
+# With directory=None nothing is written and only the summary is printed.
+class Journal:
+
+    def __init__(self, directory, prefix, summary=None, flush_interval=1.0, summary_interval=5.0,
+                 max_bytes=MAX_SEGMENT_BYTES):
+        self.directory = directory
+        self.prefix = prefix
+        self.summary = summary  # Callable returning the console summary line
+        self.flush_interval = flush_interval
+        self.summary_interval = summary_interval
+        self.max_bytes = max_bytes
+        self.events = deque()
+        self.recorded = 0
+        self.written = 0
+        self.segment = None
+        self.segment_index = 0
+        self.started = time.strftime('%Y%m%d-%H%M%S')
+        self.stopping = threading.Event()
+        self.writer = None
+        self.last_summary = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.events)
+
+    def record(self, event, **fields):
+        # Safe to call from the event loop or any thread, never blocks
+        self.events.append((time.time(), event, fields))
+        self.recorded += 1
+
+    def start(self):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.run, name=f"{self.prefix}-journal", daemon=True)
+            self.writer.start()
+        return self
+
+    def close(self):
+        if self.writer is not None:
+            self.stopping.set()
+            self.writer.join()
+            self.writer = None
+        self.flush()
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
+        if self.summary is not None:
+            self.print_summary()
+
+    def run(self):
+        next_summary = time.monotonic() + self.summary_interval
+        while not self.stopping.wait(self.flush_interval):
+            self.flush()
+            if self.summary is not None and time.monotonic() >= next_summary:
+                self.print_summary()
+                next_summary = time.monotonic() + self.summary_interval
+
+    def print_summary(self):
+        line = self.summary()
+        if line and line != self.last_summary:
+            print(line, flush=True)
+            self.last_summary = line
+
+    def open_segment(self):
+        if self.segment is not None:
+            self.segment.close()
+        self.segment_index += 1
+        path = os.path.join(self.directory, f"{self.prefix}-{self.started}-{self.segment_index:04d}.jsonl")
+        self.segment = open(path, 'a', encoding='utf-8')
+
+    def flush(self):
+        if not self.directory:
+            self.events.clear()
+            return
+        if not self.events:
+            return
+        batch = []
+        while self.events:
+            when, event, fields = self.events.popleft()
+            batch.append(json.dumps({"time": round(when, 6), "event": event, **fields}, default=str))
+        if self.segment is None or self.segment.tell() >= self.max_bytes:
+            self.open_segment()
+        self.segment.write('\n'.join(batch) + '\n')
+        self.segment.flush()
+        self.written += len(batch)
+
+
+def read_journal(directory, prefix='*'):
+    # Yields every recorded event of the matching segments, oldest first
+    for path in sorted(glob.glob(os.path.join(directory, f"{prefix}-*.jsonl"))):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+from fake_deriv_server import FakeDerivServer, load_symbol_ticks
+
+# Runs each bot entry point against the local fake server at increasing
+# tick rates and reports tick-to-buy latency and sustained trade rate, to
+# find where the bots stop keeping up with the feed.
+
+BOTS = {
+    'arima': 'arima v2.py',
+    'simple': 'simplederivbot2.py',
+    'martingale': '100% win rate but no trades were taken on live.py',
+}
+
+
+async def run_bot(script, rate, duration, quotes, show_output=False):
+    server = FakeDerivServer(quotes, rate=rate)
+    await server.start(port=0)
+    # Replayed ticks have made-up epochs, keep them out of the tick archive
+    # and journal, and every run starts fresh instead of resuming from a
+    # checkpoint
+    env = dict(os.environ, DERIV_ENDPOINT=server.endpoint, DERIV_TOKEN='fake-token', DERIV_APP_ID='1089',
+               DERIV_TICK_ARCHIVE='', DERIV_CHECKPOINT='', DERIV_JOURNAL='', DERIV_TRANSACTIONS='')
+    output = None if show_output else subprocess.DEVNULL
+    server.stats.reset()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), script),
+        env=env, stdout=output, stderr=output)
+    try:
+        await asyncio.wait_for(process.wait(), duration)
+    except asyncio.TimeoutError:
+        process.terminate()
+        await process.wait()
+    summary = server.stats.summary()
+    await server.stop()
+    return summary
+
+
+def format_ms(value):
+    return '-' if value is None else f"{value:.2f}"
+
+
+async def main(args):
+    quotes = load_symbol_ticks(args.ticks)
+    print(f"{'bot':<12}{'ticks/s':>10}{'ticks sent':>12}{'buys':>8}{'trades/s':>10}"
+          f"{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name in args.bots:
+        for rate in args.rates:
+            s = await run_bot(BOTS[name], rate, args.duration, quotes, args.show_output)
+            print(f"{name:<12}{rate:>10g}{s['ticks_sent']:>12}{s['buys']:>8}{s['trades_per_second']:>10.2f}"
+                  f"{format_ms(s['tick_to_buy_p50_ms']):>10}{format_ms(s['tick_to_buy_p90_ms']):>10}"
+                  f"{format_ms(s['tick_to_buy_p99_ms']):>10}{format_ms(s['tick_to_buy_max_ms']):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the bots against the local fake Deriv server")
+    parser.add_argument('--bots', nargs='+', choices=sorted(BOTS), default=sorted(BOTS))
+    parser.add_argument('--rates', nargs='+', type=float, default=[1, 10, 100, 1000],
+                        help="Replayed ticks per second to try")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds to run each bot at each rate")
+    parser.add_argument('--ticks', nargs='*', default=[], metavar='SYMBOL=PATH',
+                        help="Recorded quotes to replay, e.g. R_100=ticks.npy")
+    parser.add_argument('--show-output', action='store_true', help="Let the bots print to the terminal")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,202 @@
+import numpy as np
+
+DIGITS = 10
+DENSE_LIMIT = 1_000_000  # Largest table (in cells) kept as one dense array
+RESCALE_AT = 1e200
+
+
+# Order-k Markov model of last digits. The context is the previous `order`
+# digits packed into one base-10 number, so there are 10**order contexts
+# with 10 next-digit counts each. Counts for several independent digit
+# streams (one per symbol) live in the same model, which lets predict()
+# answer for every stream in one NumPy call.
+#
+# With decay < 1 every observation is worth `decay` times less after each
+# new digit on its stream. Instead of multiplying the whole table on every
+# digit, new counts are added with a weight that grows by 1/decay and the
+# table is divided by that weight when it is read, so an update is O(1).
+# decay may also be a sequence with one value per stream, which lets
+# variants of a model that differ only in decay share its arrays.
+#
+# Tables with more than DENSE_LIMIT cells are stored sparsely as a dict of
+# rows keyed by (stream, context), holding only contexts that were seen.
+class MarkovModel:
+
+    def __init__(self, order=1, decay=1.0, streams=1, dense_limit=DENSE_LIMIT):
+        if order < 1:
+            raise ValueError("order must be at least 1")
+        decays = np.broadcast_to(np.asarray(decay, dtype=np.float64), (streams,)).copy()
+        if not ((decays > 0) & (decays <= 1)).all():
+            raise ValueError("decay must be in (0, 1]")
+        self.order = order
+        self.decay = decay
+        self.decays = decays
+        self.growth = 1.0 / decays
+        self.fading = bool((decays < 1).any())
+        self.streams = streams
+        self.contexts = DIGITS ** order
+        self.dense = streams * self.contexts * DIGITS <= dense_limit
+        if self.dense:
+            self.counts = np.zeros((streams, self.contexts, DIGITS))
+        else:
+            self.counts = {}  # (stream, context) -> row of DIGITS counts
+        self.digit_counts = np.zeros((streams, DIGITS))
+        self.scale = np.ones(streams)  # Weight of the next observation
+        self.context = np.zeros(streams, dtype=np.int64)
+        self.seen = np.zeros(streams, dtype=np.int64)  # Digits observed per stream
+
+    def __len__(self):
+        return self.streams
+
+    def _row(self, stream, context):
+        if self.dense:
+            return self.counts[stream, context]
+        key = (stream, context)
+        row = self.counts.get(key)
+        if row is None:
+            row = self.counts[key] = np.zeros(DIGITS)
+        return row
+
+    def _rescale(self, stream):
+        # Folds the pending weight back into the stored counts
+        scale = self.scale[stream]
+        if self.dense:
+            self.counts[stream] /= scale
+        else:
+            for (row_stream, _), row in self.counts.items():
+                if row_stream == stream:
+                    row /= scale
+        self.digit_counts[stream] /= scale
+        self.scale[stream] = 1.0
+
+    def update(self, digit, stream=0):
+        # Records the next digit of a stream in O(1)
+        if self.fading:
+            self.scale[stream] *= self.growth[stream]
+            if self.scale[stream] > RESCALE_AT:
+                self._rescale(stream)
+        weight = self.scale[stream]
+        if self.seen[stream] >= self.order:
+            self._row(stream, int(self.context[stream]))[digit] += weight
+        self.digit_counts[stream, digit] += weight
+        self.context[stream] = (self.context[stream] * DIGITS + digit) % self.contexts
+        self.seen[stream] += 1
+
+    def update_streams(self, digits, streams=None):
+        # Records the next digit of several distinct streams (all by
+        # default) in one vectorized step, same result as update() on each
+        streams = np.arange(self.streams) if streams is None else np.asarray(streams, dtype=np.int64)
+        digits = np.asarray(digits, dtype=np.int64)
+        if self.fading:
+            self.scale[streams] *= self.growth[streams]
+            for stream in streams[self.scale[streams] > RESCALE_AT].tolist():
+                self._rescale(stream)
+        weights = self.scale[streams]
+        contexts = self.context[streams]
+        full = self.seen[streams] >= self.order
+        full_digits = digits if digits.ndim == 0 else digits[full]  # One digit for every stream, or one each
+        if self.dense:
+            self.counts[streams[full], contexts[full], full_digits] += weights[full]
+        else:
+            for stream, context, digit, weight in zip(streams[full].tolist(), contexts[full].tolist(),
+                                                      np.broadcast_to(full_digits, full.sum()).tolist(),
+                                                      weights[full].tolist()):
+                self._row(stream, context)[digit] += weight
+        self.digit_counts[streams, digits] += weights
+        self.context[streams] = (contexts * DIGITS + digits) % self.contexts
+        self.seen[streams] += 1
+
+    def update_many(self, digits, stream=0):
+        # Records a run of digits in one vectorized pass, same result as
+        # calling update() for each of them
+        digits = np.asarray(digits, dtype=np.int64)
+        n = len(digits)
+        if n == 0:
+            return
+        self._rescale(stream)
+        decay = float(self.decays[stream])
+        if decay < 1:
+            # Older counts fade by decay**n, the newest digit gets weight 1
+            fade = decay ** n
+            if self.dense:
+                self.counts[stream] *= fade
+            else:
+                for (row_stream, _), row in self.counts.items():
+                    if row_stream == stream:
+                        row *= fade
+            self.digit_counts[stream] *= fade
+            weights = decay ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        else:
+            weights = np.ones(n)
+
+        # Digits before each position: the stream's current context followed
+        # by the new digits. Positions without `order` digits before them
+        # only count towards the digit frequencies.
+        known = min(int(self.seen[stream]), self.order)
+        previous = [(int(self.context[stream]) // DIGITS ** i) % DIGITS for i in range(known - 1, -1, -1)]
+        history = np.concatenate((np.asarray(previous, dtype=np.int64), digits))
+        powers = DIGITS ** np.arange(self.order - 1, -1, -1, dtype=np.int64)
+        first = max(0, self.order - known)  # First new digit with a full context
+        if first < n:
+            windows = np.lib.stride_tricks.sliding_window_view(history[:-1], self.order)
+            contexts = windows[first + known - self.order:] @ powers
+            cells = contexts * DIGITS + digits[first:]
+            if self.dense:
+                size = self.contexts * DIGITS
+                self.counts[stream] += np.bincount(cells, weights[first:], size).reshape(self.contexts, DIGITS)
+            else:
+                unique, inverse = np.unique(cells, return_inverse=True)
+                totals = np.bincount(inverse, weights[first:])
+                for cell, total in zip(unique.tolist(), totals.tolist()):
+                    self._row(stream, cell // DIGITS)[cell % DIGITS] += total
+        self.digit_counts[stream] += np.bincount(digits, weights, DIGITS)
+
+        self.context[stream] = history[-self.order:] @ powers[-len(history[-self.order:]):]
+        self.seen[stream] += n
+
+    def ready(self, streams=None):
+        # True for streams that have seen enough digits to form a context
+        seen = self.seen if streams is None else self.seen[streams]
+        return seen >= self.order
+
+    def rows(self, contexts, streams=0):
+        # Next-digit counts for each (stream, context) pair, shape (n, 10)
+        contexts = np.asarray(contexts, dtype=np.int64)
+        streams = np.broadcast_to(np.asarray(streams, dtype=np.int64), contexts.shape)
+        if self.dense:
+            rows = self.counts[streams, contexts]
+        else:
+            empty = np.zeros(DIGITS)
+            rows = np.array([self.counts.get((s, c), empty) for s, c in zip(streams.tolist(), contexts.tolist())])
+            rows = rows.reshape(contexts.shape + (DIGITS,))
+        return rows / self.scale[streams][..., None]
+
+    def probabilities(self, contexts, streams=0):
+        # Next-digit probabilities, uniform for contexts never seen
+        rows = self.rows(contexts, streams)
+        totals = rows.sum(axis=-1, keepdims=True)
+        return np.divide(rows, totals, out=np.full_like(rows, 1.0 / DIGITS), where=totals > 0)
+
+    def predict_contexts(self, contexts, streams=0):
+        # Most likely next digit for a batch of contexts
+        return self.rows(contexts, streams).argmax(axis=-1)
+
+    def predict(self, streams=None):
+        # Most likely next digit for each stream given its latest digits
+        if streams is None:
+            streams = np.arange(self.streams)
+        streams = np.asarray(streams, dtype=np.int64)
+        return self.predict_contexts(self.context[streams], streams)
+
+    def dump(self, stream=0):
+        # Debug view of a stream's counts, one line per context seen
+        digit_counts = self.digit_counts[stream] / self.scale[stream]
+        lines = [f"Digit Counts: {np.round(digit_counts, 2).tolist()}"]
+        if self.dense:
+            contexts = np.flatnonzero(self.counts[stream].any(axis=1))
+        else:
+            contexts = sorted(c for s, c in self.counts if s == stream)
+        for context in contexts:
+            row = self.rows([context], stream)[0]
+            lines.append(f"{int(context):0{self.order}d} -> {np.round(row, 2).tolist()}")
+        return "\n".join(lines)
@@ -0,0 +1,169 @@
+import asyncio
+import bisect
+import json
+import os
+import time
+
+# Upper bounds in seconds, the same for every stage so histograms can be
+# compared side by side: 10us up to 10s
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+# Counters and fixed-bucket latency histograms for the trading loop.
+# Recording is a dict lookup and an add, cheap enough to leave on in
+# production. Stage timings are taken by the caller with
+# time.perf_counter() and passed in as seconds.
+class Metrics:
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.started = time.time()
+        self.counters = {}  # (name, label key) -> value
+        self.histograms = {}  # (name, label key) -> Histogram
+
+    def inc(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, label_key(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def since(self, name, started, **labels):
+        # Observes the time since a perf_counter() reading
+        self.observe(name, time.perf_counter() - started, **labels)
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = [f"# TYPE {self.prefix}_uptime_seconds gauge",
+                 f"{self.prefix}_uptime_seconds {time.time() - self.started:.3f}"]
+        typed = set()
+        for (name, key), value in sorted(self.counters.items()):
+            metric = f"{self.prefix}_{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{format_labels(key)} {value}")
+        for (name, key), histogram in sorted(self.histograms.items()):
+            metric = f"{self.prefix}_{name}_seconds"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f"{metric}_bucket{format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{metric}_sum{format_labels(key)} {histogram.sum:.6f}")
+            lines.append(f"{metric}_count{format_labels(key)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        uptime = time.time() - self.started
+        return {
+            'prefix': self.prefix,
+            'time': time.time(),
+            'uptime_seconds': uptime,
+            'counters': [{'name': name, 'labels': dict(key), 'value': value,
+                          'per_second': value / uptime if uptime else 0.0}
+                         for (name, key), value in sorted(self.counters.items())],
+            'histograms': [{'name': name, 'labels': dict(key), 'count': h.count,
+                            'mean_ms': 1000 * h.sum / h.count if h.count else None,
+                            'p50_ms': self.to_ms(h.quantile(0.5)),
+                            'p90_ms': self.to_ms(h.quantile(0.9)),
+                            'p99_ms': self.to_ms(h.quantile(0.99))}
+                           for (name, key), h in sorted(self.histograms.items())],
+        }
+
+    @staticmethod
+    def to_ms(seconds):
+        return None if seconds is None else 1000 * seconds
+
+    def write_snapshot(self, path):
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(temporary, path)
+
+    async def handle_scrape(self, reader, writer):
+        try:
+            await reader.readuntil(b'\r\n\r\n')
+            body = self.render().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, port, host='127.0.0.1'):
+        # Every request gets the metrics page, whatever the path
+        return await asyncio.start_server(self.handle_scrape, host, port)
+
+    async def write_snapshots(self, path, interval=10.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.write_snapshot(path)
+
+
+async def start_exporters(metrics, port=None, path=None, interval=10.0):
+    # Starts whichever exporters are configured; returns the tasks and
+    # servers so the caller can stop them
+    running = []
+    if port:
+        running.append(await metrics.serve(int(port)))
+    if path:
+        running.append(asyncio.ensure_future(metrics.write_snapshots(path, interval)))
+    return running
+
+
+async def stop_exporters(metrics, running, path=None):
+    for item in running:
+        if isinstance(item, asyncio.Task):
+            item.cancel()
+        else:
+            item.close()
+            await item.wait_closed()
+    if path:
+        metrics.write_snapshot(path)  # Final numbers for the run
@@ -0,0 +1,248 @@
+import time
+
+# Summary of a run of consecutive trades:
+# (trades, pnl, peak, trough, drawdown, leading losses, trailing losses, longest loss streak).
+# peak and trough are the highest and lowest cumulative PnL with the start
+# of the run counted as 0, drawdown the largest fall from a peak to a later
+# trough. Two adjacent runs combine into the summary of their union, which
+# is what lets a window drop its oldest trade without rescanning the rest.
+EMPTY = (0, 0.0, 0.0, 0.0, 0.0, 0, 0, 0)
+
+
+def trade_summary(pnl, won):
+    lost = 0 if won else 1
+    return (1, pnl, max(pnl, 0.0), min(pnl, 0.0), max(-pnl, 0.0), lost, lost, lost)
+
+
+def combine(first, second):
+    trades_a, pnl_a, peak_a, trough_a, drawdown_a, lead_a, tail_a, streak_a = first
+    trades_b, pnl_b, peak_b, trough_b, drawdown_b, lead_b, tail_b, streak_b = second
+    return (trades_a + trades_b,
+            pnl_a + pnl_b,
+            max(peak_a, pnl_a + peak_b),
+            min(trough_a, pnl_a + trough_b),
+            max(drawdown_a, drawdown_b, peak_a - (pnl_a + trough_b)),
+            lead_a if lead_a < trades_a else trades_a + lead_b,
+            tail_b if tail_b < trades_b else trades_b + tail_a,
+            max(streak_a, streak_b, tail_a + lead_b))
+
+
+# The last `size` trades in a circular buffer. Win and PnL counts are
+# running sums. Drawdown and loss streaks can't be un-added when a trade
+# leaves, so the window is split in two: the older part keeps one suffix
+# summary per slot, built when the part is first needed, and the newer part
+# a single summary extended on every trade. Dropping the oldest trade just
+# moves to the next suffix; once the older part is used up, the newer part
+# becomes it. Each trade is summarized twice at most, so recording is O(1)
+# amortized and reading any statistic is O(1).
+class RollingWindow:
+    __slots__ = ('size', 'pnls', 'outcomes', 'suffixes', 'head', 'count', 'older',
+                 'newer', 'wins', 'pnl', 'won_pnl', 'lost_pnl')
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError("window size must be at least 1")
+        self.size = size
+        self.pnls = [0.0] * size
+        self.outcomes = [False] * size
+        self.suffixes = [EMPTY] * size  # Summary from this slot to the end of the older part
+        self.head = 0  # Slot of the oldest trade
+        self.count = 0
+        self.older = 0  # Trades in the older part, from head on
+        self.newer = EMPTY  # Summary of the trades after the older part
+        self.wins = 0
+        self.pnl = 0.0
+        self.won_pnl = 0.0
+        self.lost_pnl = 0.0
+
+    def __len__(self):
+        return self.count
+
+    def full(self):
+        return self.count == self.size
+
+    def rebuild(self):
+        # Turns every trade held into the older part. The running sums are
+        # recomputed too, so float error can't build up over a long run
+        suffix = EMPTY
+        self.wins = 0
+        self.won_pnl = self.lost_pnl = 0.0
+        for offset in range(self.count - 1, -1, -1):
+            slot = (self.head + offset) % self.size
+            pnl, won = self.pnls[slot], self.outcomes[slot]
+            suffix = combine(trade_summary(pnl, won), suffix)
+            self.suffixes[slot] = suffix
+            if won:
+                self.wins += 1
+                self.won_pnl += pnl
+            else:
+                self.lost_pnl += pnl
+        self.pnl = suffix[1]
+        self.older = self.count
+        self.newer = EMPTY
+
+    def drop_oldest(self):
+        if not self.older:
+            self.rebuild()
+        slot = self.head
+        pnl = self.pnls[slot]
+        if self.outcomes[slot]:
+            self.wins -= 1
+            self.won_pnl -= pnl
+        else:
+            self.lost_pnl -= pnl
+        self.pnl -= pnl
+        self.older -= 1
+        self.head = (self.head + 1) % self.size
+        self.count -= 1
+
+    def record(self, pnl, won):
+        if self.count == self.size:
+            self.drop_oldest()
+        slot = (self.head + self.count) % self.size
+        self.pnls[slot] = pnl
+        self.outcomes[slot] = won
+        self.count += 1
+        self.newer = combine(self.newer, trade_summary(pnl, won))
+        if won:
+            self.wins += 1
+            self.won_pnl += pnl
+        else:
+            self.lost_pnl += pnl
+        self.pnl += pnl
+
+    def summary(self):
+        if not self.older:
+            return self.newer
+        return combine(self.suffixes[self.head], self.newer)
+
+    @property
+    def losses(self):
+        return self.count - self.wins
+
+    def win_rate(self):
+        return self.wins / self.count if self.count else 0.0
+
+    def expectancy(self):
+        # Mean PnL per trade: win rate * average win + loss rate * average loss
+        return self.pnl / self.count if self.count else 0.0
+
+    def max_drawdown(self):
+        return self.summary()[4]
+
+    def drawdown(self):
+        # Fall from the highest cumulative PnL in the window to the latest
+        _, pnl, peak = self.summary()[:3]
+        return peak - pnl
+
+    def loss_streak(self):
+        # Losses in a row up to the latest trade
+        return self.summary()[6]
+
+    def longest_loss_streak(self):
+        return self.summary()[7]
+
+    def stats(self):
+        trades, pnl, peak, _, max_drawdown, _, loss_streak, longest_loss_streak = self.summary()
+        return {
+            'trades': trades,
+            'wins': self.wins,
+            'win_rate': self.win_rate(),
+            'pnl': pnl,
+            'average_win': self.won_pnl / self.wins if self.wins else 0.0,
+            'average_loss': self.lost_pnl / self.losses if self.losses else 0.0,
+            'expectancy': self.expectancy(),
+            'drawdown': peak - pnl,
+            'max_drawdown': max_drawdown,
+            'loss_streak': loss_streak,
+            'longest_loss_streak': longest_loss_streak,
+        }
+
+
+# Rolling statistics of one bot's trades over several window sizes at once,
+# plus lifetime totals. Memory is fixed by the window sizes and recording a
+# trade costs the same however long the bot has run.
+class Performance:
+
+    def __init__(self, sizes=(10, 50, 200)):
+        self.sizes = tuple(sorted(set(sizes)))
+        self.windows = {size: RollingWindow(size) for size in self.sizes}
+        self.trades = 0
+        self.wins = 0
+        self.pnl = 0.0
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+        self.loss_streak = 0
+        self.longest_loss_streak = 0
+
+    def __len__(self):
+        return self.trades
+
+    def window(self, size):
+        return self.windows[size]
+
+    def record(self, pnl, won=None):
+        # won defaults to a positive PnL
+        won = pnl > 0 if won is None else won
+        for window in self.windows.values():
+            window.record(pnl, won)
+        self.trades += 1
+        self.pnl += pnl
+        if won:
+            self.wins += 1
+            self.loss_streak = 0
+        else:
+            self.loss_streak += 1
+            self.longest_loss_streak = max(self.longest_loss_streak, self.loss_streak)
+        self.peak = max(self.peak, self.pnl)
+        self.max_drawdown = max(self.max_drawdown, self.peak - self.pnl)
+
+    def drawdown(self):
+        return self.peak - self.pnl
+
+    def stats(self):
+        return {
+            'lifetime': {'trades': self.trades, 'wins': self.wins, 'pnl': self.pnl,
+                         'win_rate': self.wins / self.trades if self.trades else 0.0,
+                         'expectancy': self.pnl / self.trades if self.trades else 0.0,
+                         'drawdown': self.drawdown(), 'max_drawdown': self.max_drawdown,
+                         'loss_streak': self.loss_streak, 'longest_loss_streak': self.longest_loss_streak},
+            **{size: window.stats() for size, window in self.windows.items()},
+        }
+
+
+# Pauses trading for `pause` seconds when a settled trade leaves the loss
+# streak at max_losses or more, or the drawdown over the last `window`
+# trades at max_drawdown or more. A limit of 0 is off. Each further losing
+# trade while a limit is still exceeded starts the pause again.
+class CircuitBreaker:
+
+    def __init__(self, max_losses=0, max_drawdown=0, pause=300.0, window=None):
+        self.max_losses = max_losses
+        self.max_drawdown = max_drawdown
+        self.pause = pause
+        self.window = window  # Window size for the drawdown; None for the lifetime drawdown
+        self.paused_until = 0.0  # time.time(), so a pause survives a checkpoint restore
+        self.reason = None
+        self.trips = 0
+
+    def check(self, performance, now=None):
+        # Call after recording a trade; returns the reason if it tripped
+        if performance.loss_streak == 0:
+            return None
+        reason = None
+        if self.max_losses and performance.loss_streak >= self.max_losses:
+            reason = 'loss_streak'
+        elif self.max_drawdown:
+            source = performance if self.window is None else performance.window(self.window)
+            if source.drawdown() >= self.max_drawdown:
+                reason = 'drawdown'
+        if reason is not None:
+            self.paused_until = (time.time() if now is None else now) + self.pause
+            self.reason = reason
+            self.trips += 1
+        return reason
+
+    def remaining(self, now=None):
+        # Seconds left in the current pause, 0 when trading is allowed
+        return max(0.0, self.paused_until - (time.time() if now is None else now))
@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+
+def proposal_key(request):
+    # Everything that identifies a contract except the stake
+    return (request['symbol'], request['contract_type'], str(request.get('barrier', '')),
+            int(request['duration']), request['duration_unit'], request['basis'], request['currency'])
+
+
+class CachedProposal:
+    __slots__ = ('request', 'amount', 'proposal', 'subscription_id', 'updated', 'ready')
+
+    def __init__(self, request):
+        self.request = request
+        self.amount = request['amount']
+        self.proposal = None  # Latest 'proposal' body from the stream
+        self.subscription_id = None
+        self.updated = 0.0
+        self.ready = asyncio.Event()  # Set by the first update
+
+
+# Keeps one streaming proposal subscription alive per contract type,
+# barrier and stake so the buy path can take the latest proposal id without
+# a proposal round-trip. Entries are evicted when the stake for that
+# contract changes, when the stream goes quiet for max_age seconds, or when
+# the server rejects a buy against them (see invalidate).
+class ProposalCache:
+
+    def __init__(self, connection, max_age=10.0, max_entries=16):
+        self.connection = connection
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.entries = {}  # proposal_key -> CachedProposal
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    async def warm(self, requests):
+        await asyncio.gather(*(self.subscribe(request) for request in requests))
+
+    async def get(self, request, timeout=5.0):
+        # Returns the latest streamed proposal body for this request
+        key = proposal_key(request)
+        entry = self.entries.get(key)
+        if entry is not None and (entry.amount != request['amount'] or self.expired(entry)):
+            self.evict(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            entry = await self.subscribe(request)
+        elif entry.proposal is not None:
+            self.hits += 1
+            return entry.proposal
+
+        if entry.proposal is None:
+            # Subscribed by someone else and the first update is on its way
+            await asyncio.wait_for(entry.ready.wait(), timeout)
+            if entry.proposal is None:
+                return await self.get(request, timeout)  # Its subscription failed
+        return entry.proposal
+
+    def expired(self, entry):
+        return entry.proposal is not None and time.monotonic() - entry.updated > self.max_age
+
+    async def subscribe(self, request):
+        key = proposal_key(request)
+        entry = self.entries.get(key)
+        if entry is not None and entry.amount == request['amount']:
+            return entry
+        if entry is not None:
+            self.evict(key)
+        entry = CachedProposal(request)
+        self.entries[key] = entry
+        while len(self.entries) > self.max_entries:
+            self.evict(next(iter(self.entries)))
+        try:
+            # The first proposal reaches on_update before this returns
+            await self.connection.subscribe(dict(request, proposal=1), self.on_update)
+        except Exception:
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+            entry.ready.set()  # Wake anyone waiting on this entry
+            raise
+        return entry
+
+    def on_update(self, message):
+        proposal = message.get('proposal')
+        echo = message.get('echo_req')
+        if not proposal or not echo:
+            return
+        entry = self.entries.get(proposal_key(echo))
+        subscription = message.get('subscription')
+        subscription_id = subscription['id'] if subscription else None
+        if (entry is None or entry.amount != echo['amount'] or
+                (entry.subscription_id is not None and entry.subscription_id != subscription_id)):
+            # Update from a subscription that was already evicted
+            if subscription_id is not None:
+                self.connection.forget_later(subscription_id)
+            return
+        entry.subscription_id = subscription_id
+        entry.proposal = proposal
+        entry.updated = time.monotonic()
+        entry.ready.set()
+
+    def invalidate(self, request):
+        # Call when a buy against a cached proposal is rejected
+        key = proposal_key(request)
+        if key in self.entries and self.entries[key].amount == request['amount']:
+            self.evict(key)
+
+    def evict(self, key):
+        entry = self.entries.pop(key)
+        if entry.subscription_id is not None:
+            return self.connection.forget_later(entry.subscription_id)
+
+    async def close(self):
+        forgets = [self.evict(key) for key in list(self.entries)]
+        await asyncio.gather(*(f for f in forgets if f is not None), return_exceptions=True)
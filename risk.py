@@ -0,0 +1,193 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from backtest import parse_value
+
+# Monte Carlo risk engine for the bots' money management. Every session is
+# one element of a set of NumPy arrays, and a round advances all live
+# sessions at once, so millions of sessions take seconds instead of the
+# two seconds per bet of the live loop. Sessions are independent: each
+# bet wins with win_probability, whatever the strategy's signal.
+
+# Bet-sizing and stop rules as each bot implements them. payout is what a
+# winning bet pays per unit stake; returns_stake says whether that
+# includes the stake (sell_price / stake of a contract bought on basis
+# 'stake', as arima v2 and simplederivbot2 buy them) or is pure profit
+# (balance += bet * payout in the martingale script). exposure_check skips a bet when realized PnL minus
+# the stake would reach the stop loss, like Bankroll.reserve(); with one
+# contract in flight such a session can never bet again.
+RULES = {
+    'martingale': {  # "100% win rate but no trades were taken on live.py"
+        'win_probability': 0.5,
+        'payout': 1.43,  # payout_under_5 / payout_over_4
+        'returns_stake': False,
+        'stake': 100,
+        'multiplier': 1.5,
+        'max_stake': 10000,
+        'take_profit': 5000,
+        'stop_loss': 5000,
+        'max_rounds': 10000,  # The script has no round limit
+        'exposure_check': False,
+    },
+    'arima': {  # arima v2.py, DIGITEVEN/DIGITODD with a doubling chain
+        'win_probability': 0.5,
+        'payout': 1.95,  # backtest.py PAYOUT
+        'returns_stake': True,
+        'stake': 100,  # BET_AMOUNT, the price paid on basis 'stake'
+        'multiplier': 2.0,
+        'max_stake': 10000,
+        'take_profit': 5000,
+        'stop_loss': 50000,
+        'max_rounds': 100,  # TOTAL_ROUNDS
+        'exposure_check': True,
+    },
+    'simplebot': {  # simplederivbot2.py, flat stake on DIGITOVER 5 / DIGITUNDER 4
+        'win_probability': 0.4,
+        'payout': 2.375,  # 0.95 / win probability, as fake_deriv_server.py prices it
+        'returns_stake': True,
+        'stake': 100,  # BET_AMOUNT, the price paid on basis 'stake'
+        'multiplier': 1.0,
+        'max_stake': 100,
+        'take_profit': 5000,
+        'stop_loss': 5000,
+        'max_rounds': 25,  # TOTAL_ROUNDS
+        'exposure_check': True,
+    },
+}
+
+# Why a session ended
+RUNNING, TAKE_PROFIT, STOP_LOSS, EXPOSURE, ROUNDS = range(5)
+STOP_NAMES = {TAKE_PROFIT: 'take_profit', STOP_LOSS: 'stop_loss', EXPOSURE: 'exposure', ROUNDS: 'rounds'}
+BATCH_SIZE = 1_000_000  # Sessions simulated together; bounds memory per worker
+
+
+def simulate_batch(rule, sessions, seed):
+    # Returns per-session arrays: final PnL, rounds played, stop reason,
+    # whether the stake ever reached max_stake, and max drawdown
+    rng = np.random.default_rng(seed)
+    win_profit = rule['payout'] - 1 if rule['returns_stake'] else rule['payout']
+    stake_cap = rule['max_stake']
+    take_profit, stop_loss = rule['take_profit'], rule['stop_loss']
+
+    # Final values per session, written once when a session stops
+    pnl = np.zeros(sessions)
+    drawdown = np.zeros(sessions)
+    rounds = np.zeros(sessions, dtype=np.int32)
+    stopped = np.zeros(sessions, dtype=np.int8)
+    max_hit = np.zeros(sessions, dtype=bool)
+
+    # State of the sessions still betting, compacted as they stop so late
+    # rounds only touch the survivors. live maps back to session indices
+    live = np.arange(sessions)
+    live_pnl = np.zeros(sessions)
+    live_peak = np.zeros(sessions)
+    live_drawdown = np.zeros(sessions)
+    live_stake = np.full(sessions, float(rule['stake']))
+    live_hit = live_stake >= stake_cap
+    played = 0
+
+    def finish(done, reason):
+        index = live[done]
+        pnl[index] = live_pnl[done]
+        drawdown[index] = live_drawdown[done]
+        rounds[index] = played
+        stopped[index] = reason[done]
+        max_hit[index] = live_hit[done]
+
+    while len(live):
+        # Stop checks come before the bet, as at the top of each bot's loop
+        reason = np.where(live_pnl >= take_profit, TAKE_PROFIT,
+                          np.where(live_pnl <= -stop_loss, STOP_LOSS, RUNNING)).astype(np.int8)
+        if played == rule['max_rounds']:
+            reason[reason == RUNNING] = ROUNDS
+        elif rule['exposure_check']:
+            reason[(reason == RUNNING) & (live_pnl - live_stake <= -stop_loss)] = EXPOSURE
+        done = reason != RUNNING
+        if done.any():
+            finish(done, reason)
+            keep = ~done
+            live, live_pnl, live_peak = live[keep], live_pnl[keep], live_peak[keep]
+            live_drawdown, live_stake, live_hit = live_drawdown[keep], live_stake[keep], live_hit[keep]
+            if not len(live):
+                break
+
+        won = rng.random(len(live)) < rule['win_probability']
+        live_pnl += np.where(won, live_stake * win_profit, -live_stake)
+        live_stake = np.where(won, float(rule['stake']), np.minimum(live_stake * rule['multiplier'], stake_cap))
+        live_hit |= live_stake >= stake_cap
+        np.maximum(live_peak, live_pnl, out=live_peak)
+        np.maximum(live_drawdown, live_peak - live_pnl, out=live_drawdown)
+        played += 1
+
+    return pnl, rounds, stopped, max_hit, drawdown
+
+
+def simulate(rule, sessions, seed=None, workers=1, batch_size=BATCH_SIZE):
+    # Splits the sessions into batches with independent random streams and
+    # runs them on up to `workers` processes
+    batches = [min(batch_size, sessions - start) for start in range(0, sessions, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(simulate_batch, [rule] * len(batches), batches, seeds))
+    else:
+        parts = [simulate_batch(rule, size, batch_seed) for size, batch_seed in zip(batches, seeds)]
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def summarize(pnl, rounds, stopped, max_hit, drawdown):
+    sessions = len(pnl)
+    ruined = (stopped == STOP_LOSS) | (stopped == EXPOSURE)
+    return {
+        'sessions': sessions,
+        'expected_pnl': float(pnl.mean()),
+        'pnl_std_error': float(pnl.std() / np.sqrt(sessions)),
+        'pnl_percentiles': dict(zip((1, 5, 50, 95, 99), np.percentile(pnl, (1, 5, 50, 95, 99)).tolist())),
+        'ruin_probability': float(ruined.mean()),
+        'stop_reasons': {name: float((stopped == code).mean()) for code, name in STOP_NAMES.items()},
+        'rounds_percentiles': dict(zip((10, 50, 90, 99), np.percentile(rounds, (10, 50, 90, 99)).tolist())),
+        'mean_rounds': float(rounds.mean()),
+        'max_stake_hit': float(max_hit.mean()),
+        'mean_max_drawdown': float(drawdown.mean()),
+        'worst_drawdown': float(drawdown.max()),
+    }
+
+
+def print_summary(summary):
+    print(f"Sessions: {summary['sessions']}")
+    print(f"Expected PnL: {summary['expected_pnl']:.2f} (+/- {summary['pnl_std_error']:.2f})")
+    print("PnL percentiles: " + ', '.join(f"p{q}={v:.2f}" for q, v in summary['pnl_percentiles'].items()))
+    print(f"Ruin probability: {summary['ruin_probability']:.4%}")
+    print("Stopped by: " + ', '.join(f"{name} {share:.2%}" for name, share in summary['stop_reasons'].items()))
+    print(f"Rounds to stop: mean {summary['mean_rounds']:.1f}, "
+          + ', '.join(f"p{q}={v:.0f}" for q, v in summary['rounds_percentiles'].items()))
+    print(f"Max stake hit: {summary['max_stake_hit']:.2%} of sessions")
+    print(f"Max drawdown: mean {summary['mean_max_drawdown']:.2f}, worst {summary['worst_drawdown']:.2f}")
+
+
+def parse_rule(bot, pairs):
+    rule = dict(RULES[bot])
+    for pair in pairs:
+        key, _, value = pair.partition('=')
+        rule[key] = parse_value(rule, key, value)
+    return rule
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo ruin and PnL estimates for a bot's bet sizing")
+    parser.add_argument('--bot', choices=sorted(RULES), default='martingale')
+    parser.add_argument('--sessions', type=int, default=1_000_000)
+    parser.add_argument('--set', nargs='*', default=[], metavar='KEY=VALUE',
+                        help="Override a rule value, e.g. win_probability=0.48 stop_loss=20000")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes (default: all CPUs)")
+    args = parser.parse_args()
+
+    rule = parse_rule(args.bot, args.set)
+    start = time.perf_counter()
+    results = simulate(rule, args.sessions, args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+    print_summary(summarize(*results))
+    print(f"Simulated {args.sessions} sessions in {elapsed:.2f}s")
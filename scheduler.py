@@ -0,0 +1,172 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+# Call priorities, lowest value first: orders are never kept waiting behind
+# pricing, and pricing never behind reporting
+ORDER, PRICING, GENERAL, REPORTING = range(4)
+
+# Deriv's published per-connection limits (website_status api_call_limits),
+# used until the server reports its own. Every call counts against
+# 'general'; proposals and contract updates also count against 'pricing',
+# and profit_table/statement/portfolio against 'outcome'.
+DEFAULT_LIMITS = {
+    'general': {'minutely': 180, 'hourly': 14400},
+    'pricing': {'minutely': 80, 'hourly': 3600},
+    'outcome': {'minutely': 25, 'hourly': 1500},
+}
+BURST_FRACTION = 0.2  # Share of the minutely limit that may go out in one burst
+ORDER_RESERVE = 2  # General tokens only buys and sells may use
+RETRY_LIMIT = 5  # Retries of a call the server rejected with RateLimit
+BACKOFF_BASE = 0.5  # Seconds; the retry delay is drawn from [0, base * 2**attempt]
+BACKOFF_CAP = 30.0
+
+CALL_CLASSES = {
+    'buy': (ORDER, ('general',)),
+    'sell': (ORDER, ('general',)),
+    'cancel': (ORDER, ('general',)),
+    'proposal': (PRICING, ('general', 'pricing')),
+    'proposal_open_contract': (PRICING, ('general', 'pricing')),
+    'profit_table': (REPORTING, ('general', 'outcome')),
+    'statement': (REPORTING, ('general', 'outcome')),
+    'portfolio': (REPORTING, ('general', 'outcome')),
+    'balance': (REPORTING, ('general',)),
+}
+
+
+def classify(request):
+    # Returns (priority, bucket names) for a request
+    for name, call_class in CALL_CLASSES.items():
+        if name in request:
+            return call_class
+    return GENERAL, ('general',)
+
+
+def limits_from_website_status(response):
+    # Picks the limits out of a website_status response, or None
+    api_limits = response.get('website_status', {}).get('api_call_limits', {})
+    limits = {}
+    for bucket, key in (('general', 'max_requestes_general'), ('pricing', 'max_requests_pricing'),
+                        ('outcome', 'max_requests_outcome')):
+        entry = api_limits.get(key)
+        if entry and entry.get('minutely'):
+            limits[bucket] = {'minutely': entry['minutely'], 'hourly': entry.get('hourly')}
+    return limits or None
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, minutely, hourly=None):
+        # Sized so a full bucket plus a minute (or an hour) of refill never
+        # exceeds the limit over that window
+        self.capacity = max(1.0, minutely * BURST_FRACTION)
+        self.rate = (minutely - self.capacity) / 60
+        if hourly:
+            self.rate = min(self.rate, (hourly - self.capacity) / 3600)
+        self.rate = max(self.rate, 1e-6)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, needed):
+        # Seconds until `needed` tokens are available, after refill()
+        return max(0.0, (needed - self.tokens) / self.rate)
+
+
+# Admits API calls under the per-connection rate limits. Each call takes a
+# token from every bucket of its class. Calls that can't go at once wait in
+# a priority queue and are released in priority order as tokens refill;
+# below ORDER priority a call also leaves ORDER_RESERVE general tokens
+# untouched, so a buy or sell finds a token even after a reporting burst.
+class RequestScheduler:
+
+    def __init__(self, limits=None):
+        self.buckets = {}
+        self.configure(limits or DEFAULT_LIMITS)
+        self.waiting = []  # Heap of (priority, sequence, future, bucket names)
+        self.sequence = itertools.count()
+        self.timer = None
+        self.delayed = 0  # Calls that had to wait for a token
+        self.retries = 0  # Calls resent after a RateLimit error
+
+    def __len__(self):
+        return len(self.waiting)
+
+    def configure(self, limits):
+        for name, limit in limits.items():
+            self.buckets[name] = TokenBucket(limit['minutely'], limit.get('hourly'))
+
+    def wait_time(self, priority, names, now):
+        wait = 0.0
+        for name in names:
+            bucket = self.buckets[name]
+            bucket.refill(now)
+            reserve = ORDER_RESERVE if name == 'general' and priority > ORDER else 0
+            wait = max(wait, bucket.wait_time(1 + reserve))
+        return wait
+
+    def take(self, names):
+        for name in names:
+            self.buckets[name].tokens -= 1
+
+    async def acquire(self, request):
+        priority, names = classify(request)
+        if not self.waiting and self.wait_time(priority, names, time.monotonic()) == 0:
+            self.take(names)
+            return
+        self.delayed += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiting, (priority, next(self.sequence), future, names))
+        self.release()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self.waiting = [entry for entry in self.waiting if entry[2] is not future]
+                heapq.heapify(self.waiting)
+            else:
+                # Granted as the caller was cancelled: give the tokens back
+                for name in names:
+                    self.buckets[name].tokens += 1
+            self.release()
+            raise
+
+    def release(self):
+        # Grants waiting calls in priority order. A call short of a pricing
+        # or outcome token is passed over, but one short of a general token
+        # stops the scan, since every call behind it needs one too
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        now = time.monotonic()
+        next_wait = None
+        kept = []
+        while self.waiting:
+            entry = heapq.heappop(self.waiting)
+            priority, _, future, names = entry
+            if future.done():
+                continue
+            wait = self.wait_time(priority, names, now)
+            if wait == 0:
+                self.take(names)
+                future.set_result(None)
+                continue
+            kept.append(entry)
+            next_wait = wait if next_wait is None else min(next_wait, wait)
+            if self.buckets['general'].wait_time(1 + (ORDER_RESERVE if priority > ORDER else 0)) > 0:
+                break
+        for entry in kept:
+            heapq.heappush(self.waiting, entry)
+        if next_wait is not None:
+            self.timer = asyncio.get_running_loop().call_later(next_wait, self.release)
+
+
+def backoff_delay(attempt):
+    # Full jitter: spreads retries so they don't hit the limit together
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
@@ -0,0 +1,55 @@
+import asyncio
+
+
+# Resolves bought contracts from their proposal_open_contract stream
+# instead of sleeping and reading the newest profit_table row. Each
+# contract gets its own future keyed by contract id, resolved with the
+# final contract update as soon as the server reports it sold.
+class SettlementTracker:
+
+    def __init__(self, connection, on_settled=None):
+        self.connection = connection
+        self.on_settled = on_settled  # Optional callback(contract) on settlement
+        self.futures = {}  # contract_id -> Future
+        self.subscription_ids = {}  # contract_id -> subscription id
+
+    def __len__(self):
+        return len(self.futures)
+
+    async def track(self, contract_id):
+        # Returns a future that resolves to the sold contract
+        future = self.futures.get(contract_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.futures[contract_id] = future
+            try:
+                await self.connection.subscribe(
+                    {"proposal_open_contract": 1, "contract_id": contract_id}, self.on_update)
+            except Exception as e:
+                self.futures.pop(contract_id, None)
+                if not future.done():
+                    future.set_exception(e)
+        return future
+
+    async def wait(self, contract_id, timeout=None):
+        return await asyncio.wait_for(await self.track(contract_id), timeout)
+
+    def on_update(self, message):
+        contract = message.get('proposal_open_contract')
+        if not contract:
+            return
+        contract_id = contract.get('contract_id')
+        subscription = message.get('subscription')
+        if subscription:
+            self.subscription_ids[contract_id] = subscription['id']
+        if not contract.get('is_sold'):
+            return
+
+        subscription_id = self.subscription_ids.pop(contract_id, None)
+        if subscription_id is not None:
+            self.connection.forget_later(subscription_id)
+        future = self.futures.pop(contract_id, None)
+        if future is not None and not future.done():
+            future.set_result(contract)
+        if self.on_settled is not None:
+            self.on_settled(contract)
@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import os
+import time
+from backtest import load_quotes
+from deriv_connection import DerivConnection
+from strategies import StrategyRunner, default_strategies
+from tick_history import stream_ticks
+
+# Shadow-trades many strategy variants side by side, either over recorded
+# ticks or live on one tick subscription, without placing any contract.
+# Every variant sees the same ticks and shares one TickWindow.
+
+API_ENDPOINT = os.getenv('DERIV_ENDPOINT', 'wss://ws.derivws.com')  # ws://127.0.0.1:8765 for fake_deriv_server.py
+URL = f"{API_ENDPOINT}/websockets/v3?app_id={os.getenv('DERIV_APP_ID', '1089')}"
+WARMUP_TICKS = 1000  # Past ticks replayed into the strategies before shadowing live ticks
+SUMMARY_INTERVAL = 10.0
+
+
+def print_results(runner, top):
+    print(f"{'strategy':<48}{'trades':>8}{'wins':>8}{'win rate':>10}{'pnl':>10}")
+    for row in runner.results()[:top]:
+        print(f"{row['strategy']:<48}{row['trades']:>8}{row['wins']:>8}"
+              f"{row['win_rate']:>10.2%}{row['pnl']:>10.2f}")
+
+
+def shadow_worker(reader, summary_interval=SUMMARY_INTERVAL * 6, top=5):
+    # Worker target for supervisor.py: one StrategyRunner per symbol of the
+    # reader, fed straight from the shared tick ring
+    ring = reader.ring
+    runners = {}
+    next_summary = time.monotonic() + summary_interval
+    while True:
+        for symbol, epoch, quote in reader.ticks_of(reader.wait(timeout=1.0)):
+            runner = runners.get(symbol)
+            if runner is None:
+                pip_size = int(ring.pip_sizes[ring.symbol_ids[symbol]])
+                runner = runners[symbol] = StrategyRunner(default_strategies(), pip_size=pip_size)
+            runner.on_tick(quote)
+        if time.monotonic() >= next_summary:
+            next_summary += summary_interval
+            for symbol, runner in runners.items():
+                print(f"\n{symbol} (pid {os.getpid()}): {runner.ticks} ticks, {len(runner)} variants")
+                print_results(runner, top)
+
+
+async def shadow_live(symbol, duration, top):
+    runner = None
+    pip_size = 2
+
+    def on_history(prices, times, history_pip_size):
+        nonlocal runner, pip_size
+        pip_size = history_pip_size or pip_size
+        runner = StrategyRunner(default_strategies(), pip_size=pip_size)
+        runner.run(prices)
+        runner.trades[:] = runner.wins[:] = 0  # Warm-up ticks only train the models
+        runner.pnl[:] = 0
+
+    def on_tick(message):
+        runner.on_tick(message['tick']['quote'])
+
+    connection = await DerivConnection(URL).connect()
+    try:
+        await stream_ticks(connection, symbol, on_history, on_tick, WARMUP_TICKS)
+        ends = time.monotonic() + duration
+        while time.monotonic() < ends:
+            await asyncio.sleep(min(SUMMARY_INTERVAL, max(ends - time.monotonic(), 0)))
+            print(f"\n{symbol}: {runner.ticks} ticks, {len(runner)} variants")
+            print_results(runner, top)
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shadow-trade strategy variants on recorded or live ticks")
+    parser.add_argument('ticks', nargs='?', help=".npy array, CSV/text file of tick quotes or ARCHIVE_DIR/SYMBOL")
+    parser.add_argument('--live', metavar='SYMBOL', help="Shadow live ticks of this symbol instead")
+    parser.add_argument('--duration', type=float, default=60.0, help="Seconds to shadow live ticks")
+    parser.add_argument('--pip-size', type=int, default=2)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.live:
+        asyncio.run(shadow_live(args.live, args.duration, args.top))
+    elif args.ticks:
+        quotes = load_quotes(args.ticks)
+        runner = StrategyRunner(default_strategies(), pip_size=args.pip_size)
+        start = time.perf_counter()
+        runner.run(quotes)
+        elapsed = time.perf_counter() - start
+        print_results(runner, args.top)
+        print(f"Evaluated {len(runner)} variants on {len(quotes)} ticks in {elapsed:.2f}s "
+              f"({1e6 * elapsed / max(len(quotes), 1):.0f}us per tick)")
+    else:
+        parser.error("give a tick file or --live SYMBOL")
@@ -1,13 +1,30 @@
 import sys
 import asyncio
+import functools
 import os
-import random
-import numpy as np
-from deriv_api import DerivAPI, APIError
+import time
+from deriv_connection import DerivConnection, APIError
+from settlement import SettlementTracker
+from proposal_cache import ProposalCache
+from bankroll import Bankroll
+from checkpoint import Checkpoint
+from metrics import Metrics, start_exporters, stop_exporters
+from journal import Journal
+from markov_model import MarkovModel
+from tick_history import last_digit, last_digits, stream_ticks
+from tick_queue import TickQueue
+from transaction_cache import TransactionCache
 
 # Configuration
-app_id = 0000
+app_id = os.getenv('DERIV_APP_ID', '1089')  # Replace with your actual app_id
+endpoint = os.getenv('DERIV_ENDPOINT', 'wss://ws.derivws.com')  # ws://127.0.0.1:8765 for fake_deriv_server.py
+url = f"{endpoint}/websockets/v3?app_id={app_id}"
 api_token = os.getenv('DERIV_TOKEN', '')  # Fetch token from environment or use default
+checkpoint_path = os.getenv('DERIV_CHECKPOINT', 'simplederivbot2.checkpoint')  # Empty disables checkpoints
+metrics_port = os.getenv('DERIV_METRICS_PORT', '')  # Serve Prometheus metrics on this local port
+metrics_file = os.getenv('DERIV_METRICS_FILE', '')  # Write a JSON metrics snapshot here every 10s
+journal_dir = os.getenv('DERIV_JOURNAL', 'journal')  # Directory for the JSONL trade journal; empty disables
+transactions_path = os.getenv('DERIV_TRANSACTIONS', 'transactions.sqlite')  # Local profit table cache; empty disables
 
 if not api_token:
     sys.exit("DERIV_TOKEN environment variable is not set")
@@ -16,56 +33,223 @@ BET_AMOUNT = 100
 TOTAL_ROUNDS = 25  # Number of rounds to run
 TAKE_PROFIT = 5000
 STOP_LOSS = 5000
+MAX_OPEN_CONTRACTS = 1  # Contracts allowed in flight at once; 1 trades serially
+SYMBOLS = ["R_100"]  # Every symbol runs the same strategy on one connection
+MARKOV_ORDER = 1  # Digits of context behind each prediction (10**order contexts)
+MARKOV_DECAY = 1.0  # Weight kept by older digits per new digit; 1.0 never forgets
+DEBUG_DUMP = False  # Print each symbol's digit and transition counts every round
+WARMUP_TICKS = 20000  # Past ticks per symbol loaded into the model before trading
+PIP_SIZE = 2  # Used when the server doesn't report a symbol's pip size
+CHECKPOINT_INTERVAL = 1.0  # Seconds between state checkpoints
+SUMMARY_INTERVAL = 5.0  # Seconds between console summary lines
+RECONNECT_DELAY = 1.0  # First wait before reconnecting, doubled up to MAX_RECONNECT_DELAY
+MAX_RECONNECT_DELAY = 30.0
 
-# Initialize digit counter and transition matrix
-digit_counter = {i: 0 for i in range(10)}
-matrix_size = 10
-transition_matrix = np.zeros((matrix_size, matrix_size), dtype=int)
-previous_digit = None
+# One symbol's stream in the shared digit model
+class SymbolState:
+    __slots__ = ('symbol', 'stream', 'pip_size', 'last_epoch', 'last_digit', 'round_num', 'ticks')
 
-async def sample_calls():
-    global previous_digit
+    def __init__(self, symbol, stream):
+        self.symbol = symbol
+        self.stream = stream
+        self.pip_size = PIP_SIZE
+        self.last_epoch = 0
+        self.last_digit = None
+        self.round_num = 1
+        self.ticks = TickQueue()  # One trigger per tick, coalesced while a round is busy
 
-    api = DerivAPI(app_id=app_id)
-    
-    try:
-        # Authorize with the API token
-        await api.authorize(api_token)
-    except APIError as e:
-        print(f"Authorization failed: {e}")
+states = {symbol: SymbolState(symbol, stream) for stream, symbol in enumerate(SYMBOLS)}
+model = MarkovModel(MARKOV_ORDER, MARKOV_DECAY, streams=len(SYMBOLS))
+bankroll = Bankroll(TAKE_PROFIT, STOP_LOSS)  # Realized PnL and stake reserved by open contracts
+initial_balance = None
+unsettled = {}  # contract_id -> (symbol, round_num, ticket) for every bought contract not yet settled
+open_trades = set()
+checkpoint = Checkpoint(checkpoint_path, CHECKPOINT_INTERVAL) if checkpoint_path else None
+metrics = Metrics('simplebot')  # Stage latencies and counters, always collected
+results = {'Win': 0, 'Loss': 0}
+first_contract_id = None  # First contract bought by this run; later ones belong to it too
+
+def summary_line():
+    balance = (initial_balance or 0) + bankroll.realized
+    return (f"PnL = {bankroll.realized:.2f}, Wins = {results['Win']}, Losses = {results['Loss']}, "
+            f"Open = {len(unsettled)}, Current Balance = {balance:.2f}")
+
+# Round events go to the journal; the console only gets a summary line
+journal = Journal(journal_dir, 'simplebot', summary_line, summary_interval=SUMMARY_INTERVAL)
+
+def checkpoint_state():
+    return {
+        'symbols': SYMBOLS,
+        'model': model,
+        'streams': {symbol: (state.pip_size, state.last_epoch, state.last_digit, state.round_num)
+                    for symbol, state in states.items()},
+        'realized': bankroll.realized,
+        'initial_balance': initial_balance,
+        'first_contract_id': first_contract_id,
+        'unsettled': {contract_id: (symbol, round_num, bankroll.open[ticket])
+                      for contract_id, (symbol, round_num, ticket) in unsettled.items()},
+    }
+
+def restore_checkpoint():
+    # Picks up the model, round counters, PnL and open contracts of a
+    # previous run that stopped before finishing
+    global model, initial_balance, first_contract_id
+    saved = checkpoint.load() if checkpoint else None
+    if saved is None:
         return
-    
-    # Get initial balance
+    if saved['symbols'] != SYMBOLS:
+        print("Ignoring checkpoint saved for other symbols")
+        return
+    if (saved['model'].order, saved['model'].decay) == (MARKOV_ORDER, MARKOV_DECAY):
+        model = saved['model']
+    for symbol, (pip_size, last_epoch, digit, round_num) in saved['streams'].items():
+        state = states[symbol]
+        state.pip_size = pip_size
+        state.round_num = round_num
+        if model is saved['model']:
+            state.last_epoch = last_epoch
+            state.last_digit = digit
+    bankroll.realized = saved['realized']
+    initial_balance = saved['initial_balance']
+    first_contract_id = saved['first_contract_id']
+    for contract_id, (symbol, round_num, stake) in saved['unsettled'].items():
+        unsettled[contract_id] = (symbol, round_num, bankroll.reserve(stake, force=True))
+    print(f"Resumed from checkpoint: PnL = {bankroll.realized:.2f}, {len(unsettled)} open contracts")
+
+def save_checkpoint(force=False):
+    if checkpoint is not None:
+        if force:
+            checkpoint.save(checkpoint_state())
+        else:
+            checkpoint.maybe_save(checkpoint_state)
+
+restore_checkpoint()
+# Contracts restored from a checkpoint already hold their slots
+slots = asyncio.Semaphore(max(MAX_OPEN_CONTRACTS - len(unsettled), 0))  # Shared by all symbols
+
+async def settle_trade(settlement, state, contract_id, ticket, round_num):
+    # Waits for this contract to settle and books its profit/loss. The
+    # ticket and slot are given back however this ends, unless the contract
+    # stays unsettled to be tracked again
+    pnl = 0.0
+    started = time.perf_counter()
+    tracked_again = False
     try:
-        balance = await api.balance()
-        initial_balance = balance['balance']['balance']
-        current_balance = initial_balance
+        contract = await settlement.wait(contract_id)
+        metrics.since('settlement', started)
+        if 'profit' in contract:
+            pnl = float(contract['profit'])
+            metrics.inc('contracts_total', result='win' if pnl > 0 else 'loss')
+            result = "Win" if pnl > 0 else "Loss"
+            results[result] += 1
+            journal.record('settlement', symbol=state.symbol, round=round_num, contract_id=contract_id,
+                           result=result.lower(), sell_price=contract.get('sell_price'), pnl=pnl,
+                           balance=initial_balance + bankroll.realized + pnl)
+        else:
+            print(f"Profit data not available for contract {contract_id}: {contract}")
     except APIError as e:
-        print(f"Failed to retrieve balance: {e}")
-        return
-    
-    total_pnl = 0
-    
-    for round_num in range(1, TOTAL_ROUNDS + 1):
-        # Simulate fetching the last digit (replace with real API call if available)
-        digit = random.randint(0, 9)  # Replace with actual digit retrieval logic
-        
-        # Update digit counter and transition matrix
-        digit_counter[digit] += 1
-        if previous_digit is not None:
-            transition_matrix[previous_digit, digit] += 1
-        previous_digit = digit
+        metrics.inc('errors_total', stage='settlement')
+        print(f"Failed to track contract {contract_id}: {e}")
+        journal.record('error', stage='settlement', symbol=state.symbol, round=round_num,
+                       contract_id=contract_id, error=str(e))
+    except (ConnectionError, asyncio.CancelledError):
+        tracked_again = True  # Still unsettled, tracked again after reconnecting
+    finally:
+        if not tracked_again:
+            del unsettled[contract_id]
+            bankroll.release(ticket, pnl)
+            slots.release()
+            save_checkpoint()
+
+def track_contract(settlement, state, contract_id, ticket, round_num):
+    # Settles in the background; the next round can start right away
+    # if another contract slot is free
+    unsettled[contract_id] = (state.symbol, round_num, ticket)
+    trade = asyncio.ensure_future(settle_trade(settlement, state, contract_id, ticket, round_num))
+    open_trades.add(trade)
+    trade.add_done_callback(open_trades.discard)
+
+def proposal_request(symbol, contract_type, barrier):
+    return {
+        "proposal": 1,
+        "amount": BET_AMOUNT,
+        "barrier": str(barrier),
+        "basis": "stake",  # BET_AMOUNT is what is paid, as the bankroll reserves it
+        "contract_type": contract_type,
+        "currency": "USD",
+        "duration": 1,  # Duration set to 1 tick
+        "duration_unit": "t",
+        "symbol": symbol
+    }
+
+def on_tick(data):
+    # Runs on the event loop for every message of every tick subscription
+    started = time.perf_counter()
+    tick = data['tick']
+    state = states[tick['symbol']]
+    epoch = int(tick['epoch'])
+    if epoch <= state.last_epoch:
+        return  # Already counted by the warm-start
+    state.pip_size = tick.get('pip_size', state.pip_size)
+    state.last_epoch = epoch
+    state.last_digit = last_digit(tick['quote'], state.pip_size)
+    model.update(state.last_digit, state.stream)
+    state.ticks.put(epoch)
+    metrics.inc('ticks_total', symbol=state.symbol)
+    metrics.since('tick', started)
+
+def on_history(state, prices, times, pip_size):
+    # Adds the history in front of the live ticks in one vectorized pass
+    if pip_size is not None:
+        state.pip_size = pip_size
+    digits = last_digits(prices, state.pip_size)
+    model.update_many(digits, state.stream)
+    if len(digits):
+        state.last_digit = int(digits[-1])
+        state.last_epoch = int(times[-1])
+    resumed = "backfilled" if state.round_num > 1 else "warmed"
+    print(f"{state.symbol}: model {resumed} with {len(digits)} ticks")
+
+async def warm_start(api, state):
+    # Subscribes to the symbol's ticks with WARMUP_TICKS of history in front
+    # of them. After a reconnect or restart only the ticks missed since the
+    # last one seen are fetched.
+    await stream_ticks(api, state.symbol, functools.partial(on_history, state), on_tick,
+                       WARMUP_TICKS, start=state.last_epoch + 1)
+
+async def trade_symbol(api, state, settlement, proposals):
+    global first_contract_id
+    symbol = state.symbol
+
+    while state.round_num <= TOTAL_ROUNDS:
+        # Digit counts and transition counts are updated by every tick in
+        # on_tick; a round starts on the next tick and trades on the newest one
+        _, tick_time = await state.ticks.get()
+        save_checkpoint()
+
+        # Waits here while MAX_OPEN_CONTRACTS contracts are in flight
+        await slots.acquire()
+
+        # Check if take profit or stop loss conditions are met
+        if bankroll.take_profit_reached() or bankroll.stop_loss_reached():
+            print("Take profit or stop loss condition met.")
+            slots.release()
+            break
+
+        round_num = state.round_num
+        state.round_num += 1
+        digit = state.last_digit
         
-        print(f"Round {round_num}: Predicted digit is {digit}")
-        print(f"Digit Counts: {digit_counter}")
-        print(f"Transition Matrix:\n{transition_matrix}")
+        if DEBUG_DUMP:
+            print(model.dump(state.stream))
 
         # Predict the next digit
-        if previous_digit is not None:
-            next_digit_probabilities = transition_matrix[previous_digit]
-            predicted_digit = np.argmax(next_digit_probabilities)
+        started = time.perf_counter()
+        if model.ready(state.stream):
+            predicted_digit = int(model.predict([state.stream])[0])
         else:
-            predicted_digit = digit  # If no previous digit, use current digit
+            predicted_digit = digit  # Not enough digits for a context yet, use current digit
+        metrics.since('decision', started)
 
         # Determine contract type and barrier
         if predicted_digit > 5:
@@ -75,86 +259,194 @@ async def sample_calls():
             contract_type = "DIGITUNDER"
             barrier = 4
         else:
-            print(f"Round {round_num}: Skipping trade as predicted digit {predicted_digit} is not within trade conditions")
+            metrics.inc('skips_total', reason='no_signal')
+            journal.record('decision', symbol=symbol, round=round_num, digit=digit,
+                           prediction=predicted_digit, skip='no_signal')
+            slots.release()
             continue
-        
-        print(f"Round {round_num}: Placing {contract_type} trade")
 
-        # Get trade proposal
-        try:
-            proposal = await api.proposal({
-                "proposal": 1,
-                "amount": BET_AMOUNT,
-                "barrier": str(barrier),
-                "basis": "payout",
-                "contract_type": contract_type,
-                "currency": "USD",
-                "duration": 1,  # Duration set to 1 tick
-                "duration_unit": "t",
-                "symbol": "R_100"
-            })
-            proposal_id = proposal.get('proposal', {}).get('id')
-            if not proposal_id:
-                print("Failed to get proposal")
-                continue
-        except APIError as e:
-            print(f"Failed to get proposal: {e}")
+        # Realized PnL minus every open stake must stay above the stop loss
+        ticket = bankroll.reserve(BET_AMOUNT)
+        if ticket is None:
+            metrics.inc('skips_total', reason='exposure')
+            journal.record('decision', symbol=symbol, round=round_num, digit=digit,
+                           prediction=predicted_digit, contract_type=contract_type, skip='exposure')
+            slots.release()
             continue
         
-        # Execute trade
-        try:
-            buy_response = await api.buy({"buy": proposal_id, "price": BET_AMOUNT})
-            contract_id = buy_response.get('buy', {}).get('contract_id')
-            if not contract_id:
-                print("Failed to get contract ID")
-                continue
-        except APIError as e:
-            print(f"Failed to buy: {e}")
-            continue
-
-        # Wait for the contract to settle
-        await asyncio.sleep(1)  # Adjust based on actual contract duration
+        journal.record('decision', symbol=symbol, round=round_num, digit=digit, prediction=predicted_digit,
+                       contract_type=contract_type, barrier=barrier, stake=BET_AMOUNT)
 
-        # Check profit/loss
+        # Get trade proposal
+        request = proposal_request(symbol, contract_type, barrier)
+        contract_id = None
         try:
-            profit_table = await api.profit_table({"profit_table": 1, "limit": 1})
-            if profit_table and 'profit_table' in profit_table:
-                latest_trade = profit_table['profit_table']['transactions'][0]
-                if 'profit' in latest_trade:
-                    pnl = float(latest_trade['profit'])
-                    total_pnl += pnl
-                    current_balance = initial_balance + total_pnl
-
-                    result = "Win" if pnl > 0 else "Loss"
-                    print(f"Round {round_num} result: {result}, PnL = {pnl:.2f}, Current Balance = {current_balance:.2f}")
+            try:
+                started = time.perf_counter()
+                proposal = await proposals.get(request)
+                metrics.since('proposal', started)
+                proposal_id = proposal.get('id')
+                if not proposal_id:
+                    print("Failed to get proposal")
                 else:
-                    print(f"Profit data not available for the latest trade: {latest_trade}")
-            else:
-                print("Failed to retrieve the latest trade result from profit table.")
-        except APIError as e:
-            print(f"Failed to retrieve profit table: {e}")
+                    # Execute trade
+                    try:
+                        started = time.perf_counter()
+                        buy_response = await api.send({"buy": proposal_id, "price": BET_AMOUNT})
+                        metrics.since('buy', started)
+                        contract_id = buy_response.get('buy', {}).get('contract_id')
+                        if not contract_id:
+                            print("Failed to get contract ID")
+                        else:
+                            if first_contract_id is None:
+                                first_contract_id = contract_id
+                            journal.record('buy', symbol=symbol, round=round_num, proposal_id=proposal_id,
+                                           contract_id=contract_id, stake=BET_AMOUNT,
+                                           buy_price=buy_response['buy'].get('buy_price'),
+                                           payout=buy_response['buy'].get('payout'))
+                    except APIError as e:
+                        metrics.inc('errors_total', stage='buy')
+                        journal.record('error', stage='buy', symbol=symbol, round=round_num,
+                                       proposal_id=proposal_id, error=str(e))
+                        print(f"Failed to buy: {e}")
+                        proposals.invalidate(request)
+            except APIError as e:
+                metrics.inc('errors_total', stage='proposal')
+                journal.record('error', stage='proposal', symbol=symbol, round=round_num, error=str(e))
+                print(f"Failed to get proposal: {e}")
+        except (ConnectionError, asyncio.CancelledError):
+            # Connection lost mid-round. A buy that reached the server before
+            # the drop can't be confirmed and is not tracked.
+            bankroll.release(ticket)
+            slots.release()
+            raise
+
+        if not contract_id:
+            bankroll.release(ticket)
+            slots.release()
             continue
-        
-        # Check if take profit or stop loss conditions are met
-        if current_balance >= initial_balance + TAKE_PROFIT or initial_balance - current_balance >= STOP_LOSS:
-            print("Take profit or stop loss condition met.")
-            break
+
+        metrics.since('tick_to_buy', tick_time)
+        metrics.inc('trades_total', symbol=symbol)
+        track_contract(settlement, state, contract_id, ticket, round_num)
+
+async def sample_calls(api):
+    global initial_balance
+
+    settlement = SettlementTracker(api)
+    proposals = ProposalCache(api, max_entries=4 * len(states))
+    
+    try:
+        # Authorize with the API token
+        await api.send({"authorize": api_token})
+    except APIError as e:
+        print(f"Authorization failed: {e}")
+        return
+    await api.configure_limits()  # Paces every call under the server's rate limits
+    
+    # Get initial balance, kept from the first session across reconnects
+    try:
+        balance = await api.send({"balance": 1})
+        if initial_balance is None:
+            initial_balance = balance['balance']['balance']
+    except APIError as e:
+        print(f"Failed to retrieve balance: {e}")
+        return
+
+    # Load each symbol's recent history into the model and stream its ticks
+    try:
+        await asyncio.gather(*(warm_start(api, state) for state in states.values()))
+    except APIError as e:
+        print(f"Failed to subscribe to ticks: {e}")
+        return
+
+    # Keep both contracts this bot trades priced and ready to buy
+    try:
+        await proposals.warm([proposal_request(symbol, contract_type, barrier)
+                              for symbol in SYMBOLS
+                              for contract_type, barrier in (("DIGITOVER", 5), ("DIGITUNDER", 4))])
+    except APIError as e:
+        print(f"Failed to subscribe to proposals: {e}")
+
+    # Contracts bought before a reconnect or restart settle on this connection
+    for contract_id, (symbol, round_num, ticket) in list(unsettled.items()):
+        track_contract(settlement, states[symbol], contract_id, ticket, round_num)
+
+    # Every symbol trades concurrently on this event loop and connection
+    await asyncio.gather(*(trade_symbol(api, state, settlement, proposals)
+                           for state in states.values()))
+
+    if open_trades:
+        await asyncio.gather(*open_trades)
+    total_pnl = bankroll.realized
+    current_balance = initial_balance + total_pnl
     
     # Display final statistics
+    print(f"Final Balance: {current_balance:.2f}")
+    print(f"Total PnL: {total_pnl:.2f}")
+    if transactions_path:
+        await print_reconciliation(api)
+    else:
+        print(f"Total Wins: {results['Win']}")
+        print(f"Total Losses: {results['Loss']}")
+
+    await proposals.close()
+    return True
+
+async def print_reconciliation(api):
+    # Session and all-time results from the account's own records. Only
+    # rows added since the last run are downloaded
+    cache = TransactionCache(transactions_path)
     try:
-        profit_table = await api.profit_table({"profit_table": 1, "description": 1})
-        wins = len([t for t in profit_table['profit_table']['transactions'] if float(t.get('profit', 0)) > 0])
-        losses = len([t for t in profit_table['profit_table']['transactions'] if float(t.get('profit', 0)) < 0])
-
-        print(f"Final Balance: {current_balance:.2f}")
-        print(f"Total PnL: {total_pnl:.2f}")
-        print(f"Total Wins: {wins}")
-        print(f"Total Losses: {losses}")
+        await cache.sync(api)
     except APIError as e:
-        print(f"Failed to retrieve final statistics: {e}")
+        print(f"Failed to update the transaction cache: {e}")
+    since = first_contract_id if first_contract_id is not None else cache.last_contract_id() + 1
+    session = cache.aggregates(since)
+    print(f"Total Wins: {session['wins']}")
+    print(f"Total Losses: {session['losses']}")
+    print(f"Settled PnL: {session['pnl']:.2f}")
+    for group in cache.aggregates(since, by=('symbol', 'contract_type')):
+        print(f"  {group['symbol']} {group['contract_type']}: Wins: {group['wins']}, "
+              f"Losses: {group['losses']}, PnL: {group['pnl']:.2f}")
+    history = cache.aggregates()
+    print(f"All runs: Wins: {history['wins']}, Losses: {history['losses']}, PnL: {history['pnl']:.2f}")
+    cache.close()
+
+async def main():
+    exporters = await start_exporters(metrics, metrics_port, metrics_file)
+    journal.start()
+    delay = RECONNECT_DELAY
+    while True:
+        try:
+            api = await DerivConnection(url).connect()
+        except OSError as e:
+            print(f"Failed to connect: {e}")
+        else:
+            try:
+                finished = await api.run(sample_calls(api))
+                break
+            except ConnectionError:
+                metrics.inc('reconnects_total')
+                print("Connection lost")
+                delay = RECONNECT_DELAY
+            finally:
+                # Contracts still open are tracked again on the next connection
+                for trade in open_trades:
+                    trade.cancel()
+                await asyncio.gather(*open_trades, return_exceptions=True)
+                # Close the API connection
+                await api.close()
+                save_checkpoint(force=True)
+        print(f"Reconnecting in {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, MAX_RECONNECT_DELAY)
+    await stop_exporters(metrics, exporters, metrics_file)
+    journal.close()
 
-    # Clear API session
-    await api.clear()
+    if finished and checkpoint is not None and os.path.exists(checkpoint.path):
+        os.remove(checkpoint.path)  # The run is over, the next one starts fresh
 
 # Run the bot
-asyncio.run(sample_calls())
+if __name__ == "__main__":
+    asyncio.run(main())
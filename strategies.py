@@ -0,0 +1,284 @@
+import abc
+import itertools
+import numpy as np
+from ar_model import ARModel, digit_probabilities
+from markov_model import MarkovModel
+from tick_history import last_digit
+
+# Decision arrays hold one entry per strategy variant: a contract code, the
+# barrier for over/under contracts and a confidence in [0, 1]
+NONE, EVEN, ODD, OVER, UNDER = range(5)
+CONTRACT_TYPES = (None, 'DIGITEVEN', 'DIGITODD', 'DIGITOVER', 'DIGITUNDER')
+COMMISSION = 0.05  # Payout is stake * (1 - COMMISSION) / win probability, as in fake_deriv_server.py
+
+
+def outcome_tables():
+    # WINS[contract, barrier, digit] and WIN_PROBABILITY[contract, barrier],
+    # so settling a batch of decisions is two fancy-indexing lookups
+    digits = np.arange(10)
+    wins = np.zeros((5, 10, 10), dtype=bool)
+    for barrier in range(10):
+        wins[EVEN, barrier] = digits % 2 == 0
+        wins[ODD, barrier] = digits % 2 == 1
+        wins[OVER, barrier] = digits > barrier
+        wins[UNDER, barrier] = digits < barrier
+    return wins, wins.mean(axis=2)
+
+
+WINS, WIN_PROBABILITY = outcome_tables()
+
+
+# Recent ticks of one symbol, shared by every strategy evaluated on it.
+# Quotes and digits are written twice into buffers of twice the capacity,
+# so the newest n of them are always one contiguous slice and strategies
+# get views, not copies. Digit counts and even int(quote) counts for every
+# window size a strategy asked for are kept incrementally: per tick one
+# tick enters each window and one leaves, whatever the sizes.
+class TickWindow:
+
+    def __init__(self, capacity, pip_size=2, sizes=()):
+        self.capacity = capacity
+        self.pip_size = pip_size
+        self.quotes = np.zeros(2 * capacity)
+        self.digits = np.zeros(2 * capacity, dtype=np.int64)
+        self.evens = np.zeros(2 * capacity, dtype=np.int64)  # 1 where int(quote) is even
+        self.head = 0  # Next write position
+        self.count = 0  # Ticks seen, capped at capacity
+        self.sizes = np.array(sorted(set(sizes)), dtype=np.int64)  # Window sizes with digit counts
+        if len(self.sizes) and self.sizes[-1] > capacity:
+            raise ValueError("window sizes can't exceed the capacity")
+        self.size_rows = {int(size): row for row, size in enumerate(self.sizes)}
+        self.counts = np.zeros((len(self.sizes), 10), dtype=np.int64)  # Digit counts per window size
+        self.even_counts = np.zeros(len(self.sizes), dtype=np.int64)  # Even int(quote) counts per window size
+        self.last_digit = None
+
+    def __len__(self):
+        return self.count
+
+    def push(self, quote):
+        digit = last_digit(quote, self.pip_size)
+        even = 1 - int(quote) % 2
+        if len(self.sizes):
+            full = self.sizes <= self.count
+            if full.any():
+                rows = np.flatnonzero(full)
+                leaving = self.head + self.capacity - self.sizes[full]
+                np.subtract.at(self.counts, (rows, self.digits[leaving]), 1)
+                self.even_counts[rows] -= self.evens[leaving]
+            self.counts[:, digit] += 1
+            self.even_counts += even
+        self.quotes[self.head] = self.quotes[self.head + self.capacity] = quote
+        self.digits[self.head] = self.digits[self.head + self.capacity] = digit
+        self.evens[self.head] = self.evens[self.head + self.capacity] = even
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.last_digit = digit
+        return digit
+
+    def recent_quotes(self, n):
+        # Oldest first view of the newest n quotes
+        n = min(n, self.count)
+        end = self.head + self.capacity
+        return self.quotes[end - n:end]
+
+    def recent_digits(self, n):
+        n = min(n, self.count)
+        end = self.head + self.capacity
+        return self.digits[end - n:end]
+
+    def digit_counts(self, sizes):
+        # Rows of digit counts for window sizes registered at construction
+        return self.counts[[self.size_rows[int(size)] for size in sizes]]
+
+    def parity_counts(self, sizes):
+        # Even int(quote) counts for window sizes registered at construction
+        return self.even_counts[[self.size_rows[int(size)] for size in sizes]]
+
+
+# A prediction rule evaluated for several parameter variants at once.
+# update() sees every tick, decide() returns (contracts, barriers,
+# confidence) arrays with one entry per variant. window_sizes lists the
+# windows whose digit counts the rule reads from the TickWindow.
+class Strategy(abc.ABC):
+    name = 'strategy'
+    window_sizes = ()
+
+    def __init__(self, **grid):
+        # One variant per combination of the grid values
+        keys = list(grid)
+        self.params = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+    def __len__(self):
+        return len(self.params)
+
+    def names(self):
+        return [f"{self.name}({', '.join(f'{k}={v}' for k, v in params.items())})" for params in self.params]
+
+    def update(self, window):
+        pass
+
+    @abc.abstractmethod
+    def decide(self, window):
+        pass
+
+
+# predict_trade_type of "100% win rate but no trades were taken on live.py":
+# over the pivot when the current digit is above it, otherwise under
+# pivot + 1
+class OverUnderStrategy(Strategy):
+    name = 'over_under'
+
+    def __init__(self, pivots=(4,)):
+        super().__init__(pivot=pivots)
+        self.pivots = np.array([p['pivot'] for p in self.params])
+
+    def decide(self, window):
+        over = window.last_digit > self.pivots
+        contracts = np.where(over, OVER, UNDER)
+        barriers = np.where(over, self.pivots, self.pivots + 1)
+        return contracts, barriers, np.ones(len(self))
+
+
+# predict_even_odd of arima v2.py on fixed windows: the majority parity of
+# int(quote) over the last `size` ticks, as arima v2's TickStore counts
+# it, if its share reaches the threshold
+class ParityStrategy(Strategy):
+    name = 'parity'
+
+    def __init__(self, sizes=(10,), thresholds=(0.1,)):
+        super().__init__(size=sizes, threshold=thresholds)
+        self.window_sizes = tuple(sorted(set(sizes)))
+        size_index = {size: i for i, size in enumerate(self.window_sizes)}
+        self.size_rows = np.array([size_index[p['size']] for p in self.params])
+        self.sizes = np.array([p['size'] for p in self.params])
+        self.thresholds = np.array([p['threshold'] for p in self.params])
+
+    def decide(self, window):
+        even = window.parity_counts(self.window_sizes) / np.array(self.window_sizes)
+        even = even[self.size_rows]
+        confidence = np.maximum(even, 1 - even)
+        contracts = np.where(even > 0.5, EVEN, np.where(even < 0.5, ODD, NONE))
+        contracts[(confidence < self.thresholds) | (len(window) < self.sizes)] = NONE
+        return contracts, np.zeros(len(self), dtype=np.int64), confidence
+
+
+# The transition-matrix argmax of simplederivbot2.py: over 5 when the most
+# likely next digit is above 5, under 4 when it is below 4. Variants of the
+# same order are streams of one MarkovModel, each with its own decay, so a
+# tick is one update and one predict per order rather than per variant;
+# orders differ in table shape and can't share a model.
+class MarkovStrategy(Strategy):
+    name = 'markov'
+
+    def __init__(self, orders=(1,), decays=(1.0,)):
+        super().__init__(order=orders, decay=decays)
+        self.groups = []  # (model, variant indices), one per order
+        for order in sorted(set(orders)):
+            variants = np.array([i for i, p in enumerate(self.params) if p['order'] == order])
+            model = MarkovModel(order, [self.params[i]['decay'] for i in variants], streams=len(variants))
+            self.groups.append((model, variants))
+
+    def update(self, window):
+        for model, _ in self.groups:
+            model.update_streams(window.last_digit)
+
+    def decide(self, window):
+        predicted = np.empty(len(self), dtype=np.int64)
+        for model, variants in self.groups:
+            predicted[variants] = np.where(model.ready(), model.predict(), window.last_digit)
+        contracts = np.where(predicted > 5, OVER, np.where(predicted < 4, UNDER, NONE))
+        barriers = np.where(predicted > 5, 5, 4)
+        return contracts, barriers, np.ones(len(self))
+
+
+# Even/odd from the last-digit distribution of the online AR forecast.
+# Each order is a stream of one ARModel, so a tick is one update and one
+# forecast for all of them; variants that differ only in threshold read
+# the same stream.
+class ForecastStrategy(Strategy):
+    name = 'forecast'
+
+    def __init__(self, orders=(2,), thresholds=(0.5,)):
+        super().__init__(order=orders, threshold=thresholds)
+        self.orders = sorted(set(orders))
+        self.model = ARModel(self.orders[-1], streams=len(self.orders), orders=self.orders)
+        self.model_rows = np.array([self.orders.index(p['order']) for p in self.params])
+        self.thresholds = np.array([p['threshold'] for p in self.params])
+
+    def update(self, window):
+        self.model.update_streams(window.recent_quotes(1)[0])
+
+    def decide(self, window):
+        means, stds = self.model.forecast()
+        digits = digit_probabilities(means, stds, np.full(len(means), window.pip_size))
+        even = digits[:, 0::2].sum(axis=1)[self.model_rows]
+        confidence = np.maximum(even, 1 - even)
+        contracts = np.where(even > 0.5, EVEN, np.where(even < 0.5, ODD, NONE))
+        contracts[confidence <= self.thresholds] = NONE
+        return contracts, np.zeros(len(self), dtype=np.int64), confidence
+
+
+# Evaluates every variant of every strategy on each tick of one symbol and
+# shadow-trades their decisions: a decision made on a tick is settled as a
+# one-tick digit contract on the next one, at a flat stake.
+class StrategyRunner:
+
+    def __init__(self, strategies, capacity=0, pip_size=2, stake=1.0, commission=COMMISSION):
+        self.strategies = list(strategies)
+        sizes = {size for strategy in self.strategies for size in strategy.window_sizes}
+        self.window = TickWindow(max([capacity, 1] + [size + 1 for size in sizes]), pip_size, sizes)
+        self.names = [name for strategy in self.strategies for name in strategy.names()]
+        self.stake = stake
+        self.commission = commission
+        variants = len(self.names)
+        self.pending = None  # (contracts, barriers) waiting for the next tick
+        self.trades = np.zeros(variants, dtype=np.int64)
+        self.wins = np.zeros(variants, dtype=np.int64)
+        self.pnl = np.zeros(variants)
+        self.ticks = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def settle(self, digit):
+        contracts, barriers = self.pending
+        active = contracts != NONE
+        won = WINS[contracts, barriers, digit] & active
+        ratio = np.where(active, (1 - self.commission) / np.maximum(WIN_PROBABILITY[contracts, barriers], 1e-9), 0)
+        self.trades += active
+        self.wins += won
+        self.pnl += np.where(won, self.stake * (ratio - 1), np.where(active, -self.stake, 0.0))
+
+    def on_tick(self, quote):
+        # Returns the (contracts, barriers, confidence) decided on this tick
+        digit = self.window.push(quote)
+        self.ticks += 1
+        if self.pending is not None:
+            self.settle(digit)
+        for strategy in self.strategies:
+            strategy.update(self.window)
+        decided = [strategy.decide(self.window) for strategy in self.strategies]
+        contracts, barriers, confidence = (np.concatenate(column) for column in zip(*decided))
+        self.pending = (contracts, barriers)
+        return contracts, barriers, confidence
+
+    def run(self, quotes):
+        for quote in np.asarray(quotes, dtype=np.float64).tolist():
+            self.on_tick(quote)
+
+    def results(self):
+        # One row per variant, best PnL first
+        rows = [{'strategy': name, 'trades': int(trades), 'wins': int(wins), 'pnl': float(pnl),
+                 'win_rate': float(wins / trades) if trades else 0.0}
+                for name, trades, wins, pnl in zip(self.names, self.trades, self.wins, self.pnl)]
+        return sorted(rows, key=lambda row: -row['pnl'])
+
+
+def default_strategies():
+    # The three bots' rules with a spread of parameter variants around them
+    return [
+        OverUnderStrategy(pivots=(3, 4, 5)),
+        ParityStrategy(sizes=(5, 10, 20, 50, 100), thresholds=(0.1, 0.55, 0.6)),
+        MarkovStrategy(orders=(1, 2, 3), decays=(1.0, 0.999)),
+        ForecastStrategy(orders=(1, 2, 4), thresholds=(0.5, 0.51)),
+    ]
@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from deriv_connection import APIError, DerivConnection
+from tick_history import stream_ticks
+from tick_ring import TickReader, TickRing
+
+# Runs strategy and trading workers in separate processes behind one
+# market data connection. The supervisor subscribes to each symbol once and
+# writes every tick into a shared memory TickRing; workers read the ring in
+# place, so adding a worker adds a core, not a subscription or a per-tick
+# message. Workers that exit or stop sending heartbeats are restarted with
+# a backoff, and their health is reported periodically.
+
+API_ENDPOINT = os.getenv('DERIV_ENDPOINT', 'wss://ws.derivws.com')  # ws://127.0.0.1:8765 for fake_deriv_server.py
+URL = f"{API_ENDPOINT}/websockets/v3?app_id={os.getenv('DERIV_APP_ID', '1089')}"
+RING_CAPACITY = 65536  # Ticks kept in shared memory; a restarted worker replays them
+WARMUP_TICKS = 1000  # Past ticks per symbol published before the live ones
+CHECK_INTERVAL = 1.0  # Seconds between worker checks
+REPORT_INTERVAL = 30.0  # Seconds between health reports
+HEARTBEAT_TIMEOUT = 30.0  # A worker silent this long is taken as hung and restarted
+RESTART_DELAY = 1.0  # First wait before restarting a worker, doubled up to MAX_RESTART_DELAY
+MAX_RESTART_DELAY = 60.0
+STABLE_AFTER = 60.0  # A worker that ran this long restarts after RESTART_DELAY again
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+
+def run_worker(ring_spec, slot, target, symbols, options):
+    # Entry point of a worker process: target(reader, **options) runs until
+    # it returns or raises
+    ring = TickRing(*ring_spec)
+    try:
+        target(TickReader(ring, symbols, slot), **options)
+    finally:
+        ring.close()
+
+
+# A worker process and its restart bookkeeping. target must be a
+# module-level function so the spawned process can import it.
+class Worker:
+
+    def __init__(self, name, target, symbols=None, options=None):
+        self.name = name
+        self.target = target
+        self.symbols = symbols
+        self.options = options or {}
+        self.slot = None
+        self.process = None
+        self.started = 0.0  # time.time() of the last start
+        self.restart_at = 0.0  # time.monotonic() after which it may start again
+        self.delay = RESTART_DELAY
+        self.restarts = 0
+        self.exitcode = None  # Of the previous process
+
+
+class Supervisor:
+
+    def __init__(self, workers, symbols, url=URL, capacity=RING_CAPACITY, warmup=WARMUP_TICKS):
+        self.workers = list(workers)
+        self.symbols = list(symbols)
+        self.url = url
+        self.warmup = warmup
+        for slot, worker in enumerate(self.workers):
+            worker.slot = slot
+        self.ring = TickRing(self.symbols, capacity, len(self.workers))
+        self.context = multiprocessing.get_context('spawn')  # Never fork the running event loop
+        self.last_epochs = {}  # symbol -> epoch of the newest published tick
+
+    def publish(self, symbol, epoch, quote):
+        self.ring.publish(symbol, epoch, quote)
+        self.last_epochs[symbol] = epoch
+
+    def start_worker(self, worker):
+        self.ring.health[worker.slot] = 0
+        worker.process = self.context.Process(
+            target=run_worker, name=worker.name, daemon=True,
+            args=(self.ring.spec(), worker.slot, worker.target, worker.symbols, worker.options))
+        worker.process.start()
+        worker.started = time.time()
+
+    def check_workers(self):
+        now = time.monotonic()
+        for worker in self.workers:
+            process = worker.process
+            if process is not None and process.is_alive():
+                # Readers beat on every poll, even when no tick came
+                last_seen = max(float(self.ring.health['heartbeat'][worker.slot]), worker.started)
+                if time.time() - last_seen > HEARTBEAT_TIMEOUT:
+                    print(f"Worker {worker.name} sent no heartbeat for {HEARTBEAT_TIMEOUT:.0f}s, killing it")
+                    process.kill()
+                    process.join()
+                else:
+                    continue
+            if process is not None:
+                worker.exitcode = process.exitcode
+                process.close()
+                worker.process = None
+                if time.time() - worker.started >= STABLE_AFTER:
+                    worker.delay = RESTART_DELAY
+                worker.restart_at = now + worker.delay
+                print(f"Worker {worker.name} exited with code {worker.exitcode}, "
+                      f"restarting in {worker.delay:.0f}s")
+                worker.delay = min(worker.delay * 2, MAX_RESTART_DELAY)
+            elif now >= worker.restart_at:
+                if worker.started:
+                    worker.restarts += 1
+                self.start_worker(worker)
+
+    def health(self):
+        # One row per worker; lag is the number of published ticks it has
+        # not read yet
+        published = self.ring.published()
+        rows = []
+        for worker in self.workers:
+            health = self.ring.health[worker.slot]
+            running = worker.process is not None and worker.process.is_alive()
+            rows.append({
+                'worker': worker.name,
+                'pid': worker.process.pid if running else None,
+                'state': 'running' if running else 'restarting',
+                'restarts': worker.restarts,
+                'exitcode': worker.exitcode,
+                'ticks': int(health['ticks']),
+                'lag': published - int(health['position']) if health['heartbeat'] else None,
+                'lost': int(health['lost']),
+                'heartbeat_age': time.time() - float(health['heartbeat']) if health['heartbeat'] else None,
+            })
+        return rows
+
+    def print_health(self):
+        print(f"\n{self.ring.published()} ticks published for {len(self.symbols)} symbols")
+        print(f"{'worker':<16}{'state':<12}{'pid':>8}{'restarts':>10}{'ticks':>10}{'lag':>8}{'lost':>8}{'heartbeat':>11}")
+        for row in self.health():
+            age = '-' if row['heartbeat_age'] is None else f"{row['heartbeat_age']:.1f}s"
+            print(f"{row['worker']:<16}{row['state']:<12}{row['pid'] or '-':>8}{row['restarts']:>10}"
+                  f"{row['ticks']:>10}{'-' if row['lag'] is None else row['lag']:>8}{row['lost']:>8}{age:>11}")
+
+    async def monitor(self):
+        next_report = time.monotonic() + REPORT_INTERVAL
+        while True:
+            self.check_workers()
+            if time.monotonic() >= next_report:
+                self.print_health()
+                next_report += REPORT_INTERVAL
+            await asyncio.sleep(CHECK_INTERVAL)
+
+    async def subscribe(self, connection, symbol):
+        def on_history(prices, times, pip_size):
+            if pip_size is not None:
+                self.ring.pip_sizes[self.ring.symbol_ids[symbol]] = pip_size
+            for quote, epoch in zip(prices, times):
+                self.publish(symbol, int(epoch), float(quote))
+
+        def on_tick(message):
+            tick = message['tick']
+            self.publish(symbol, int(tick['epoch']), float(tick['quote']))
+
+        # After a reconnect only the ticks missed in between are fetched
+        start = self.last_epochs[symbol] + 1 if symbol in self.last_epochs else 1
+        await stream_ticks(connection, symbol, on_history, on_tick, self.warmup, start)
+
+    async def session(self, connection):
+        await connection.configure_limits()
+        await asyncio.gather(*(self.subscribe(connection, symbol) for symbol in self.symbols))
+        await asyncio.Event().wait()  # Ticks arrive through the callbacks until the connection drops
+
+    async def stream(self):
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                connection = await DerivConnection(self.url).connect()
+            except OSError as e:
+                print(f"Failed to connect: {e}")
+            else:
+                try:
+                    await connection.run(self.session(connection))
+                except ConnectionError:
+                    print("Connection lost")
+                    delay = RECONNECT_DELAY
+                finally:
+                    await connection.close()
+            print(f"Reconnecting in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def stop_workers(self):
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join(5)
+                if worker.process.is_alive():
+                    worker.process.kill()
+                    worker.process.join()
+                worker.process.close()
+                worker.process = None
+
+    async def run(self, duration=None):
+        # Runs until the duration passes, the API rejects a request or the
+        # task is cancelled
+        monitor = asyncio.ensure_future(self.monitor())
+        try:
+            await asyncio.wait_for(self.stream(), duration)
+        except asyncio.TimeoutError:
+            pass
+        except APIError as e:
+            print(f"Error: {e}")
+        finally:
+            monitor.cancel()
+            await asyncio.gather(monitor, return_exceptions=True)
+            self.print_health()
+            self.stop_workers()
+            self.ring.close()
+
+
+if __name__ == "__main__":
+    from shadow import shadow_worker
+
+    parser = argparse.ArgumentParser(description="Shadow-trade strategy variants in worker processes fed "
+                                                 "from one market data connection")
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Symbols are dealt to workers in turn")
+    parser.add_argument('--duration', type=float, default=None, help="Seconds to run, forever by default")
+    parser.add_argument('--warmup', type=int, default=WARMUP_TICKS)
+    args = parser.parse_args()
+
+    count = max(1, min(args.workers, len(args.symbols)))
+    workers = [Worker(f"shadow-{index}", shadow_worker, args.symbols[index::count]) for index in range(count)]
+    asyncio.run(Supervisor(workers, args.symbols, warmup=args.warmup).run(args.duration))
@@ -0,0 +1,174 @@
+import argparse
+import csv
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from backtest import STRATEGIES, load_quotes, parse_value
+
+# Parameter sweep over the strategy constants. The tick dataset is copied
+# once into shared memory and every worker maps it read-only, so a task
+# only ships its parameter dict.
+
+MAX_RUIN_RATE = 0.05  # Share of sessions hitting the stop loss above which a config ranks last under 'score'
+DRAWDOWN_FLOOR = 1.0  # Smallest drawdown the score divides by, so a config that never fell doesn't divide by 0
+
+# Set in each worker by attach_ticks
+shared_ticks = None
+shared_block = None
+
+
+def attach_ticks(name, length, dtype):
+    global shared_ticks, shared_block
+    shared_block = shared_memory.SharedMemory(name=name)
+    shared_ticks = np.ndarray((length,), dtype=dtype, buffer=shared_block.buf)
+    shared_ticks.setflags(write=False)
+
+
+def evaluate(strategy, params, session_ticks):
+    run, _ = STRATEGIES[strategy]
+    total_pnl = 0.0
+    max_drawdown = 0.0
+    ruined = 0
+    sessions = 0
+    wins = losses = 0
+    # Each session restarts the bot on a fresh slice of the dataset
+    for start in range(0, len(shared_ticks) - 1, session_ticks):
+        result = run(shared_ticks[start:start + session_ticks + 1], params)
+        sessions += 1
+        total_pnl += result['pnl']
+        max_drawdown = max(max_drawdown, result['max_drawdown'])
+        wins += result['wins']
+        losses += result['losses']
+        if result['stopped'] == 'stop_loss':
+            ruined += 1
+    return {
+        'params': params,
+        'pnl': total_pnl,
+        'max_drawdown': max_drawdown,
+        'ruin_rate': ruined / sessions if sessions else 0,
+        'sessions': sessions,
+        'wins': wins,
+        'losses': losses,
+    }
+
+
+def grid_configs(grid, samples=None, seed=None):
+    keys = list(grid)
+    values = [grid[key] for key in keys]
+    total = 1
+    for choices in values:
+        total *= len(choices)
+    if samples is None or samples >= total:
+        for combo in itertools.product(*values):
+            yield dict(zip(keys, combo))
+        return
+
+    # Random sample without materialising the full product
+    rng = random.Random(seed)
+    for index in rng.sample(range(total), samples):
+        positions = []
+        for choices in reversed(values):
+            index, position = divmod(index, len(choices))
+            positions.append(position)
+        yield {key: choices[position]
+               for key, choices, position in zip(keys, values, reversed(positions))}
+
+
+def score(result):
+    # PnL per unit of the worst drawdown of any session
+    return result['pnl'] / max(result['max_drawdown'], DRAWDOWN_FLOOR)
+
+
+# Sort keys for rank(). PnL is a float, so a later key only breaks exact
+# ties; each order leads with the measure it is named after.
+RANKINGS = {
+    'score': lambda r, max_ruin: (r['ruin_rate'] > max_ruin, -score(r), r['ruin_rate']),
+    'pnl': lambda r, max_ruin: (-r['pnl'], r['max_drawdown'], r['ruin_rate']),
+    'drawdown': lambda r, max_ruin: (r['max_drawdown'], -r['pnl']),
+    'ruin': lambda r, max_ruin: (r['ruin_rate'], -r['pnl']),
+}
+
+
+def rank(results, sort='score', max_ruin=MAX_RUIN_RATE):
+    # 'score' ranks configs whose ruin rate is at most max_ruin by PnL over
+    # max drawdown, then the rest the same way
+    key = RANKINGS[sort]
+    return sorted(results, key=lambda r: key(r, max_ruin))
+
+
+def run_sweep(quotes, strategy, grid, samples=None, seed=None, session_ticks=5000, workers=None,
+              sort='score', max_ruin=MAX_RUIN_RATE):
+    quotes = np.ascontiguousarray(quotes, dtype=np.float64)
+    block = shared_memory.SharedMemory(create=True, size=max(quotes.nbytes, 1))
+    try:
+        np.ndarray(quotes.shape, dtype=quotes.dtype, buffer=block.buf)[:] = quotes
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                 initializer=attach_ticks,
+                                 initargs=(block.name, len(quotes), quotes.dtype.str)) as pool:
+            futures = [pool.submit(evaluate, strategy, config, session_ticks)
+                       for config in grid_configs(grid, samples, seed)]
+            results = [future.result() for future in futures]
+    finally:
+        block.close()
+        block.unlink()
+    return rank(results, sort, max_ruin)
+
+
+def parse_grid(pairs, defaults):
+    grid = {}
+    for pair in pairs:
+        key, _, values = pair.partition('=')
+        grid[key] = [parse_value(defaults, key, value) for value in values.split(',')]
+    return grid
+
+
+def write_csv(path, results):
+    keys = list(results[0]['params']) if results else []
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(keys + ['pnl', 'max_drawdown', 'ruin_rate', 'score', 'sessions', 'wins', 'losses'])
+        for r in results:
+            writer.writerow([r['params'][k] for k in keys] +
+                            [r['pnl'], r['max_drawdown'], r['ruin_rate'], score(r), r['sessions'], r['wins'],
+                             r['losses']])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep strategy constants over a recorded tick dataset")
+    parser.add_argument('ticks', help=".npy array, CSV/text file of tick quotes or ARCHIVE_DIR/SYMBOL")
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='arima')
+    parser.add_argument('--grid', nargs='+', required=True, metavar='KEY=V1,V2,...',
+                        help="Values to try for a constant, e.g. MAX_HISTORY_SIZE=20,50,100")
+    parser.add_argument('--samples', type=int, help="Evaluate a random sample of the grid instead of all of it")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--session-ticks', type=int, default=5000, help="Ticks per simulated bot session")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all CPUs)")
+    parser.add_argument('--sort', choices=sorted(RANKINGS), default='score',
+                        help="score: PnL / max drawdown, configs ruined in more than --max-ruin of the sessions "
+                             "last; pnl, drawdown or ruin: that measure first")
+    parser.add_argument('--max-ruin', type=float, default=MAX_RUIN_RATE,
+                        help="Highest ruin rate ranked normally by --sort score")
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--csv', help="Write every ranked result to this file")
+    args = parser.parse_args()
+
+    _, defaults = STRATEGIES[args.strategy]
+    grid = parse_grid(args.grid, defaults)
+    quotes = load_quotes(args.ticks)
+
+    start = time.perf_counter()
+    results = run_sweep(quotes, args.strategy, grid, args.samples, args.seed, args.session_ticks, args.workers,
+                        args.sort, args.max_ruin)
+    elapsed = time.perf_counter() - start
+
+    print(f"Evaluated {len(results)} configurations in {elapsed:.2f}s")
+    for position, r in enumerate(results[:args.top], 1):
+        settings = ', '.join(f"{k}={v}" for k, v in r['params'].items())
+        print(f"{position}. PnL: {r['pnl']:.2f}, Max drawdown: {r['max_drawdown']:.2f}, "
+              f"Ruin rate: {r['ruin_rate']:.2%}, Score: {score(r):.2f} | {settings}")
+    if args.csv:
+        write_csv(args.csv, results)
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest import run_backtest
+from bench import load_bot, synthetic_quotes
+from fake_deriv_server import Account, FakeDerivServer
+from tick_history import last_digits
+
+TICKS = 400
+# The fake server prices DIGITEVEN/DIGITODD at stake * 0.95 / 0.5
+PARAMS = {'PAYOUT': 1.9}
+
+
+def backtest_trades(quotes):
+    # (tick, won) of every contract the backtest settles, in order: each
+    # round adds at most one trade to the previous number of rounds' result
+    trades = []
+    previous = run_backtest(quotes, dict(PARAMS, TOTAL_ROUNDS=0))
+    first = PARAMS.get('INITIAL_HISTORY_SIZE', 10) - 1
+    for rounds in range(1, len(quotes)):
+        result = run_backtest(quotes, dict(PARAMS, TOTAL_ROUNDS=rounds))
+        if result['wins'] > previous['wins']:
+            trades.append((first + rounds - 1, True))
+        elif result['losses'] > previous['losses']:
+            trades.append((first + rounds - 1, False))
+        if result['stopped'] or result['rounds'] < rounds:
+            break
+        previous = result
+    return trades, result
+
+
+class Settled:
+    # Stands in for the SettlementTracker with a contract already sold
+    def __init__(self, contract):
+        self.contract = contract
+
+    async def wait(self, contract_id):
+        return self.contract
+
+
+async def settle_live(bot, quotes, trades):
+    # Prices each trade's proposal as the fake server would, settles it on
+    # the next tick's digit and books it through arima v2's settle_trade
+    server = FakeDerivServer()
+    account = Account(1000000.0)
+    digits = last_digits(quotes, 2).tolist()
+    state = bot.states[bot.SYMBOLS[0]]
+    for contract_id, (tick, won) in enumerate(trades, 1):
+        digit = digits[tick + 1]
+        even = digit % 2 == 0
+        contract_type = 'DIGITEVEN' if even == won else 'DIGITODD'
+        chain = await state.martingale.acquire()
+        stake = state.martingale.stake(chain)
+        ticket = bot.bankroll.reserve(stake, force=True)
+        request = bot.proposal_request(state.symbol, contract_type, stake)
+        params = server.contract_parameters(request, request)
+        contract = account.open_contracts[contract_id] = {
+            'contract_id': contract_id, 'contract_type': contract_type, 'barrier': params['barrier'],
+            'symbol': state.symbol, 'buy_price': params['ask_price'], 'payout': params['payout'],
+            'duration': 1, 'purchase_time': tick, 'transaction_ids': {'buy': contract_id}}
+        server.settle(account, contract, digit, float(quotes[tick + 1]), tick + 1)
+        bot.unsettled[contract_id] = (state.symbol, 0, chain, ticket, stake)
+        await bot.settle_trade(Settled(contract), state, contract_id, 0, chain, ticket, stake)
+
+
+def test_backtest_pnl_matches_live_settlement():
+    quotes = synthetic_quotes(TICKS, seed=3)
+    trades, result = backtest_trades(quotes)
+    assert result['wins'] and result['losses']
+
+    bot = load_bot('arima_v2', 'arima v2.py')
+    bot.initial_balance = 0.0
+    asyncio.run(settle_live(bot, quotes, trades))
+
+    assert (bot.total_wins, bot.total_losses) == (result['wins'], result['losses'])
+    assert round(bot.total_pnl, 2) == round(result['pnl'], 2)
+    assert round(bot.bankroll.realized, 2) == round(result['pnl'], 2)
@@ -0,0 +1,66 @@
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tick_ring import TickReader, TickRing
+
+
+def test_batch_is_not_changed_by_later_publishes():
+    # A restarted reader starts at published - capacity, the slot the
+    # writer overwrites next
+    ring = TickRing(['A', 'B'], capacity=8, readers=1)
+    try:
+        for epoch in range(16):
+            ring.publish('A', epoch, epoch / 10)
+        reader = TickReader(ring, ['A'], slot=0)
+        batch = reader.poll()
+        assert batch['sequence'].tolist() == [8, 9, 10, 11, 12, 13, 14, 15]
+        ring.publish('B', 9999, 99.0)
+        assert batch['sequence'].tolist() == [8, 9, 10, 11, 12, 13, 14, 15]
+        assert [tick[0] for tick in reader.ticks_of(batch)] == ['A'] * 8
+    finally:
+        ring.close()
+
+
+def test_records_overwritten_while_copied_are_lost():
+    ring = TickRing(['A', 'B'], capacity=8, readers=1)
+    try:
+        for epoch in range(16):
+            ring.publish('A', epoch, epoch / 10)
+        reader = TickReader(ring, ['A'], slot=0)
+        # The writer publishes between the copy and the check of a poll
+        published = ring.published
+        calls = []
+
+        def publish_during_poll():
+            calls.append(None)
+            if len(calls) == 2:
+                ring.publish('B', 9999, 99.0)
+            return published()
+
+        ring.published = publish_during_poll
+        batch = reader.poll()
+        ring.published = published
+        assert batch['sequence'].tolist() == [9, 10, 11, 12, 13, 14, 15]
+        assert reader.lost == 1
+        assert 9999 not in batch['epoch'].tolist()
+    finally:
+        ring.close()
+
+
+def test_lapped_reader_counts_lost_ticks():
+    ring = TickRing(['A'], capacity=8, readers=1)
+    try:
+        reader = TickReader(ring, slot=0)
+        for epoch in range(30):
+            ring.publish('A', epoch, 1.0)
+        epochs = []
+        while True:
+            batch = reader.poll()
+            if not len(batch):
+                break
+            epochs.extend(epoch for _, epoch, _ in reader.ticks_of(batch))
+        assert epochs == list(range(22, 30))
+        assert reader.lost == 22
+        assert int(ring.health['lost'][0]) == 22
+    finally:
+        ring.close()
@@ -0,0 +1,139 @@
+import os
+import time
+import numpy as np
+
+# On-disk layout: one directory per archive with two raw little-endian
+# column files per symbol, <symbol>.epoch (int64) and <symbol>.quote
+# (float64). Row i of both columns is one tick. The files are only ever
+# appended to, so readers can memory-map them while a recorder is writing
+# and simply see fewer rows. The symbol of a row is given by its file.
+EPOCH_DTYPE = np.dtype('<i8')
+QUOTE_DTYPE = np.dtype('<f8')
+BUFFER_SIZE = 4096  # Ticks buffered per symbol before a bulk write
+
+
+def column_paths(directory, symbol):
+    return (os.path.join(directory, f"{symbol}.epoch"), os.path.join(directory, f"{symbol}.quote"))
+
+
+def column_length(path, dtype):
+    try:
+        return os.path.getsize(path) // dtype.itemsize
+    except FileNotFoundError:
+        return 0
+
+
+def map_column(path, dtype, length):
+    if length == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(length,))
+
+
+class SymbolColumns:
+    __slots__ = ('files', 'epochs', 'quotes', 'count', 'last_epoch')
+
+    def __init__(self, directory, symbol):
+        epoch_path, quote_path = column_paths(directory, symbol)
+        # Rows are only complete when both columns were written; a crash
+        # between the two writes leaves a tail that is cut off here
+        rows = min(column_length(epoch_path, EPOCH_DTYPE), column_length(quote_path, QUOTE_DTYPE))
+        self.last_epoch = int(map_column(epoch_path, EPOCH_DTYPE, rows)[-1]) if rows else 0
+        self.files = []
+        for path, dtype in ((epoch_path, EPOCH_DTYPE), (quote_path, QUOTE_DTYPE)):
+            column = open(path, 'ab')
+            column.truncate(rows * dtype.itemsize)
+            self.files.append(column)
+        self.epochs = np.empty(BUFFER_SIZE, dtype=EPOCH_DTYPE)
+        self.quotes = np.empty(BUFFER_SIZE, dtype=QUOTE_DTYPE)
+        self.count = 0
+
+
+# Buffers ticks in preallocated arrays and appends them to the column
+# files in bulk, so recording a tick from the tick callback is two array
+# stores. Ticks at or before the last recorded epoch of a symbol are
+# skipped, which makes it safe to record overlapping history pages.
+class TickRecorder:
+
+    def __init__(self, directory, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval  # Seconds a tick may sit in the buffer
+        self.columns = {}  # symbol -> SymbolColumns
+        self.last_flush = time.monotonic()
+        self.recorded = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, symbol, epoch, quote):
+        columns = self.columns.get(symbol)
+        if columns is None:
+            columns = self.columns[symbol] = SymbolColumns(self.directory, symbol)
+        epoch = int(epoch)
+        if epoch <= columns.last_epoch:
+            return
+        columns.last_epoch = epoch
+        columns.epochs[columns.count] = epoch
+        columns.quotes[columns.count] = quote
+        columns.count += 1
+        self.recorded += 1
+        if columns.count == BUFFER_SIZE:
+            self.flush_symbol(columns)
+        elif time.monotonic() - self.last_flush > self.flush_interval:
+            self.flush()
+
+    def record_many(self, symbol, epochs, quotes):
+        for epoch, quote in zip(epochs, quotes):
+            self.record(symbol, epoch, quote)
+
+    def last_epoch(self, symbol):
+        columns = self.columns.get(symbol)
+        if columns is None:
+            columns = self.columns[symbol] = SymbolColumns(self.directory, symbol)
+        return columns.last_epoch
+
+    def flush_symbol(self, columns):
+        if columns.count:
+            epoch_file, quote_file = columns.files
+            epoch_file.write(columns.epochs[:columns.count].tobytes())
+            quote_file.write(columns.quotes[:columns.count].tobytes())
+            epoch_file.flush()
+            quote_file.flush()
+            columns.count = 0
+
+    def flush(self):
+        for columns in self.columns.values():
+            self.flush_symbol(columns)
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        for columns in self.columns.values():
+            for column in columns.files:
+                column.close()
+        self.columns.clear()
+
+
+# Read side of the archive. Columns are memory-mapped, and time ranges are
+# slices of the maps found by binary search on the epochs, so nothing is
+# parsed or copied until the caller touches the data.
+class TickArchive:
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def symbols(self):
+        return sorted(name[:-len('.epoch')] for name in os.listdir(self.directory) if name.endswith('.epoch'))
+
+    def __len__(self):
+        return len(self.symbols())
+
+    def ticks(self, symbol):
+        # Returns (epochs, quotes) for every recorded tick of the symbol
+        epoch_path, quote_path = column_paths(self.directory, symbol)
+        rows = min(column_length(epoch_path, EPOCH_DTYPE), column_length(quote_path, QUOTE_DTYPE))
+        return map_column(epoch_path, EPOCH_DTYPE, rows), map_column(quote_path, QUOTE_DTYPE, rows)
+
+    def range(self, symbol, start=None, end=None):
+        # Ticks with start <= epoch <= end, as views into the maps
+        epochs, quotes = self.ticks(symbol)
+        first = 0 if start is None else int(np.searchsorted(epochs, start))
+        last = len(epochs) if end is None else int(np.searchsorted(epochs, end, side='right'))
+        return epochs[first:last], quotes[first:last]
@@ -0,0 +1,86 @@
+import numpy as np
+
+PAGE_SIZE = 5000  # Most ticks the API returns for one ticks_history request
+
+
+def last_digits(quotes, pip_size):
+    return (np.rint(np.asarray(quotes, dtype=np.float64) * 10 ** pip_size).astype(np.int64) % 10)
+
+
+def last_digit(quote, pip_size):
+    return int(round(float(quote) * 10 ** pip_size)) % 10
+
+
+async def fetch_history(connection, symbol, count, end='latest', start=1, page_size=PAGE_SIZE):
+    # Returns (prices, times, pip_size) for up to `count` ticks between
+    # `start` and `end`, oldest first. Requests past the per-request cap are
+    # paged backwards from `end` until `count` ticks are collected or the
+    # history runs out.
+    prices, times = [], []
+    pip_size = None
+    remaining = count
+    while remaining > 0:
+        response = await connection.send({
+            "ticks_history": symbol,
+            "count": min(remaining, page_size),
+            "end": end,
+            "start": start,
+            "style": "ticks"
+        })
+        history = response.get('history', {})
+        page_prices, page_times = history.get('prices', []), history.get('times', [])
+        if pip_size is None:
+            pip_size = response.get('pip_size')
+        if not page_times:
+            break
+        prices.append(np.asarray(page_prices, dtype=np.float64))
+        times.append(np.asarray(page_times, dtype=np.int64))
+        remaining -= len(page_times)
+        if len(page_times) < min(remaining + len(page_times), page_size):
+            break  # Reached the start of the available history
+        end = int(page_times[0]) - 1
+
+    if not times:
+        return np.zeros(0), np.zeros(0, dtype=np.int64), pip_size
+    return np.concatenate(prices[::-1]), np.concatenate(times[::-1]), pip_size
+
+
+async def stream_ticks(connection, symbol, on_history, on_tick, count, start=1):
+    # Subscribes to the symbol's ticks with up to `count` ticks of history
+    # after `start` in front of them. The subscription's first message is
+    # the newest history page; older pages are fetched behind it, then
+    # on_history(prices, times, pip_size) gets the whole history oldest
+    # first. Ticks streamed in the meantime are held and passed to
+    # on_tick(message) afterwards, so the caller sees every tick in order.
+    pending = []
+    live = False
+
+    def on_message(message):
+        if live:
+            on_tick(message)
+        else:
+            pending.append(message)
+
+    await connection.subscribe({
+        "ticks_history": symbol,
+        "count": min(count, PAGE_SIZE),
+        "end": "latest",
+        "start": start,
+        "style": "ticks"
+    }, on_message)
+    latest = pending.pop(0)
+    pip_size = latest.get('pip_size')
+    prices = latest['history']['prices']
+    times = latest['history']['times']
+    if len(times) == PAGE_SIZE and count > PAGE_SIZE:
+        older_prices, older_times, older_pip_size = await fetch_history(
+            connection, symbol, count - PAGE_SIZE, end=int(times[0]) - 1, start=start)
+        prices = list(older_prices) + list(prices)
+        times = list(older_times) + list(times)
+        if pip_size is None:
+            pip_size = older_pip_size
+
+    on_history(prices, times, pip_size)
+    live = True
+    for message in pending:
+        on_tick(message)
@@ -0,0 +1,42 @@
+import asyncio
+import time
+from collections import deque
+
+
+# Bounded queue of decision triggers fed by the tick callback. Every
+# `every` ticks one trigger is queued; when the consumer falls behind and
+# the queue is full the oldest trigger is dropped, so pending ticks are
+# coalesced into the newest one instead of piling up.
+class TickQueue:
+
+    def __init__(self, maxsize=1, every=1):
+        self.maxsize = maxsize
+        self.every = every
+        self.items = deque()
+        self.ready = asyncio.Event()
+        self.since_trigger = 0
+        self.queued = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, epoch):
+        # Called from the tick callback, never blocks
+        self.since_trigger += 1
+        if self.since_trigger < self.every:
+            return
+        self.since_trigger = 0
+        if len(self.items) >= self.maxsize:
+            self.items.popleft()
+            self.coalesced += 1
+        self.items.append((epoch, time.perf_counter()))
+        self.queued += 1
+        self.ready.set()
+
+    async def get(self):
+        # Returns (epoch, perf_counter() when the tick arrived)
+        while not self.items:
+            self.ready.clear()
+            await self.ready.wait()
+        return self.items.popleft()
@@ -0,0 +1,161 @@
+import os
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+RECORD = np.dtype([('sequence', np.int64), ('symbol', np.int64), ('epoch', np.int64), ('quote', np.float64)])
+HEALTH = np.dtype([('pid', np.int64), ('heartbeat', np.float64), ('position', np.int64),
+                   ('ticks', np.int64), ('lost', np.int64)])
+HEADER = 1  # Sequence number of the next tick to be published
+POLL_INTERVAL = 0.001  # Seconds a reader sleeps when no tick is waiting
+
+
+# Ticks of several symbols in one shared memory block: a header, the pip
+# size of each symbol, a ring of fixed-size tick records and one health
+# slot per reader process. There is a single writer. It fills a record,
+# stamps it with the tick's sequence number and only then advances the
+# published sequence in the header, so a reader never sees a record before
+# it is complete. Readers need no lock and no IPC per tick: they compare
+# their position with the header and copy the new records straight out of
+# the shared block.
+#
+# Pass name=None to create the block, or the creator's name to attach to
+# it; symbols, capacity and readers must be the same on both sides.
+class TickRing:
+
+    def __init__(self, symbols, capacity=65536, readers=0, name=None):
+        self.symbols = list(symbols)
+        self.symbol_ids = {symbol: index for index, symbol in enumerate(self.symbols)}
+        self.capacity = capacity
+        self.readers = readers
+        layout = [(np.int64, HEADER), (np.int64, len(self.symbols)), (RECORD, capacity), (HEALTH, readers)]
+        size = sum(np.dtype(dtype).itemsize * count for dtype, count in layout)
+        self.owner = name is None
+        self.block = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        arrays = []
+        offset = 0
+        for dtype, count in layout:
+            arrays.append(np.ndarray((count,), dtype=dtype, buffer=self.block.buf, offset=offset))
+            offset += np.dtype(dtype).itemsize * count
+        self.header, self.pip_sizes, self.records, self.health = arrays
+        # Field views, so publishing is plain scalar stores
+        self.sequences = self.records['sequence']
+        self.symbol_column = self.records['symbol']
+        self.epochs = self.records['epoch']
+        self.quotes = self.records['quote']
+        if self.owner:
+            self.header[:] = 0
+            self.pip_sizes[:] = 2
+            self.sequences[:] = -1
+            self.health[:] = 0
+
+    @property
+    def name(self):
+        return self.block.name
+
+    def spec(self):
+        # Arguments that attach another process to this ring
+        return self.symbols, self.capacity, self.readers, self.name
+
+    def published(self):
+        return int(self.header[0])
+
+    def publish(self, symbol, epoch, quote):
+        # Writer side only
+        sequence = int(self.header[0])
+        slot = sequence % self.capacity
+        self.sequences[slot] = -1  # Readers skip the slot while it is being rewritten
+        self.symbol_column[slot] = self.symbol_ids[symbol]
+        self.epochs[slot] = epoch
+        self.quotes[slot] = quote
+        self.sequences[slot] = sequence
+        self.header[0] = sequence + 1
+        return sequence
+
+    def close(self):
+        # Views must go before the buffer they point into
+        self.header = self.pip_sizes = self.records = self.health = None
+        self.sequences = self.symbol_column = self.epochs = self.quotes = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
+
+
+# One process's cursor into a TickRing. poll() copies the records
+# published since the last call out of the ring in one slice and then
+# checks them like a seqlock read: a record the writer may have started
+# rewriting during the copy is dropped and counted as lost, so a batch
+# never holds a newer tick in an older one's place. A reader that falls
+# more than `capacity` ticks behind skips to the oldest record still held
+# and counts the ticks it missed as lost too. Each poll also writes the
+# reader's heartbeat and progress into its health slot, which is how the
+# supervisor sees a worker is alive.
+class TickReader:
+
+    def __init__(self, ring, symbols=None, slot=None, replay=True):
+        self.ring = ring
+        self.slot = slot
+        self.wanted = np.zeros(len(ring.symbols), dtype=bool)
+        for symbol in symbols or ring.symbols:
+            self.wanted[ring.symbol_ids[symbol]] = True
+        # A new reader starts from the oldest tick the ring still holds, so
+        # a restarted worker rebuilds its state from the retained history
+        published = ring.published()
+        self.position = max(0, published - ring.capacity) if replay else published
+        self.ticks = 0
+        self.lost = 0
+        if slot is not None:
+            ring.health[slot] = (os.getpid(), time.time(), self.position, 0, 0)
+
+    def lag(self):
+        return self.ring.published() - self.position
+
+    def heartbeat(self):
+        if self.slot is not None:
+            health = self.ring.health[self.slot:self.slot + 1]
+            health['heartbeat'] = time.time()
+            health['position'] = self.position
+            health['ticks'] = self.ticks
+            health['lost'] = self.lost
+
+    def poll(self):
+        # Records up to the newest one or the end of the ring, oldest first
+        ring = self.ring
+        published = ring.published()
+        if published - self.position > ring.capacity:
+            self.lost += published - ring.capacity - self.position
+            self.position = published - ring.capacity
+        start = self.position % ring.capacity
+        count = min(published - self.position, ring.capacity - start)
+        batch = ring.records[start:start + count].copy()
+        # Records older than published_after - capacity may have been
+        # overwritten while they were copied, even if their sequence still
+        # read right; the writer goes in order, so they are a prefix
+        published_after = ring.published()
+        sequences = np.arange(self.position, self.position + count)
+        current = (batch['sequence'] == sequences) & (sequences >= published_after - ring.capacity)
+        if not current.all():
+            skipped = int(np.argmax(current)) if current.any() else count
+            self.lost += skipped
+            batch = batch[skipped:]
+        self.position += count
+        self.ticks += len(batch)
+        self.heartbeat()
+        return batch
+
+    def wait(self, timeout=None):
+        # Polls until at least one record arrives or the timeout passes
+        ends = None if timeout is None else time.monotonic() + timeout
+        while True:
+            batch = self.poll()
+            if len(batch) or (ends is not None and time.monotonic() >= ends):
+                return batch
+            time.sleep(POLL_INTERVAL)
+
+    def ticks_of(self, batch):
+        # Yields (symbol, epoch, quote) for the records of this reader's symbols
+        symbols = self.ring.symbols
+        for symbol, epoch, quote in zip(batch['symbol'].tolist(), batch['epoch'].tolist(),
+                                        batch['quote'].tolist()):
+            if self.wanted[symbol]:
+                yield symbols[symbol], epoch, quote
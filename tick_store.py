@@ -0,0 +1,103 @@
+import math
+import numpy as np
+
+
+# Fixed-capacity ring buffer of ticks with a resizable active window.
+# Even/odd counts and the sums used for the volatility of tick differences
+# are updated as ticks enter and leave the window, so every call is O(1)
+# no matter how large the window gets.
+class TickStore:
+    __slots__ = ('capacity', 'buffer', 'head', 'count', 'size', 'length',
+                 'even_count', 'diff_sum', 'diff_sq_sum')
+
+    def __init__(self, capacity, size):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.int64)
+        self.head = 0  # Next write position
+        self.count = 0  # Ticks held in the buffer
+        self.size = max(1, min(size, capacity))  # Requested window size
+        self.length = 0  # Ticks currently inside the window
+        self.even_count = 0
+        self.diff_sum = 0
+        self.diff_sq_sum = 0
+
+    def __len__(self):
+        return self.length
+
+    def _at(self, offset):
+        # offset 0 is the newest tick, 1 the one before it and so on
+        return int(self.buffer[(self.head - 1 - offset) % self.capacity])
+
+    def _drop_oldest(self):
+        oldest = self._at(self.length - 1)
+        if oldest % 2 == 0:
+            self.even_count -= 1
+        if self.length >= 2:
+            diff = self._at(self.length - 2) - oldest
+            self.diff_sum -= diff
+            self.diff_sq_sum -= diff * diff
+        self.length -= 1
+
+    def _take_older(self):
+        # Pull the tick just before the window back in (it is still buffered)
+        older = self._at(self.length)
+        if older % 2 == 0:
+            self.even_count += 1
+        if self.length >= 1:
+            diff = self._at(self.length - 1) - older
+            self.diff_sum += diff
+            self.diff_sq_sum += diff * diff
+        self.length += 1
+
+    def append(self, tick):
+        tick = int(tick)
+        if self.length >= self.size:
+            self._drop_oldest()
+        if self.length >= 1:
+            diff = tick - self._at(0)
+            self.diff_sum += diff
+            self.diff_sq_sum += diff * diff
+        if tick % 2 == 0:
+            self.even_count += 1
+        self.buffer[self.head] = tick
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.length += 1
+
+    def resize(self, size):
+        size = max(1, min(size, self.capacity))
+        while self.length > size:
+            self._drop_oldest()
+        while self.length < size and self.length < self.count:
+            self._take_older()
+        self.size = size
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+        self.length = 0
+        self.even_count = 0
+        self.diff_sum = 0
+        self.diff_sq_sum = 0
+
+    def parity_counts(self):
+        return self.even_count, self.length - self.even_count
+
+    def parity_probabilities(self):
+        if self.length == 0:
+            return 0, 0
+        return self.even_count / self.length, (self.length - self.even_count) / self.length
+
+    def volatility(self):
+        # Population standard deviation of the differences in the window,
+        # same as np.std(np.diff(window))
+        n = self.length - 1
+        if n < 1:
+            return 0
+        variance = (self.diff_sq_sum * n - self.diff_sum * self.diff_sum) / (n * n)
+        return math.sqrt(max(variance, 0))
+
+    def window(self):
+        # Oldest-first copy of the active window (not for the hot path)
+        start = self.head - self.length
+        return np.take(self.buffer, np.arange(start, self.head), mode='wrap')
@@ -0,0 +1,189 @@
+import sqlite3
+
+PAGE_SIZE = 500  # Most rows the API returns for one profit_table or statement request
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contracts (
+    contract_id INTEGER PRIMARY KEY,
+    transaction_id INTEGER,
+    contract_type TEXT,
+    symbol TEXT,
+    buy_price REAL,
+    sell_price REAL,
+    profit REAL,
+    payout REAL,
+    purchase_time INTEGER,
+    sell_time INTEGER,
+    shortcode TEXT
+);
+CREATE INDEX IF NOT EXISTS contracts_by_market ON contracts (symbol, contract_type);
+CREATE INDEX IF NOT EXISTS contracts_by_sell_time ON contracts (sell_time);
+CREATE TABLE IF NOT EXISTS statement (
+    transaction_id INTEGER PRIMARY KEY,
+    contract_id INTEGER,
+    action_type TEXT,
+    amount REAL,
+    balance_after REAL,
+    transaction_time INTEGER,
+    shortcode TEXT
+);
+CREATE INDEX IF NOT EXISTS statement_by_contract ON statement (contract_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    report TEXT PRIMARY KEY,
+    anchor INTEGER,
+    walk_top INTEGER,
+    walk_offset INTEGER
+);
+"""
+
+
+def parse_shortcode(shortcode):
+    # Returns (contract_type, symbol) from a shortcode such as
+    # DIGITOVER_R_100_19.19_1700000000_1T_5_0; R_ symbols span two fields
+    parts = (shortcode or '').split('_')
+    if len(parts) < 2:
+        return parts[0] or None, None
+    if parts[1] == 'R' and len(parts) > 2:
+        return parts[0], f"R_{parts[2]}"
+    return parts[0], parts[1]
+
+
+def as_int(value):
+    return None if value is None else int(value)
+
+
+async def fetch_pages(connection, call, rows_key, page_size=PAGE_SIZE, offset=0, **filters):
+    # Yields the rows of a paginated report one page at a time, newest
+    # first, so the caller can stop as soon as it reaches rows it has
+    while True:
+        response = await connection.send(dict(filters, **{call: 1, 'sort': 'DESC', 'limit': page_size,
+                                                          'offset': offset}))
+        rows = response[call].get(rows_key, [])
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        offset += len(rows)
+
+
+# Local copy of the account's profit_table and statement in SQLite. Syncing
+# pages through the reports newest first and stops at the anchor, the
+# newest row of the last sync that reached it or the end of the report, so
+# a sync only transfers what was added since the last one. A sync that is
+# interrupted leaves its walk in sync_state (the newest row it started
+# from and the offset it got to) and the next one carries on from there
+# before fetching anything newer, so rows older than an interrupted page
+# are never left out. Aggregates are indexed queries on the local tables
+# and cost the same however old the account is.
+class TransactionCache:
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM contracts").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+    def last_contract_id(self):
+        return self.db.execute("SELECT COALESCE(MAX(contract_id), 0) FROM contracts").fetchone()[0]
+
+    def last_transaction_id(self):
+        return self.db.execute("SELECT COALESCE(MAX(transaction_id), 0) FROM statement").fetchone()[0]
+
+    def known(self, table, key, ids):
+        placeholders = ','.join('?' * len(ids))
+        return {row[0] for row in self.db.execute(
+            f"SELECT {key} FROM {table} WHERE {key} IN ({placeholders})", ids)}
+
+    def add_contracts(self, transactions):
+        rows = []
+        for t in transactions:
+            contract_type, symbol = parse_shortcode(t.get('shortcode'))
+            buy_price = float(t['buy_price'])
+            sell_price = float(t.get('sell_price') or 0)
+            # profit_table rows carry no profit field, it is the sale minus the stake
+            rows.append((int(t['contract_id']), as_int(t.get('transaction_id')), contract_type, symbol,
+                         buy_price, sell_price, round(sell_price - buy_price, 2), t.get('payout'),
+                         as_int(t.get('purchase_time')), as_int(t.get('sell_time')), t.get('shortcode')))
+        self.db.executemany("INSERT OR REPLACE INTO contracts VALUES (?,?,?,?,?,?,?,?,?,?,?)", rows)
+
+    def add_statement(self, transactions):
+        self.db.executemany("INSERT OR REPLACE INTO statement VALUES (?,?,?,?,?,?,?)", [
+            (int(t['transaction_id']), as_int(t.get('contract_id')), t.get('action_type'),
+             t.get('amount'), t.get('balance_after'), as_int(t.get('transaction_time')), t.get('shortcode'))
+            for t in transactions])
+
+    async def walk(self, connection, report, table, key, add, page_size, **filters):
+        # One pass from the saved walk, or from the newest row, down to the
+        # anchor. Returns (rows added, whether it resumed an earlier walk)
+        state = self.db.execute("SELECT anchor, walk_top, walk_offset FROM sync_state WHERE report = ?",
+                                (report,)).fetchone()
+        anchor, top, offset = state or (None, None, None)
+        offset = offset or 0
+        resumed = top is not None
+        added = 0
+        # New rows push older ones to higher offsets, so a resumed walk may
+        # see a few rows twice but never skips one
+        async for page in fetch_pages(connection, report, 'transactions', page_size, offset, **filters):
+            ids = [int(t[key]) for t in page]
+            if top is None:
+                top = ids[0]
+            known = self.known(table, key, ids)
+            new = [t for t, row_id in zip(page, ids) if row_id not in known]
+            add(new)
+            added += len(new)
+            offset += len(page)
+            if anchor in known:
+                break
+            self.db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                            (report, anchor, top, offset))
+            self.db.commit()
+        # Reached the anchor or the end of the report: everything from top
+        # down is stored
+        self.db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, NULL, NULL)",
+                        (report, anchor if top is None else top))
+        self.db.commit()
+        return added, resumed
+
+    async def sync_report(self, connection, report, table, key, add, page_size, **filters):
+        added, resumed = await self.walk(connection, report, table, key, add, page_size, **filters)
+        if resumed:
+            # Rows that came in since the interrupted walk started
+            added += (await self.walk(connection, report, table, key, add, page_size, **filters))[0]
+        return added
+
+    async def sync_profit_table(self, connection, page_size=PAGE_SIZE):
+        # Returns the number of contracts added
+        return await self.sync_report(connection, 'profit_table', 'contracts', 'contract_id', self.add_contracts,
+                                      page_size)
+
+    async def sync_statement(self, connection, page_size=PAGE_SIZE):
+        # Returns the number of transactions added
+        return await self.sync_report(connection, 'statement', 'statement', 'transaction_id', self.add_statement,
+                                      page_size, description=1)
+
+    async def sync(self, connection, page_size=PAGE_SIZE):
+        return (await self.sync_profit_table(connection, page_size),
+                await self.sync_statement(connection, page_size))
+
+    def aggregates(self, since_contract_id=0, by=()):
+        # Wins, losses, PnL and staked amount of the settled contracts with
+        # contract_id >= since_contract_id; one row per group of `by`
+        # columns (contract_type, symbol), or a single row for everything
+        for column in by:
+            if column not in ('contract_type', 'symbol'):
+                raise ValueError(f"Can't group by {column}")
+        columns = ', '.join(by)
+        query = (f"SELECT {columns + ',' if by else ''} SUM(profit > 0), SUM(profit < 0), COUNT(*), "
+                 f"COALESCE(SUM(profit), 0), COALESCE(SUM(buy_price), 0) FROM contracts "
+                 f"WHERE contract_id >= ?" + (f" GROUP BY {columns} ORDER BY {columns}" if by else ""))
+        results = []
+        for row in self.db.execute(query, (since_contract_id,)):
+            group, (wins, losses, count, pnl, staked) = row[:len(by)], row[len(by):]
+            results.append(dict(zip(by, group), wins=wins or 0, losses=losses or 0, contracts=count,
+                                pnl=round(pnl, 2), staked=round(staked, 2)))
+        return results if by else results[0]